@@ -0,0 +1,146 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import streamlit as st
+from gspread.exceptions import APIError
+
+from diagnostico import COTA_POR_MINUTO, na_execucao_atual, registrar_etapa
+
+# Quantas vezes uma chamada é tentada antes de o erro chegar à tela
+TENTATIVAS = int(os.environ.get('SHEETS_TENTATIVAS', '5'))
+# Teto, em segundos, da espera entre duas tentativas (a espera dobra a cada uma)
+ESPERA_MAXIMA = float(os.environ.get('SHEETS_ESPERA_MAXIMA', '32'))
+# Espera antes da segunda tentativa
+ESPERA_BASE = 1.0
+# Status que indicam sobrecarga passageira (cota ou servidor do Google)
+STATUS_SOBRECARGA = {429, 500, 502, 503, 504}
+# Quantas leituras de uma mesma carga (abas ou blocos de linhas) vão à API ao mesmo tempo
+LEITURAS_SIMULTANEAS = int(os.environ.get('SHEETS_LEITURAS_SIMULTANEAS', '4'))
+
+
+def eh_sobrecarga(erro):
+    """True se o ``APIError`` é cota esgotada ou instabilidade do Google (e não credencial/permissão)."""
+    resposta = getattr(erro, 'response', None)
+    return resposta is not None and resposta.status_code in STATUS_SOBRECARGA
+
+
+class BaldeFichas:
+    """Token bucket: ``por_minuto`` chamadas por minuto, com rajadas de até ``capacidade``.
+
+    Quem chega sem ficha reserva a próxima (o saldo fica negativo) e dorme até ela
+    existir, então as chamadas saem na ordem em que pediram.
+    """
+
+    def __init__(self, por_minuto=COTA_POR_MINUTO, capacidade=None):
+        self.taxa = por_minuto / 60.0
+        # Rajada de ~10 s da cota: um minuto inteiro nunca passa muito do permitido
+        self.capacidade = capacidade or max(1.0, por_minuto / 6)
+        self._fichas = self.capacidade
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        """Consome uma ficha, esperando se preciso; retorna os segundos esperados."""
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.capacidade, self._fichas + (agora - self._ultima) * self.taxa)
+            self._ultima = agora
+            self._fichas -= 1
+            espera = -self._fichas / self.taxa if self._fichas < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class AgendadorSheets:
+    """Por onde passam todas as chamadas à API do Sheets do processo.
+
+    - respeita a cota com um ``BaldeFichas``;
+    - repete com espera exponencial (e aleatória) em 429 e 5xx: leituras sempre,
+      gravações só em 429, que garante que nada foi aplicado;
+    - leituras idênticas em andamento ao mesmo tempo viram uma chamada só.
+    """
+
+    def __init__(self, balde=None, tentativas=TENTATIVAS, espera_base=ESPERA_BASE, espera_maxima=ESPERA_MAXIMA):
+        self.balde = balde or BaldeFichas()
+        self.tentativas = max(1, tentativas)
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def executar(self, metodo, chamada, chave=None):
+        """Executa ``chamada()``; chamadas com a mesma ``chave`` em andamento compartilham o resultado."""
+        if chave is None:
+            return self._com_novas_tentativas(metodo, chamada)
+        with self._lock:
+            pendente = self._em_andamento.get(chave)
+            dono = pendente is None
+            if dono:
+                pendente = self._em_andamento[chave] = Future()
+        if not dono:
+            inicio = time.perf_counter()
+            try:
+                return pendente.result()
+            finally:
+                registrar_etapa('api.leitura_compartilhada', time.perf_counter() - inicio)
+        try:
+            resultado = self._com_novas_tentativas(metodo, chamada)
+        except BaseException as e:
+            pendente.set_exception(e)
+            raise
+        else:
+            pendente.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+
+    def _com_novas_tentativas(self, metodo, chamada):
+        leitura = metodo.lower() == 'get'
+        for tentativa in range(self.tentativas):
+            espera = self.balde.reservar()
+            if espera:
+                registrar_etapa('api.aguardar_cota', espera)
+            try:
+                return chamada()
+            except APIError as e:
+                status = e.response.status_code
+                repetir = status == 429 or (leitura and status in STATUS_SOBRECARGA)
+                if not repetir or tentativa + 1 >= self.tentativas:
+                    raise
+                espera = self._espera(tentativa, e.response)
+                registrar_etapa('api.nova_tentativa', espera, status=status, tentativa=tentativa + 1)
+                time.sleep(espera)
+
+    def _espera(self, tentativa, resposta):
+        # O Google às vezes diz quanto esperar; senão, exponencial com metade aleatória
+        try:
+            return min(self.espera_maxima, float(resposta.headers['Retry-After']))
+        except (KeyError, TypeError, ValueError):
+            teto = min(self.espera_maxima, self.espera_base * 2 ** tentativa)
+            return teto / 2 + random.uniform(0, teto / 2)
+
+
+def em_paralelo(tarefas, simultaneas=LEITURAS_SIMULTANEAS):
+    """Executa as funções de ``tarefas`` ao mesmo tempo; retorna os resultados na mesma ordem.
+
+    Cada chamada à API continua passando pelo agendador (cota e novas tentativas),
+    e as etapas registradas nas threads contam na execução de quem pediu. Se uma
+    tarefa falhar, o erro é levantado depois que as outras terminam.
+    """
+    tarefas = list(tarefas)
+    if len(tarefas) <= 1 or simultaneas <= 1:
+        return [tarefa() for tarefa in tarefas]
+    # Um pool por chamada: tarefas que também leem em paralelo não esperam vaga no mesmo pool
+    with ThreadPoolExecutor(min(simultaneas, len(tarefas)), thread_name_prefix='leitura-sheets') as executor:
+        futuros = [executor.submit(na_execucao_atual(tarefa)) for tarefa in tarefas]
+    return [futuro.result() for futuro in futuros]
+
+
+@st.cache_resource
+def obter_agendador():
+    return AgendadorSheets()
@@ -0,0 +1,540 @@
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from gspread.utils import numericise, numericise_all, to_records
+from pandas.api.types import union_categoricals
+
+# Métricas numéricas da aba 'relatorio'
+CAMPOS_METRICAS = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA', 'ATENDIMENTOS']
+# Métricas exibidas nos relatórios por período (decidem se um grupo aparece na tabela)
+CAMPOS_RELATORIO = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+COLUNAS_TEXTO = ['LOJA', 'VENDEDOR', 'CLIENTE']
+# Contagens do Relatório Acumulado somadas também no rollup (ver ``reservas_contadas`` e ``google_truncado``)
+CAMPOS_DERIVADOS = ['RESERVAS_CONTADAS', 'GOOGLE_TRUNCADO']
+# Colunas da aba buscadas de início para os relatórios (HORA, ATENDIMENTOS e USUARIO_ALTERACAO não são usadas)
+COLUNAS_RELATORIOS = ['DATA'] + COLUNAS_TEXTO + CAMPOS_RELATORIO
+# Coluna DIA: dias desde 01/01/1970; linhas sem data válida ficam com SEM_DATA
+EPOCA = date(1970, 1, 1)
+SEM_DATA = np.iinfo('int32').min
+# Menores tipos inteiros usados para as métricas (valores com fração ficam em float64)
+TIPOS_INTEIROS = ['int8', 'int16', 'int32']
+# Linhas brutas medidas para estimar a memória de todas
+AMOSTRA_MEMORIA = 1000
+
+
+def montar_dataframe(cabecalho, linhas):
+    """Converte as linhas brutas da aba em um DataFrame colunar e compacto, uma única vez.
+
+    - ``DIA``: data da coluna DATA (somente a parte ``dd/mm/YYYY``) em dias desde
+      1970 (int32), ``SEM_DATA`` se inválida;
+    - LOJA, VENDEDOR e CLIENTE: categorias (texto sem espaços nas pontas);
+    - métricas: o menor inteiro que comporta os valores da coluna (float64 se
+      algum tiver fração), com vírgula decimal aceita e valores inválidos como 0.
+
+    Cada valor distinto de uma coluna é convertido uma só vez (as colunas se repetem
+    muito), com as mesmas regras de ``get_all_records()`` seguidas das regras dos
+    relatórios.
+    """
+    # Como em get_all_records(): com nomes repetidos no cabeçalho vale a última coluna
+    posicao = {nome: i for i, nome in enumerate(cabecalho)}
+    tipado = pd.DataFrame(index=pd.RangeIndex(len(linhas)))
+
+    tipado['DIA'] = _por_valores_unicos(_coluna(linhas, posicao, 'DATA'), _para_dia, 'int32')
+
+    for col in COLUNAS_TEXTO:
+        codigos, unicos = pd.factorize(_coluna(linhas, posicao, col))
+        textos = np.array([_para_texto(v) for v in unicos] + [''], dtype=object)
+        # Valores que só diferem por espaços viram a mesma categoria
+        tipado[col] = pd.Categorical(textos[codigos])
+
+    for col in CAMPOS_METRICAS:
+        tipado[col] = _por_valores_unicos(_coluna(linhas, posicao, col), _para_numero, None)
+
+    return tipado
+
+
+def _para_dia(valor):
+    try:
+        return (datetime.strptime(str(numericise(valor)).split()[0], '%d/%m/%Y').date() - EPOCA).days
+    except Exception:
+        return SEM_DATA
+
+
+def _para_texto(valor):
+    return str(numericise(valor)).strip()
+
+
+def _para_numero(valor):
+    try:
+        return float(str(numericise(valor)).replace(',', '.'))
+    except Exception:
+        return 0.0
+
+
+def _por_valores_unicos(valores, converter, dtype):
+    codigos, unicos = pd.factorize(valores)
+    # O código -1 (valor ausente) aponta para o último item: o valor padrão
+    tabela = np.array([converter(v) for v in unicos] + [converter('')], dtype=dtype or 'float64')
+    if dtype is None:
+        tabela = tabela.astype(_menor_tipo(tabela))
+    return tabela[codigos]
+
+
+def _menor_tipo(numeros):
+    if not np.isfinite(numeros).all() or not (numeros == np.trunc(numeros)).all():
+        return 'float64'
+    for tipo in TIPOS_INTEIROS:
+        limites = np.iinfo(tipo)
+        if limites.min <= numeros.min() and numeros.max() <= limites.max:
+            return tipo
+    return 'float64'
+
+
+def _coluna(linhas, posicao, nome):
+    coluna = np.empty(len(linhas), dtype=object)
+    if nome not in posicao:
+        coluna[:] = ''
+    else:
+        i = posicao[nome]
+        coluna[:] = [l[i] if i < len(l) else '' for l in linhas]
+    return coluna
+
+
+def reservas_contadas(reservas):
+    """Reserva como o Relatório Acumulado conta: -1 desconta, qualquer valor positivo conta +1."""
+    return np.where(reservas == -1, -1, np.where(reservas > 0, 1, 0))
+
+
+def google_truncado(google):
+    """Google como o Relatório Acumulado conta: cada valor truncado para inteiro."""
+    return np.where(np.isfinite(google), np.trunc(google), 0).astype('int64')
+
+
+def _concatenar(df, novas):
+    """``df`` seguido de ``novas``, unindo as categorias das colunas de texto."""
+    juntas = pd.concat([df, novas])
+    for col in COLUNAS_TEXTO:
+        juntas[col] = union_categoricals([df[col], novas[col]], sort_categories=True)
+    return juntas
+
+
+class IndiceDatas:
+    """Posições das linhas ordenadas por data, para buscar um intervalo em O(log n).
+
+    Linhas sem data válida ficam fora do índice (os relatórios já as ignoravam).
+    Com ``posicoes``, ``dias[i]`` é a data da linha ``posicoes[i]`` e é essa a
+    posição devolvida (índice de só uma parte das linhas).
+    """
+
+    def __init__(self, dias, posicoes=None):
+        valores = np.asarray(dias, dtype='int32')
+        validas = np.flatnonzero(valores != SEM_DATA)
+        ordem = validas[np.argsort(valores[validas], kind='stable')]
+        self._dias = valores[ordem]
+        self._ordem = ordem if posicoes is None else np.asarray(posicoes)[ordem]
+
+    def posicoes(self, data_de=None, data_ate=None):
+        """Posições (em ordem crescente) das linhas com data em [data_de, data_ate]."""
+        inicio = 0 if data_de is None else np.searchsorted(self._dias, _dia(data_de), 'left')
+        fim = len(self._dias) if data_ate is None else np.searchsorted(self._dias, _dia(data_ate), 'right')
+        return np.sort(self._ordem[inicio:fim])
+
+    def alterar(self, removidas, excluidas, posicoes, dias):
+        """Novo índice após um salvamento, sem reordenar tudo de novo.
+
+        Saem as posições ``removidas`` (editadas e excluídas); as seguintes às
+        ``excluidas`` recuam; entram as ``posicoes`` (já numeradas depois das
+        exclusões) com seus ``dias``.
+        """
+        manter = ~np.isin(self._ordem, removidas)
+        ordem, dias_atuais = self._ordem[manter], self._dias[manter]
+        ordem = ordem - np.searchsorted(excluidas, ordem)
+        dias, posicoes = np.asarray(dias, dtype='int32'), np.asarray(posicoes)
+        validas = np.flatnonzero(dias != SEM_DATA)
+        validas = validas[np.argsort(dias[validas], kind='stable')]
+        onde = np.searchsorted(dias_atuais, dias[validas], 'right')
+        novo = IndiceDatas.__new__(IndiceDatas)
+        novo._dias = np.insert(dias_atuais, onde, dias[validas])
+        novo._ordem = np.insert(ordem, onde, posicoes[validas])
+        return novo
+
+
+def _dia(data):
+    """Data (date, datetime ou texto aceito pelo pandas) no formato da coluna ``DIA``."""
+    return (pd.Timestamp(data).date() - EPOCA).days
+
+
+def para_data(dia):
+    """Valor da coluna ``DIA`` de volta para ``date`` (None sem data)."""
+    return None if dia == SEM_DATA else EPOCA + timedelta(days=int(dia))
+
+
+class CuboAcumulado:
+    """Somas acumuladas, dia a dia, de cada (LOJA, VENDEDOR) do rollup.
+
+    As linhas do rollup ficam ordenadas por (LOJA, VENDEDOR, DIA) e
+    ``acumulado[campo][k]`` é a soma das ``k`` primeiras. O total de um grupo
+    entre duas datas é ``acumulado[fim] - acumulado[inicio]``, com ``inicio`` e
+    ``fim`` achados por busca binária para todos os grupos de uma vez: trocar o
+    período não soma linhas de novo. Só os dias com movimento ocupam memória.
+    """
+
+    CAMPOS = CAMPOS_METRICAS + CAMPOS_DERIVADOS + ['LINHAS', 'LINHAS_COM_VALOR']
+    # Grupo e dia numa só chave crescente: grupo * PASSO + (DIA - SEM_DATA)
+    PASSO = 2**32
+
+    def __init__(self, tabela):
+        ordenada = tabela.sort_values(['LOJA', 'VENDEDOR', 'DIA'], kind='stable')
+        lojas = ordenada['LOJA'].to_numpy(dtype=object)
+        vendedores = ordenada['VENDEDOR'].to_numpy(dtype=object)
+        novo_grupo = np.ones(len(ordenada), dtype=bool)
+        novo_grupo[1:] = (lojas[1:] != lojas[:-1]) | (vendedores[1:] != vendedores[:-1])
+        inicios = np.flatnonzero(novo_grupo)
+        self.lojas = lojas[inicios]
+        self.vendedores = vendedores[inicios]
+        grupos = np.cumsum(novo_grupo, dtype='int64') - 1
+        self._chaves = grupos * self.PASSO + (ordenada['DIA'].to_numpy().astype('int64') - SEM_DATA)
+        self._acumulado = {}
+        for campo in self.CAMPOS:
+            valores = ordenada[campo].to_numpy()
+            self._acumulado[campo] = np.concatenate([np.zeros(1, valores.dtype), np.cumsum(valores)])
+        # ORDEM (mínimo) não sai de somas: fica na mesma ordem, com uma sentinela no fim
+        self._ordem = np.append(ordenada['ORDEM'].to_numpy(), RollupDiario.SEM_ORDEM)
+
+    def _grupos(self, loja=None, vendedor=None):
+        selecionados = np.ones(len(self.lojas), dtype=bool)
+        if loja is not None:
+            selecionados &= self.lojas == loja
+        if vendedor is not None:
+            selecionados &= self.vendedores == vendedor
+        return np.flatnonzero(selecionados)
+
+    def _intervalos(self, grupos, data_de, data_ate):
+        """Início e fim (nas linhas ordenadas) do período em cada um dos ``grupos``."""
+        deslocamento = grupos.astype('int64') * self.PASSO
+        de = 0 if data_de is None else _dia(data_de) - SEM_DATA
+        ate = self.PASSO - 1 if data_ate is None else _dia(data_ate) - SEM_DATA
+        return (np.searchsorted(self._chaves, deslocamento + de, 'left'),
+                np.searchsorted(self._chaves, deslocamento + ate, 'right'))
+
+    def _somas(self, campos, inicio, fim):
+        return {c: self._acumulado[c][fim] - self._acumulado[c][inicio] for c in campos}
+
+    def somar(self, por, campos, rotulo_vazio, data_de=None, data_ate=None, loja=None, vendedor=None):
+        """Mesmo resultado de ``somar_por`` sobre as linhas do período (``por`` é LOJA ou VENDEDOR)."""
+        grupos = self._grupos(loja, vendedor)
+        inicio, fim = self._intervalos(grupos, data_de, data_ate)
+        com_valor = self._somas(['LINHAS_COM_VALOR'], inicio, fim)['LINHAS_COM_VALOR'] > 0
+        grupos, inicio, fim = grupos[com_valor], inicio[com_valor], fim[com_valor]
+        # Menor ORDEM de cada grupo no período: só os trechos do período, de uma coluna
+        ordem = (np.minimum.reduceat(self._ordem, np.column_stack([inicio, fim]).ravel())[::2]
+                 if len(grupos) else np.empty(0, dtype='int64'))
+        chaves = {'LOJA': self.lojas, 'VENDEDOR': self.vendedores}[por][grupos]
+        parcial = pd.DataFrame({por: np.where(chaves == '', rotulo_vazio, chaves).astype(object),
+                                **self._somas(campos, inicio, fim), 'ORDEM': ordem})
+        regras = {c: 'sum' for c in campos}
+        regras['ORDEM'] = 'min'
+        resultado = parcial.groupby(por, sort=False).agg(regras).sort_values('ORDEM', kind='stable')
+        return resultado[campos].reset_index()
+
+    def totais_por(self, chaves, campos, data_de=None, data_ate=None):
+        """Soma de ``campos`` no período agrupada por ``chaves`` (LOJA e/ou VENDEDOR), só grupos com linhas."""
+        grupos = self._grupos()
+        inicio, fim = self._intervalos(grupos, data_de, data_ate)
+        presentes = fim > inicio
+        somas = {c: v[presentes] for c, v in self._somas(campos, inicio, fim).items()}
+        parcial = pd.DataFrame({'LOJA': self.lojas[presentes], 'VENDEDOR': self.vendedores[presentes], **somas})
+        return parcial.groupby(chaves, sort=False)[campos].sum()
+
+    def totais(self, campos, data_de=None, data_ate=None, loja=None, vendedor=None):
+        """Soma de cada campo no período: {campo: total}."""
+        grupos = self._grupos(loja, vendedor)
+        inicio, fim = self._intervalos(grupos, data_de, data_ate)
+        return {c: float(v.sum()) for c, v in self._somas(campos, inicio, fim).items()}
+
+
+class RollupDiario:
+    """Totais por (DIA, LOJA, VENDEDOR), ordenados por dia.
+
+    Além da soma de cada métrica guarda, por grupo, o total de linhas (``LINHAS``),
+    quantas têm algum valor em ``CAMPOS_RELATORIO`` e a posição da primeira delas,
+    além das contagens do Relatório Acumulado (``CAMPOS_DERIVADOS``).
+    Assim os relatórios por período reproduzem quais grupos aparecem e em que
+    ordem, como na soma linha a linha. Os totais por período saem do
+    ``CuboAcumulado``, montado a partir desta tabela.
+    """
+
+    CHAVES = ['DIA', 'LOJA', 'VENDEDOR']
+    SEM_ORDEM = np.iinfo('int64').max
+
+    def __init__(self, df=None, tabela=None):
+        self.tabela = self._agregar(df) if tabela is None else tabela
+        self._dias = self.tabela['DIA'].to_numpy()
+        self._cubo = None
+
+    @classmethod
+    def _agregar(cls, df):
+        validas = df[df['DIA'] != SEM_DATA]
+        com_valor = (validas[CAMPOS_RELATORIO] != 0).any(axis=1).to_numpy()
+        parcial = validas[cls.CHAVES + CAMPOS_METRICAS].copy()
+        # O rollup é pequeno: guarda loja e vendedor como texto
+        parcial['LOJA'] = parcial['LOJA'].astype(str)
+        parcial['VENDEDOR'] = parcial['VENDEDOR'].astype(str)
+        parcial['RESERVAS_CONTADAS'] = reservas_contadas(validas['RESERVAS'].to_numpy())
+        parcial['GOOGLE_TRUNCADO'] = google_truncado(validas['GOOGLE'].to_numpy())
+        parcial['LINHAS'] = 1
+        parcial['LINHAS_COM_VALOR'] = com_valor.astype('int64')
+        parcial['ORDEM'] = np.where(com_valor, validas.index.to_numpy(), cls.SEM_ORDEM)
+        return cls._reagrupar(parcial)
+
+    @classmethod
+    def _reagrupar(cls, parcial):
+        regras = {c: 'sum' for c in CAMPOS_METRICAS + CAMPOS_DERIVADOS}
+        regras.update({'LINHAS': 'sum', 'LINHAS_COM_VALOR': 'sum', 'ORDEM': 'min'})
+        tabela = parcial.groupby(cls.CHAVES, sort=True).agg(regras).reset_index()
+        tabela['DIA'] = tabela['DIA'].astype('int32')
+        return tabela
+
+    def acrescentar(self, novas):
+        """Novo rollup com as linhas ``novas`` somadas; só os dias a partir da menor data nova são refeitos."""
+        parcial = self._agregar(novas)
+        if parcial.empty:
+            return self
+        corte = np.searchsorted(self._dias, parcial['DIA'].min(), 'left')
+        refeito = self._reagrupar(pd.concat([self.tabela.iloc[corte:], parcial], ignore_index=True))
+        return RollupDiario(tabela=pd.concat([self.tabela.iloc[:corte], refeito], ignore_index=True))
+
+    def alterar(self, df, excluidas, dias):
+        """Novo rollup após um salvamento: os ``dias`` tocados são refeitos a partir de ``df``
+        (já com as posições de depois do salvamento); nos demais, ORDEM recua pelas ``excluidas``."""
+        mantidos = self.tabela[~np.isin(self._dias, dias)].copy()
+        ordem = mantidos['ORDEM'].to_numpy()
+        mantidos['ORDEM'] = np.where(ordem == self.SEM_ORDEM, ordem, ordem - np.searchsorted(excluidas, ordem))
+        refeitos = self._agregar(df[df['DIA'].isin(dias)])
+        tabela = pd.concat([mantidos, refeitos], ignore_index=True)
+        return RollupDiario(tabela=tabela.sort_values(self.CHAVES, kind='stable', ignore_index=True))
+
+    def cubo(self):
+        """``CuboAcumulado`` deste rollup, montado na primeira consulta por período."""
+        if self._cubo is None:
+            self._cubo = CuboAcumulado(self.tabela)
+        return self._cubo
+
+    def somar(self, por, campos, rotulo_vazio, data_de=None, data_ate=None, loja=None, vendedor=None):
+        """Mesmo resultado de ``somar_por`` sobre as linhas do período, lendo só o cubo."""
+        return self.cubo().somar(por, campos, rotulo_vazio, data_de, data_ate, loja, vendedor)
+
+    def totais_por(self, chaves, campos, data_de=None, data_ate=None):
+        """Soma de ``campos`` no período agrupada por ``chaves`` (ex.: ['LOJA', 'VENDEDOR'])."""
+        return self.cubo().totais_por(chaves, campos, data_de, data_ate)
+
+    def totais(self, campos, data_de=None, data_ate=None, loja=None, vendedor=None):
+        """Soma de cada campo no período: {campo: total}."""
+        return self.cubo().totais(campos, data_de, data_ate, loja, vendedor)
+
+    def restrito(self, lojas):
+        """Rollup só com os grupos das ``lojas`` informadas."""
+        return RollupDiario(tabela=self.tabela[self.tabela['LOJA'].isin(list(lojas))].reset_index(drop=True))
+
+
+class BaseRelatorio:
+    """Uma versão dos dados da aba 'relatorio', compartilhada (somente leitura) pelos relatórios.
+
+    Guarda as linhas brutas (posição ``i`` = linha ``i + 2`` da planilha), o
+    DataFrame colunar compacto, o índice por data e o rollup diário. Registros no
+    formato de ``get_all_records()`` são montados só para as linhas pedidas
+    (``registros_em``). ``recarga`` é a versão da última montagem completa: bases
+    com a mesma ``recarga`` só diferem por linhas acrescentadas no final.
+    """
+
+    def __init__(self, cabecalho=None, linhas=None, versao=0, df=None, rollup=None, recarga=None, indice=None):
+        self.cabecalho = cabecalho or []
+        self.linhas = linhas or []
+        self.versao = versao
+        self.recarga = versao if recarga is None else recarga
+        self.df = montar_dataframe(self.cabecalho, self.linhas) if df is None else df
+        self.indice = IndiceDatas(self.df['DIA']) if indice is None else indice
+        self.rollup = RollupDiario(self.df) if rollup is None else rollup
+        self._lojas = self.df['LOJA'].array
+        self._vendedores = self.df['VENDEDOR'].array
+        self._particoes = None
+        self._visoes = {}
+        self._lock = threading.Lock()
+
+    def estender(self, linhas, versao):
+        """Nova versão com linhas acrescentadas no final, convertendo e agregando só as novas."""
+        inicio = len(self.linhas)
+        novas = montar_dataframe(self.cabecalho, linhas[inicio:])
+        novas.index = pd.RangeIndex(inicio, len(linhas))
+        return BaseRelatorio(self.cabecalho, linhas, versao, df=_concatenar(self.df, novas),
+                             rollup=self.rollup.acrescentar(novas), recarga=self.recarga)
+
+    def alterar(self, linhas, versao, alteracoes):
+        """Nova versão após um salvamento (``ConjuntoAlteracoes``), com ``linhas`` de depois dele.
+
+        Só as linhas editadas e incluídas são convertidas, o índice por data é
+        ajustado sem reordenar e o rollup refaz só os dias tocados. É uma nova
+        ``recarga``: linhas do meio mudaram.
+        """
+        excluidas = np.array(sorted(linha - 2 for linha in alteracoes.excluidas), dtype='int64')
+        editadas = np.array(sorted(linha - 2 for linha in alteracoes.editadas), dtype='int64')
+        removidas = np.union1d(excluidas, editadas)
+        # Posições das editadas depois das exclusões
+        editadas_depois = editadas - np.searchsorted(excluidas, editadas)
+
+        df = self.df.drop(index=removidas)
+        if len(editadas):
+            trocadas = montar_dataframe(self.cabecalho, [linhas[p] for p in editadas_depois])
+            trocadas.index = editadas
+            df = _concatenar(df, trocadas).sort_index()
+        df.index = pd.RangeIndex(len(df))
+        inicio = len(df)
+        if inicio < len(linhas):
+            novas = montar_dataframe(self.cabecalho, linhas[inicio:])
+            novas.index = pd.RangeIndex(inicio, len(linhas))
+            df = _concatenar(df, novas)
+
+        entram = np.concatenate([editadas_depois, np.arange(inicio, len(linhas))])
+        dias_entram = df['DIA'].to_numpy()[entram]
+        dias = np.union1d(self.df['DIA'].to_numpy()[removidas], dias_entram)
+        return BaseRelatorio(self.cabecalho, linhas, versao, df=df,
+                             rollup=self.rollup.alterar(df, excluidas, dias),
+                             indice=self.indice.alterar(removidas, excluidas, entram, dias_entram))
+
+    @property
+    def vazia(self):
+        return self.df.empty
+
+    def __len__(self):
+        return len(self.df)
+
+    def lojas(self):
+        return sorted(set(self.df['LOJA'].cat.categories) - {''})
+
+    def vendedores(self):
+        return sorted(set(self.df['VENDEDOR'].cat.categories) - {''})
+
+    def posicoes(self, data_de=None, data_ate=None, loja=None, vendedor=None, lojas=None):
+        """Posições das linhas com data válida no intervalo e, se informados, da loja/vendedor (ou das ``lojas``)."""
+        posicoes = self.indice.posicoes(data_de, data_ate)
+        if lojas is not None:
+            posicoes = posicoes[np.isin(np.asarray(self._lojas[posicoes]), list(lojas))]
+        if loja is not None:
+            posicoes = posicoes[self._lojas[posicoes] == loja]
+        if vendedor is not None:
+            posicoes = posicoes[self._vendedores[posicoes] == vendedor]
+        return posicoes
+
+    def filtrar(self, data_de=None, data_ate=None, loja=None, vendedor=None):
+        """Recorte do DataFrame tipado (mesmos critérios de ``posicoes``)."""
+        return self.df.iloc[self.posicoes(data_de, data_ate, loja, vendedor)]
+
+    def particoes(self):
+        """{loja: posições (crescentes) das linhas da loja}, montado na primeira consulta."""
+        if self._particoes is None:
+            codigos = self.df['LOJA'].cat.codes.to_numpy()
+            ordem = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem], np.arange(len(self.df['LOJA'].cat.categories) + 1))
+            self._particoes = {loja: ordem[a:b] for loja, a, b
+                               in zip(self.df['LOJA'].cat.categories, limites[:-1], limites[1:])}
+        return self._particoes
+
+    def visao(self, lojas):
+        """``VisaoLojas`` só com as ``lojas`` informadas, montada uma vez por conjunto de lojas."""
+        chave = frozenset(lojas)
+        with self._lock:
+            if chave not in self._visoes:
+                self._visoes[chave] = VisaoLojas(self, chave)
+            return self._visoes[chave]
+
+    def registros_em(self, posicoes):
+        """Registros das linhas em ``posicoes``, no formato de ``get_all_records()``."""
+        return to_records(self.cabecalho, [numericise_all(list(self.linhas[p])) for p in posicoes])
+
+    def memoria(self):
+        """Bytes ocupados: {'dataframe', 'rollup', 'linhas' (estimado por amostra)}."""
+        amostra = self.linhas[:AMOSTRA_MEMORIA]
+        # Textos repetidos costumam ser o mesmo objeto: cada um conta uma vez
+        unicos = {id(v): v for l in amostra for v in l}
+        por_linha = ((sum(sys.getsizeof(l) for l in amostra) + sum(sys.getsizeof(v) for v in unicos.values()))
+                     / len(amostra) if amostra else 0)
+        return {
+            'dataframe': int(self.df.memory_usage(deep=True).sum()),
+            'rollup': int(self.rollup.tabela.memory_usage(deep=True).sum()),
+            'linhas': int(sys.getsizeof(self.linhas) + por_linha * len(self.linhas)),
+        }
+
+
+class VisaoLojas(BaseRelatorio):
+    """Parte de uma ``BaseRelatorio`` com só as linhas de algumas lojas (as de um usuário).
+
+    Tem a mesma interface de leitura da base, e tudo o que é consultado (linhas,
+    índice por data, rollup, lojas e vendedores) já vem limitado às partições
+    dessas lojas. As posições continuam sendo as da base (linha ``p + 2`` da
+    planilha), então ``linhas`` e ``registros_em`` funcionam sem tradução.
+    """
+
+    def __init__(self, base, lojas):
+        particoes = base.particoes()
+        partes = [particoes[l] for l in lojas if l in particoes]
+        posicoes = np.sort(np.concatenate(partes)) if partes else np.empty(0, dtype='int64')
+        self.base = base
+        self.lojas_permitidas = frozenset(lojas)
+        self.cabecalho = base.cabecalho
+        self.linhas = base.linhas
+        self.versao = base.versao
+        self.recarga = base.recarga
+        self.df = base.df.iloc[posicoes]
+        self.indice = IndiceDatas(self.df['DIA'], posicoes)
+        self.rollup = base.rollup.restrito(self.lojas_permitidas)
+        self._lojas = base._lojas
+        self._vendedores = base._vendedores
+        self._particoes = {l: particoes[l] for l in self.lojas_permitidas if l in particoes}
+        self._visoes = {}
+        self._lock = threading.Lock()
+
+    def estender(self, linhas, versao):
+        raise TypeError('Uma visão não é estendida: estenda a base e peça a visão de novo.')
+
+    def alterar(self, linhas, versao, alteracoes):
+        raise TypeError('Uma visão não é alterada: altere a base e peça a visão de novo.')
+
+    def lojas(self):
+        return sorted(l for l in self._particoes if l != '' and len(self._particoes[l]))
+
+    def vendedores(self):
+        return sorted(set(self.df['VENDEDOR'].unique()) - {''})
+
+    def filtrar(self, data_de=None, data_ate=None, loja=None, vendedor=None):
+        return self.base.df.iloc[self.posicoes(data_de, data_ate, loja, vendedor)]
+
+    def visao(self, lojas):
+        return self.base.visao(self.lojas_permitidas & frozenset(lojas))
+
+
+def somar_por(df, por, campos, rotulo_vazio, truncar=False):
+    """Soma ``campos`` agrupando pela coluna ``por`` (ex.: LOJA ou VENDEDOR).
+
+    Mantém o comportamento dos relatórios originais: grupos aparecem na ordem em que
+    surgem nos dados e só quando têm algum valor diferente de zero. Com
+    ``truncar=True`` cada célula é convertida para inteiro antes de somar.
+    """
+    valores = df[campos]
+    if truncar:
+        valores = valores.astype('int64')
+    com_valor = (valores != 0).any(axis=1)
+
+    chaves = df.loc[com_valor, por].astype(str).replace('', rotulo_vazio)
+    resultado = valores[com_valor].groupby(chaves, sort=False).sum()
+    resultado.index.name = por
+    return resultado.reset_index()
+
+
+def formatar_inteiros(df, colunas):
+    """Mostra números como inteiros (1 em vez de 1.0) e zeros como vazio."""
+    for col in colunas:
+        df[col] = df[col].astype('int64').astype(str).where(df[col] != 0, '')
+    return df
@@ -0,0 +1,71 @@
+import hashlib
+
+from google_planilha import texto_gravado
+
+
+def versao_linha(valores):
+    """Versão de uma linha: muda se qualquer célula mudar (vazias no final não contam)."""
+    valores = [texto_gravado(v) for v in valores]
+    while valores and valores[-1] == '':
+        valores.pop()
+    return hashlib.sha1('\t'.join(valores).encode('utf-8')).hexdigest()
+
+
+class ConjuntoAlteracoes:
+    """O que um salvamento muda na aba 'relatorio', com os valores de antes e de depois.
+
+    - ``excluidas``: {linha: valores antigos};
+    - ``editadas``: {linha: (valores antigos, valores novos)};
+    - ``incluidas``: [valores novos], acrescentados no final da aba.
+
+    Os números são os da planilha antes do salvamento (cabeçalho = 1). Os valores
+    antigos são a versão de cada linha quando foi lida: ``conflitos`` diz quais já
+    não estão mais assim na planilha.
+    """
+
+    def __init__(self, excluidas=None, editadas=None, incluidas=None):
+        self.excluidas = dict(excluidas or {})
+        self.editadas = dict(editadas or {})
+        self.incluidas = list(incluidas or [])
+
+    def __bool__(self):
+        return bool(self.excluidas or self.editadas or self.incluidas)
+
+    def antigas(self):
+        """{linha: valores antigos} das linhas editadas ou excluídas."""
+        antigas = {linha: antigos for linha, (antigos, _) in self.editadas.items()}
+        antigas.update(self.excluidas)
+        return antigas
+
+    def conflitos(self, atuais):
+        """Linhas editadas ou excluídas cujo conteúdo em ``atuais`` ({linha: valores}) não é mais o lido."""
+        return sorted(linha for linha, antigos in self.antigas().items()
+                      if versao_linha(atuais.get(linha, [])) != versao_linha(antigos))
+
+    def linha_depois(self, linha):
+        """Número, depois do salvamento, de uma linha que não foi excluída."""
+        return linha - sum(1 for excluida in self.excluidas if excluida < linha)
+
+    def lote(self):
+        """Argumentos de ``aplicar_lote``: (excluir, editar, incluir)."""
+        return (sorted(self.excluidas), {linha: novos for linha, (_, novos) in self.editadas.items()},
+                self.incluidas)
+
+    def aplicar(self, linhas, converter=list):
+        """Nova lista com o salvamento aplicado a ``linhas`` (posição ``i`` = linha ``i + 2``).
+
+        As linhas alteradas e incluídas passam por ``converter`` (valores já como a
+        planilha os devolve); as demais são as mesmas listas de ``linhas``.
+        """
+        novas = list(linhas)
+        for linha, (antigos, novos) in self.editadas.items():
+            valores = [texto_gravado(v) for v in novos]
+            # A gravação só cobre as colunas enviadas: as seguintes continuam como estavam
+            novas[linha - 2] = converter(valores + list(antigos[len(valores):]))
+        if self.excluidas:
+            novas = [l for i, l in enumerate(novas, start=2) if i not in self.excluidas]
+        novas += [converter([texto_gravado(v) for v in novos]) for novos in self.incluidas]
+        return novas
+
+    def resumo(self):
+        return {'excluir': len(self.excluidas), 'editar': len(self.editadas), 'incluir': len(self.incluidas)}
@@ -1,14 +1,32 @@
+import importlib
+import sys
+
 import streamlit as st
 
-# Importa os módulos diretamente da raiz
-import relatorios_geral
-import relatorios_por_loja
-import relatorios_por_vendedor
-import relatorios_loja_vendedor
-import relatorios_tempo_real
-import relatorios_edicao
-import relatorios_reservas_acumuladas
 import auth  # Importa o módulo de autenticação
+import diagnostico
+
+# Telas de relatório: tela -> módulo com ``mostrar()``. Cada módulo (e o pandas,
+# openpyxl etc. que ele usa) só é importado quando alguém abre a tela
+TELAS = {
+    "geral": "relatorios_geral",
+    "loja": "relatorios_por_loja",
+    "vendedor": "relatorios_por_vendedor",
+    "loja_vendedor": "relatorios_loja_vendedor",
+    "reservas_acumuladas": "relatorios_reservas_acumuladas",
+    "acumulado": "relatorios_acumulado",
+    "tempo_real": "relatorios_tempo_real",
+    "tendencias": "relatorios_tendencias",
+    "edicao": "relatorios_edicao",
+}
+
+def carregar_tela(tela):
+    """Módulo da tela, importado na primeira vez que é aberta no processo."""
+    nome = TELAS[tela]
+    if nome not in sys.modules:
+        with diagnostico.etapa(f"importar.{nome}"):
+            importlib.import_module(nome)
+    return sys.modules[nome]
 
 # Configuração inicial
 st.set_page_config(
@@ -17,6 +35,9 @@ st.set_page_config(
     layout="centered"
 )
 
+# ⏱️ Mede esta execução (etapas, chamadas à API) para os logs e o painel de diagnóstico
+diagnostico.iniciar_execucao(st.session_state.get("tela", "login"))
+
 # Verifica se o usuário está logado
 if not auth.login():
     st.stop()  # Para a execução aqui se não estiver logado
@@ -42,6 +63,9 @@ with st.sidebar:
     if st.button("🚪 Logout", width="stretch"):
         auth.logout()
 
+    if diagnostico.eh_admin():
+        diagnostico.painel()
+
 # Tela principal: seleção de relatórios
 if st.session_state.tela == "principal":
     st.title("📊 Relatórios Fluxo")
@@ -54,7 +78,9 @@ if st.session_state.tela == "principal":
         ("👨‍💼 Relatório por Vendedor", "vendedor"),
         ("📊 Relatório por Loja e Vendedor", "loja_vendedor"),
         ("📋 Reservas Acumuladas", "reservas_acumuladas"),
+        ("📊 Relatório Acumulado", "acumulado"),
         ("⏱️ Tempo Real por Vendedor", "tempo_real"),
+        ("📉 Tendências por Loja", "tendencias"),
         ("🛠️ Edição Avançada", "edicao"), 
     ]
 
@@ -77,19 +103,9 @@ else:
         ir_para_principal()
 
     # Carrega o relatório selecionado
-    if st.session_state.tela == "geral":
-        relatorios_geral.mostrar()
-    elif st.session_state.tela == "loja":
-        relatorios_por_loja.mostrar()
-    elif st.session_state.tela == "vendedor":
-        relatorios_por_vendedor.mostrar()
-    elif st.session_state.tela == "loja_vendedor":
-        relatorios_loja_vendedor.mostrar()
-    elif st.session_state.tela == "reservas_acumuladas":
-        relatorios_reservas_acumuladas.mostrar()
-    elif st.session_state.tela == "tempo_real":
-        relatorios_tempo_real.mostrar()
-    elif st.session_state.tela == "edicao":
-        relatorios_edicao.mostrar()
-    elif st.session_state.tela == "alterar_senha":
-        auth.formulario_alterar_senha()
\ No newline at end of file
+    if st.session_state.tela == "alterar_senha":
+        auth.formulario_alterar_senha()
+    elif st.session_state.tela in TELAS:
+        carregar_tela(st.session_state.tela).mostrar()
+
+diagnostico.finalizar_execucao()
\ No newline at end of file
@@ -1,15 +1,263 @@
 import streamlit as st
 import bcrypt
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gspread.utils import to_records
 from google_planilha import GooglePlanilha
+from snapshot_local import SnapshotLocal
+
+# Segundos que a lista de usuários fica em cache antes de ser relida da planilha
+TTL_USUARIOS = int(os.environ.get('USUARIOS_CACHE_TTL', '300'))
+# Quantas verificações bcrypt podem rodar ao mesmo tempo
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '4'))
+# Validade (em minutos) do token que permite reconectar sem digitar a senha
+VALIDADE_SESSAO_MINUTOS = int(os.environ.get('SESSAO_VALIDADE_MINUTOS', '60'))
+# Estado do espelho local com os tokens de sessão em vigor
+ESTADO_SESSOES = 'sessoes_ativas'
+
+def _normalizar(nome):
+    return str(nome).strip().upper()
+
+class DiretorioUsuarios:
+    """Usuários da aba 'usuarios' indexados pelo nome normalizado, compartilhados entre as sessões."""
+
+    def __init__(self, ttl=TTL_USUARIOS):
+        self.ttl = ttl
+        self._usuarios = None
+        self._carregado_em = 0.0
+        self._lock = threading.Lock()
+
+    def buscar(self, nome):
+        """Retorna (linha_na_planilha, coluna_senha, dados_normalizados) ou None."""
+        # Sempre pelo dicionário lido aqui: ``invalidar`` pode zerar o atributo a qualquer momento
+        usuarios = self._usuarios
+        if usuarios is None or (time.monotonic() - self._carregado_em) > self.ttl:
+            with self._lock:
+                usuarios = self._usuarios
+                if usuarios is None or (time.monotonic() - self._carregado_em) > self.ttl:
+                    usuarios = self._usuarios = self._carregar()
+                    self._carregado_em = time.monotonic()
+        return usuarios.get(_normalizar(nome))
+
+    def invalidar(self):
+        """Força a releitura na próxima busca (ex.: após troca de senha)."""
+        with self._lock:
+            self._usuarios = None
+
+    def _carregar(self):
+        try:
+            cabecalho, linhas = self._ler_planilha()
+        except LookupError:
+            raise
+        except Exception:
+            # 🛟 Planilha indisponível: usa a cópia local da aba, se existir
+            salvo = SnapshotLocal().carregar('usuarios')
+            if salvo is None:
+                raise
+            cabecalho, linhas, _ = salvo
+        return self._indexar(cabecalho, linhas)
+
+    @staticmethod
+    def _ler_planilha():
+        """(cabecalho, linhas) da aba 'usuarios', lidos agora da planilha.
+
+        Usa a conexão sem mensagens na tela: uma falha ao conectar levanta a exceção
+        (em vez de parar a execução), para o login cair na cópia local.
+        """
+        gsheet = GooglePlanilha.em_segundo_plano()
+        if gsheet.aba_usuarios is None:
+            raise LookupError("⚠️ Aba 'usuarios' não encontrada na planilha.")
+        valores = gsheet.aba_usuarios.get_all_values()
+        cabecalho, linhas = (valores[0], valores[1:]) if valores else ([], [])
+        # A cópia local usada quando a planilha falha nunca fica mais velha que a última leitura
+        SnapshotLocal().substituir('usuarios', cabecalho, linhas)
+        return cabecalho, linhas
+
+    @staticmethod
+    def _indexar(cabecalho, linhas):
+        usuarios_dados = to_records(cabecalho, linhas)
+        if not usuarios_dados:
+            raise LookupError("⚠️ A aba 'usuarios' está vazia.")
+
+        # 🕵️ Normaliza as chaves (nomes das colunas) para evitar erros de digitação/espaços
+        colunas = [_normalizar(k) for k in cabecalho]
+        coluna_senha = colunas.index('SENHA') + 1 if 'SENHA' in colunas else 2
+
+        indice = {}
+        for i, u in enumerate(usuarios_dados):
+            novo_u = {_normalizar(k): v for k, v in u.items()}
+            # O gspread usa índice 1 e tem cabeçalho, então a linha é i + 2
+            indice.setdefault(_normalizar(novo_u.get('USUARIOS', '')), (i + 2, coluna_senha, novo_u))
+        return indice
+
+    def gravar_senha(self, nome, hash_atual, novo_hash):
+        """Grava ``novo_hash`` na linha do usuário, conferida na planilha logo antes da escrita.
+
+        O número de linha do índice pode estar velho (linhas incluídas, excluídas ou
+        ordenadas na aba depois da leitura): a aba é relida direto da planilha, sem
+        a cópia local, e a linha alvo é relida de novo antes de gravar. Se ela não
+        for mais do usuário, ou a senha já não for ``hash_atual``, nada é gravado
+        e levanta LookupError.
+        """
+        with self._lock:
+            cabecalho, linhas = self._ler_planilha()
+            usuarios = self._usuarios = self._indexar(cabecalho, linhas)
+            self._carregado_em = time.monotonic()
+        encontrado = usuarios.get(_normalizar(nome))
+        if encontrado is None:
+            raise LookupError("❌ Usuário não encontrado para atualização.")
+        linha, coluna_senha, dados = encontrado
+        if str(dados.get('SENHA', '')) != hash_atual:
+            raise LookupError("❌ A senha deste usuário foi alterada em outra sessão. Entre novamente.")
+
+        aba = GooglePlanilha.em_segundo_plano().aba_usuarios
+        atual = aba.batch_get([f'{linha}:{linha}'])[0]
+        atual = list(atual[0]) if atual else []
+        colunas = [_normalizar(c) for c in cabecalho]
+        coluna_usuario = colunas.index('USUARIOS') if 'USUARIOS' in colunas else None
+
+        def celula(posicao):
+            return str(atual[posicao]) if posicao is not None and posicao < len(atual) else ''
+
+        if _normalizar(celula(coluna_usuario)) != _normalizar(nome) or celula(coluna_senha - 1) != hash_atual:
+            self.invalidar()
+            raise LookupError("❌ A aba de usuários mudou durante a troca de senha. Tente novamente.")
+        aba.update_cell(linha, coluna_senha, novo_hash)
+        # Na cópia local também: com a planilha fora do ar, a senha antiga não entra mais
+        valores = list(linhas[linha - 2]) + [''] * (coluna_senha - len(linhas[linha - 2]))
+        valores[coluna_senha - 1] = novo_hash
+        linhas[linha - 2] = valores
+        SnapshotLocal().substituir('usuarios', cabecalho, linhas)
+        self.invalidar()
+
+class SessoesAtivas:
+    """Tokens de sessão em vigor, guardados no espelho local: {id: [usuário, expira]}.
+
+    Um token só vale enquanto o seu id estiver aqui, então sair, trocar a senha ou
+    reconectar (que troca o token por um novo) revogam o anterior no servidor,
+    mesmo que a URL antiga tenha sido copiada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def criar(self, usuario, expira):
+        id_sessao = secrets.token_urlsafe(16)
+        with self._lock:
+            sessoes = self._ler()
+            sessoes[id_sessao] = [_normalizar(usuario), expira]
+            self._gravar(sessoes)
+        return id_sessao
+
+    def valida(self, id_sessao, usuario):
+        sessao = self._ler().get(id_sessao)
+        return sessao is not None and sessao[0] == _normalizar(usuario) and sessao[1] >= time.time()
+
+    def revogar(self, id_sessao):
+        with self._lock:
+            sessoes = self._ler()
+            if sessoes.pop(id_sessao, None) is not None:
+                self._gravar(sessoes)
+
+    def revogar_usuario(self, usuario):
+        with self._lock:
+            sessoes = self._ler()
+            self._gravar({i: s for i, s in sessoes.items() if s[0] != _normalizar(usuario)})
+
+    @staticmethod
+    def _ler():
+        return SnapshotLocal().carregar_estado(ESTADO_SESSOES) or {}
+
+    @staticmethod
+    def _gravar(sessoes):
+        agora = time.time()
+        SnapshotLocal().salvar_estado(ESTADO_SESSOES, {i: s for i, s in sessoes.items() if s[1] >= agora})
+
+@st.cache_resource
+def _sessoes():
+    return SessoesAtivas()
+
+@st.cache_resource
+def _diretorio():
+    return DiretorioUsuarios()
+
+@st.cache_resource
+def _pool_bcrypt():
+    return ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+
+@st.cache_resource
+def _segredo_sessao():
+    """Chave dos tokens de sessão; sem SESSAO_SEGREDO, os tokens valem até o processo reiniciar."""
+    return os.environ.get('SESSAO_SEGREDO') or secrets.token_hex(32)
 
 def verificar_senha(senha, hash_armazenado):
-    """Verifica se a senha coincide com o hash."""
-    return bcrypt.checkpw(senha.encode('utf-8'), hash_armazenado.encode('utf-8'))
+    """Verifica se a senha coincide com o hash (no pool limitado de threads bcrypt)."""
+    return _pool_bcrypt().submit(
+        bcrypt.checkpw, senha.encode('utf-8'), hash_armazenado.encode('utf-8')
+    ).result()
 
 def gerar_hash(senha):
     """Gera um hash para uma senha."""
     return bcrypt.hashpw(senha.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
+def _assinar(conteudo, hash_senha):
+    # O hash da senha entra na assinatura: trocar a senha invalida os tokens antigos
+    chave = _segredo_sessao().encode('utf-8')
+    return hmac.new(chave, f'{conteudo}|{hash_senha}'.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def _emitir_token(usuario, hash_senha):
+    """Grava na URL um token assinado, de vida curta, que permite reconectar sem passar pelo login."""
+    anterior = st.session_state.get('sessao_id')
+    if anterior:
+        _sessoes().revogar(anterior)
+    expira = int(time.time()) + VALIDADE_SESSAO_MINUTOS * 60
+    id_sessao = _sessoes().criar(usuario, expira)
+    conteudo = base64.urlsafe_b64encode(f'{usuario}|{expira}|{id_sessao}'.encode('utf-8')).decode('ascii')
+    st.query_params['sessao'] = f'{conteudo}.{_assinar(conteudo, hash_senha)}'
+    st.session_state.sessao_id = id_sessao
+
+def _restaurar_sessao():
+    """Retoma a sessão a partir do token da URL, sem verificar a senha de novo."""
+    token = st.query_params.get('sessao')
+    if not token or '.' not in token:
+        return False
+    try:
+        conteudo, assinatura = token.rsplit('.', 1)
+        usuario, expira, id_sessao = base64.urlsafe_b64decode(conteudo.encode('ascii')).decode('utf-8').rsplit('|', 2)
+        if int(expira) < time.time() or not _sessoes().valida(id_sessao, usuario):
+            return False
+        encontrado = _diretorio().buscar(usuario)
+        if encontrado is None:
+            return False
+        _, _, dados = encontrado
+        if not hmac.compare_digest(assinatura, _assinar(conteudo, str(dados.get('SENHA', '')))):
+            return False
+    except Exception:
+        return False
+
+    _iniciar_sessao(dados, usuario)
+    # Cada reconexão troca o token: o da URL antiga deixa de valer
+    st.session_state.sessao_id = id_sessao
+    _emitir_token(st.session_state.usuario_logado, str(dados.get('SENHA', '')))
+    return True
+
+def _iniciar_sessao(usuario_encontrado, usuario_input):
+    st.session_state.autenticado = True
+    st.session_state.usuario_logado = usuario_encontrado.get('USUARIOS', usuario_input)
+
+    # Processa as lojas permitidas
+    lojas_str = str(usuario_encontrado.get('LOJAS', 'TODAS')).strip()
+    if lojas_str.upper() == 'TODAS':
+        st.session_state.lojas_permitidas = 'TODAS'
+    else:
+        st.session_state.lojas_permitidas = [l.strip() for l in lojas_str.split(',')]
+
 def login():
     """Exibe a tela de login e gerencia a sessão."""
     if 'autenticado' not in st.session_state:
@@ -18,8 +266,11 @@ def login():
     if st.session_state.autenticado:
         return True
 
+    if _restaurar_sessao():
+        return True
+
     st.title("🔐 Acesso Restrito")
-    
+
     with st.form("login_form"):
         usuario_input = st.text_input("Usuário")
         senha_input = st.text_input("Senha", type="password")
@@ -27,53 +278,33 @@ def login():
 
         if submetido:
             try:
-                gsheet = GooglePlanilha()
-                if gsheet.aba_usuarios is None:
-                    st.error("⚠️ Aba 'usuarios' não encontrada na planilha.")
-                    return False
-
-                usuarios_dados = gsheet.aba_usuarios.get_all_records()
-                
-                if not usuarios_dados:
-                    st.error("⚠️ A aba 'usuarios' está vazia.")
-                    return False
-
-                # 🕵️ Normaliza as chaves (nomes das colunas) para evitar erros de digitação/espaços
-                # Transforma todas as colunas em MAIÚSCULO e remove espaços
-                dados_normalizados = []
-                for u in usuarios_dados:
-                    novo_u = {str(k).strip().upper(): v for k, v in u.items()}
-                    dados_normalizados.append(novo_u)
-
                 # Procura o usuário (ignora maiúsculas/minúsculas no nome digitado)
-                usuario_encontrado = next((u for u in dados_normalizados if str(u.get('USUARIOS', '')).strip().upper() == usuario_input.upper()), None)
+                encontrado = _diretorio().buscar(usuario_input)
 
-                if usuario_encontrado:
+                if encontrado:
+                    _, _, usuario_encontrado = encontrado
                     # Verifica se as colunas existem após a normalização
                     if 'SENHA' not in usuario_encontrado:
                         st.error(f"❌ Coluna 'SENHA' não encontrada. Colunas detectadas: {list(usuario_encontrado.keys())}")
                         return False
 
-                    if verificar_senha(senha_input, str(usuario_encontrado['SENHA'])):
-                        st.session_state.autenticado = True
-                        st.session_state.usuario_logado = usuario_encontrado.get('USUARIOS', usuario_input)
-                        
-                        # Processa as lojas permitidas
-                        lojas_str = str(usuario_encontrado.get('LOJAS', 'TODAS')).strip()
-                        if lojas_str.upper() == 'TODAS':
-                            st.session_state.lojas_permitidas = 'TODAS'
-                        else:
-                            st.session_state.lojas_permitidas = [l.strip() for l in lojas_str.split(',')]
-                        
+                    hash_senha = str(usuario_encontrado['SENHA'])
+                    if verificar_senha(senha_input, hash_senha):
+                        _iniciar_sessao(usuario_encontrado, usuario_input)
+                        _emitir_token(st.session_state.usuario_logado, hash_senha)
+
                         st.success("Login realizado com sucesso!")
                         st.rerun()
                     else:
                         st.error("❌ Senha incorreta.")
                 else:
                     st.error("❌ Usuário não encontrado.")
+            except LookupError as e:
+                st.error(str(e))
+                return False
             except Exception as e:
                 st.error(f"Erro ao autenticar: {e}")
-    
+
     return False
 
 def logout():
@@ -81,6 +312,11 @@ def logout():
     st.session_state.autenticado = False
     st.session_state.usuario_logado = None
     st.session_state.lojas_permitidas = None
+    if st.session_state.get('sessao_id'):
+        _sessoes().revogar(st.session_state.sessao_id)
+        st.session_state.sessao_id = None
+    if 'sessao' in st.query_params:
+        del st.query_params['sessao']
     st.rerun()
 
 def formulario_alterar_senha():
@@ -96,32 +332,34 @@ def formulario_alterar_senha():
             if nova_senha != confirma_senha:
                 st.error("❌ As novas senhas não coincidem.")
                 return
-            
+
             if len(nova_senha) < 4:
                 st.error("❌ A nova senha deve ter pelo menos 4 caracteres.")
                 return
 
             try:
-                gsheet = GooglePlanilha()
-                usuarios_dados = gsheet.aba_usuarios.get_all_records()
-                
-                # Busca o usuário logado na lista
-                for i, u in enumerate(usuarios_dados):
-                    if u['USUARIOS'] == st.session_state.usuario_logado:
-                        # Verifica a senha atual
-                        if verificar_senha(senha_atual, str(u['SENHA'])):
-                            # Gera novo hash e atualiza a planilha
-                            novo_hash = gerar_hash(nova_senha)
-                            # O gspread usa índice 1 e tem cabeçalho, então a linha é i + 2
-                            # A coluna SENHA é a segunda (B)
-                            gsheet.aba_usuarios.update_cell(i + 2, 2, novo_hash)
-                            
-                            st.success("✅ Senha alterada com sucesso!")
-                            return
-                        else:
-                            st.error("❌ Senha atual incorreta.")
-                            return
+                # Busca o usuário logado no diretório
+                encontrado = _diretorio().buscar(st.session_state.usuario_logado)
+                if encontrado:
+                    _, _, u = encontrado
+                    # Verifica a senha atual
+                    hash_atual = str(u['SENHA'])
+                    if verificar_senha(senha_atual, hash_atual):
+                        # Gera novo hash e grava na linha do usuário, conferida na planilha
+                        novo_hash = gerar_hash(nova_senha)
+                        _diretorio().gravar_senha(st.session_state.usuario_logado, hash_atual, novo_hash)
+                        # Tokens emitidos antes da troca (outras abas, links copiados) deixam de valer
+                        _sessoes().revogar_usuario(st.session_state.usuario_logado)
+                        _emitir_token(st.session_state.usuario_logado, novo_hash)
+
+                        st.success("✅ Senha alterada com sucesso!")
+                        return
+                    else:
+                        st.error("❌ Senha atual incorreta.")
+                        return
                 st.error("❌ Usuário não encontrado para atualização.")
+            except LookupError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"❌ Erro ao atualizar senha: {e}")
 
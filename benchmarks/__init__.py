@@ -0,0 +1,7 @@
+"""Benchmarks dos relatórios com dados sintéticos da aba 'relatorio'.
+
+Uso (na raiz do projeto)::
+
+    python -m benchmarks.executar --linhas 10000 100000 1000000 --saida resultado.json
+    python -m benchmarks.partida --telas login principal geral
+"""
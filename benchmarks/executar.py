@@ -0,0 +1,182 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import relatorios_acumulado
+import relatorios_edicao
+import relatorios_geral
+import relatorios_loja_vendedor
+import relatorios_por_loja
+import relatorios_por_vendedor
+import relatorios_reservas_acumuladas
+import relatorios_tempo_real
+import relatorios_tendencias
+from agregacao import BaseRelatorio, montar_dataframe
+from google_planilha import GooglePlanilha, SincronizadorIncremental, ler_aba
+from livro_reservas import LivroReservas
+from relatorios_edicao import CABECALHO_EXATO
+
+from benchmarks.gerador import gerar_linhas
+from benchmarks.planilha_falsa import PlanilhaFalsa
+
+TAMANHOS_PADRAO = [10_000, 100_000, 1_000_000]
+# Linhas acrescentadas à aba para medir a sincronização incremental
+LINHAS_NOVAS = 100
+# Período dos relatórios com filtro de datas
+DIAS_PERIODO = 30
+# Uma fase fica marcada na comparação quando demora mais que isso vezes o tempo anterior
+LIMITE_REGRESSAO = 1.2
+
+
+def medir(funcao, repeticoes):
+    """Executa ``funcao`` ``repeticoes`` vezes; retorna (último resultado, tempos em segundos)."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return resultado, {'min': round(min(tempos), 6), 'mediana': round(statistics.median(tempos), 6)}
+
+
+def rodar(quantidade, repeticoes=3, hoje=None, latencia=0.0):
+    """Mede buscar → converter → agregar → formatar de cada relatório com ``quantidade`` linhas."""
+    hoje = hoje or date.today()
+    ontem = hoje - timedelta(days=1)
+    data_de = hoje - timedelta(days=DIAS_PERIODO)
+    aba = PlanilhaFalsa(CABECALHO_EXATO, gerar_linhas(quantidade, hoje), latencia)
+
+    # 📥 Fases comuns: leitura da aba e montagem da base compartilhada
+    fases = {}
+    valores, fases['buscar'] = medir(aba.get_all_values, repeticoes)
+    _, fases['buscar_em_blocos'] = medir(lambda: ler_aba(aba), repeticoes)
+    sincronizador = SincronizadorIncremental()
+    _, fases['converter_registros'] = medir(lambda: sincronizador.carregar(valores[0], valores[1:]), repeticoes)
+    cabecalho, linhas = sincronizador.cabecalho, sincronizador.linhas
+    df, fases['montar_dataframe'] = medir(lambda: montar_dataframe(cabecalho, linhas), repeticoes)
+    base, fases['indice_e_rollup'] = medir(lambda: BaseRelatorio(cabecalho, linhas, 1, df=df), repeticoes)
+    memoria = base.memoria()
+
+    # ➕ Linhas novas de hoje: sincronização incremental e extensão da base (uma vez só)
+    aba.acrescentar(gerar_linhas(LINHAS_NOVAS, hoje, dias=0, semente=7))
+    _, fases['sincronizar_incremental'] = medir(lambda: sincronizador.sincronizar(aba), 1)
+    nova, fases['estender_base'] = medir(
+        lambda: base.estender(sincronizador.linhas, 2), 1)
+
+    loja = base.lojas()[0]
+    vendedor = base.vendedores()[0]
+    relatorios = {}
+
+    def relatorio(nome, agregar, formatar=None):
+        resultado, tempos = medir(agregar, repeticoes)
+        relatorios[nome] = {'agregar': tempos}
+        if formatar is not None:
+            _, relatorios[nome]['formatar'] = medir(lambda: formatar(resultado), repeticoes)
+
+    # As mesmas funções que as telas chamam (agregar e formatar de cada relatório)
+    relatorio('geral', lambda: relatorios_geral.agregar(base, data_de, hoje), relatorios_geral.formatar)
+    relatorio('por_loja', lambda: relatorios_por_loja.agregar(base, loja, data_de, hoje), relatorios_por_loja.formatar)
+    relatorio('loja_vendedor', lambda: relatorios_loja_vendedor.agregar(base, loja, data_de, hoje),
+              relatorios_loja_vendedor.formatar)
+    relatorio('por_vendedor', lambda: relatorios_por_vendedor.agregar(base, vendedor, data_de, hoje),
+              lambda resultado: relatorios_por_vendedor.montar_tabela(resultado[0]))
+    # O monitor de tempo real publica as linhas de hoje da base
+    relatorio('tempo_real', lambda: relatorios_tempo_real.agregar(base.filtrar(hoje, hoje), loja),
+              relatorios_tempo_real.formatar)
+    # Edição: primeira página do dia, lida da aba (linhas inteiras) como na tela
+    leitor = GooglePlanilha.__new__(GooglePlanilha)
+    pagina = relatorios_edicao.LINHAS_POR_PAGINA
+    relatorio('edicao',
+              lambda: leitor.ler_linhas(aba, relatorios_edicao.numeros_do_dia(base, ontem)[:pagina], len(cabecalho)),
+              lambda linhas_lidas: relatorios_edicao.montar_tabela(linhas_lidas, cabecalho))
+    relatorio('acumulado', lambda: relatorios_acumulado.agregar(base, hoje), relatorios_acumulado.formatar)
+    relatorio('tendencias', lambda: relatorios_tendencias.agregar(base, hoje),
+              lambda totais: relatorios_tendencias.montar_tabelas(totais, 'VENDAS'))
+
+    # Livro de reservas: montagem do zero e atualização com as linhas novas
+    relatorio('reservas_acumuladas', lambda: LivroReservas().atualizar(base))
+    livro = LivroReservas()
+    livro.atualizar(base)
+    _, relatorios['reservas_acumuladas']['atualizar'] = medir(lambda: livro.atualizar(nova), 1)
+    ativos, relatorios['reservas_acumuladas']['consultar'] = medir(lambda: livro.consultar(vendedor)[0], repeticoes)
+    _, relatorios['reservas_acumuladas']['formatar'] = medir(
+        lambda: relatorios_reservas_acumuladas.montar_tabela(ativos), repeticoes)
+
+    return {
+        'linhas': quantidade,
+        'chamadas_api': dict(aba.chamadas),
+        'memoria_bytes': memoria,
+        'fases': fases,
+        'relatorios': relatorios,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _tempos(resultado):
+    """{(linhas, 'fase' ou 'relatorio.etapa'): segundos} para comparar execuções."""
+    tempos = {}
+    for item in resultado['resultados']:
+        for fase, valor in item['fases'].items():
+            tempos[(item['linhas'], fase)] = valor['min']
+        for nome, etapas in item['relatorios'].items():
+            for etapa, valor in etapas.items():
+                tempos[(item['linhas'], f'{nome}.{etapa}')] = valor['min']
+    return tempos
+
+
+def comparar(anterior, atual):
+    """Imprime a razão atual/anterior de cada fase presente nos dois resultados."""
+    antes, depois = _tempos(anterior), _tempos(atual)
+    for chave in sorted(antes.keys() & depois.keys()):
+        razao = depois[chave] / antes[chave] if antes[chave] else float('inf')
+        marca = '  ⚠️' if razao > LIMITE_REGRESSAO else ''
+        print(f'{chave[0]:>9} {chave[1]:<40} {antes[chave]:10.4f}s → {depois[chave]:10.4f}s  x{razao:.2f}{marca}')
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Benchmark dos relatórios com dados sintéticos.')
+    parser.add_argument('--linhas', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--latencia', type=float, default=0.0, help='segundos simulados por chamada à API')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado (padrão: benchmark_<commit>.json)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args(argumentos)
+
+    commit = _commit()
+    resultado = {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'repeticoes': args.repeticoes,
+        'latencia': args.latencia,
+        'resultados': [],
+    }
+    for quantidade in args.linhas:
+        print(f'⏱️ {quantidade} linhas...', flush=True)
+        resultado['resultados'].append(rodar(quantidade, args.repeticoes, latencia=args.latencia))
+
+    saida = args.saida or f'benchmark_{commit or "local"}.json'
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f'✅ Resultado gravado em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            comparar(json.load(arquivo), resultado)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import random
+from datetime import date, timedelta
+
+from relatorios_edicao import CABECALHO_EXATO
+
+# Valores "estragados" que aparecem de vez em quando na planilha real
+CELULAS_INVALIDAS = ['abc', '-', '1 1', '#N/A', 'ok', '2,5,1']
+DATAS_INVALIDAS = ['', '31/02/2024', '2024-01-15', 'ontem', '15/13/2024']
+
+
+def gerar_linhas(quantidade, hoje=None, lojas=30, vendedores_por_loja=8, dias=365,
+                 clientes_por_loja=400, taxa_invalidas=0.005, semente=42):
+    """Linhas da aba 'relatorio' como ``get_all_values()`` devolve (sem o cabeçalho).
+
+    As datas vão de ``hoje - dias`` até ``hoje`` em ordem crescente (como a planilha
+    é preenchida), com algumas linhas lançadas com data retroativa. Valores em
+    reais usam vírgula decimal e uma fração ``taxa_invalidas`` das células vem
+    com lixo (texto, datas inválidas, espaços nas pontas).
+    """
+    aleatorio = random.Random(semente)
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=dias)
+    nomes_lojas = [f'LOJA {i:02d}' for i in range(1, lojas + 1)]
+    vendedores = {loja: [f'VENDEDOR {i:02d}-{j}' for j in range(1, vendedores_por_loja + 1)]
+                  for i, loja in enumerate(nomes_lojas, start=1)}
+    usuarios = ['', '', '', 'ADMIN', 'GERENTE']
+
+    def invalida():
+        return aleatorio.random() < taxa_invalidas
+
+    def contagem(chance, negativo=0.0):
+        if invalida():
+            return aleatorio.choice(CELULAS_INVALIDAS)
+        sorteio = aleatorio.random()
+        if sorteio < negativo:
+            return '-1'
+        if sorteio < chance:
+            return str(aleatorio.choice([1, 1, 1, 2]))
+        return aleatorio.choice(['', '', '0'])
+
+    linhas = []
+    for i in range(quantidade):
+        dia = inicio + timedelta(days=(i * (dias + 1)) // max(quantidade, 1))
+        if aleatorio.random() < 0.01:
+            dia -= timedelta(days=aleatorio.randint(1, 30))
+        data = dia.strftime('%d/%m/%Y')
+        if invalida():
+            data = aleatorio.choice(DATAS_INVALIDAS)
+
+        loja = aleatorio.choice(nomes_lojas)
+        vendedor = aleatorio.choice(vendedores[loja])
+        if invalida():
+            loja, vendedor = f' {loja} ', f'{vendedor} '
+
+        receita = ''
+        if aleatorio.random() < 0.3:
+            receita = f'{aleatorio.uniform(50, 2000):.2f}'.replace('.', ',')
+        if invalida():
+            receita = aleatorio.choice(CELULAS_INVALIDAS)
+
+        valores = {
+            'LOJA': loja,
+            'DATA': data,
+            'HORA': f'{aleatorio.randint(9, 19):02d}:{aleatorio.randint(0, 59):02d}',
+            'VENDEDOR': vendedor,
+            'CLIENTE': '' if aleatorio.random() < 0.05 else f'CLIENTE {aleatorio.randint(1, clientes_por_loja)} {loja}',
+            'ATENDIMENTOS': contagem(0.9),
+            'RECEITAS': receita,
+            'PERDAS': contagem(0.1),
+            'VENDAS': contagem(0.25),
+            'RESERVAS': contagem(0.15, negativo=0.03),
+            'PESQUISAS': contagem(0.2),
+            'EXAME DE VISTA': contagem(0.1),
+            'GOOGLE': contagem(0.05),
+            'USUARIO_ALTERACAO': aleatorio.choice(usuarios),
+        }
+        linhas.append([valores[c] for c in CABECALHO_EXATO])
+    return linhas
@@ -0,0 +1,71 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Bibliotecas pesadas que interessa saber se já foram carregadas em cada tela
+MODULOS_PESADOS = ['pandas', 'numpy', 'pyarrow', 'openpyxl', 'streamlit_autorefresh']
+
+# Roda num interpretador novo: uma execução do app.py (como a primeira visita a um servidor recém-iniciado)
+_SCRIPT = '''
+import json, sys, time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_carregado = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+if sys.argv[2] != 'login':
+    at.session_state.autenticado = True
+    at.session_state.usuario_logado = 'BENCHMARK'
+    at.session_state.lojas_permitidas = 'TODAS'
+    at.session_state.tela = sys.argv[2]
+at.run()
+fim = time.perf_counter()
+print(json.dumps({
+    'importar_streamlit': streamlit_carregado - inicio,
+    'primeira_execucao': fim - streamlit_carregado,
+    'erros': [str(e.value) for e in at.exception],
+    'modulos': [m for m in json.loads(sys.argv[3]) if m in sys.modules],
+}))
+'''
+
+
+def medir_tela(tela, repeticoes, app):
+    """Tempo da primeira execução de ``tela`` em ``repeticoes`` processos novos."""
+    tempos, saida = [], None
+    for _ in range(repeticoes):
+        processo = subprocess.run([sys.executable, '-c', _SCRIPT, app, tela, json.dumps(MODULOS_PESADOS)],
+                                  capture_output=True, text=True, check=True)
+        saida = json.loads(processo.stdout.strip().splitlines()[-1])
+        tempos.append(saida['primeira_execucao'])
+    return {
+        'min': round(min(tempos), 4),
+        'mediana': round(statistics.median(tempos), 4),
+        'modulos_carregados': saida['modulos'],
+        'erros': saida['erros'],
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Tempo de partida do app (processo novo até a tela aparecer).')
+    parser.add_argument('--telas', nargs='+', default=['login', 'principal'])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--saida', help='arquivo JSON com o resultado')
+    args = parser.parse_args(argumentos)
+
+    app = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+    resultado = {}
+    for tela in args.telas:
+        resultado[tela] = medir_tela(tela, args.repeticoes, app)
+        medida = resultado[tela]
+        print(f"{tela:<12} {medida['min']:.3f}s (mediana {medida['mediana']:.3f}s)  "
+              f"carregou: {', '.join(medida['modulos_carregados']) or '-'}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
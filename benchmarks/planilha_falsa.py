@@ -0,0 +1,65 @@
+import threading
+import time
+from collections import Counter
+
+from gspread.utils import a1_range_to_grid_range
+
+
+class PlanilhaFalsa:
+    """Worksheet em memória com a parte da API do gspread usada pelo app.
+
+    Cada chamada devolve cópias novas das linhas (como a API, que sempre envia
+    tudo de novo), omite células vazias no fim das linhas e pode simular a
+    latência da rede com ``latencia`` segundos por chamada.
+    """
+
+    def __init__(self, cabecalho, linhas, latencia=0.0, titulo='relatorio'):
+        self.valores = [list(cabecalho)] + [list(l) for l in linhas]
+        self.latencia = latencia
+        self.title = titulo
+        self.id = 0
+        self.chamadas = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def row_count(self):
+        return len(self.valores)
+
+    @property
+    def col_count(self):
+        return max(len(l) for l in self.valores)
+
+    def acrescentar(self, linhas):
+        """Simula outra pessoa adicionando linhas no final da aba."""
+        self.valores.extend(list(l) for l in linhas)
+
+    def get_all_values(self):
+        self._chamada('get_all_values')
+        return [_sem_vazias_no_fim(l) for l in self.valores]
+
+    def batch_get(self, intervalos):
+        self._chamada('batch_get')
+        return [self._intervalo(a1) for a1 in intervalos]
+
+    def _chamada(self, nome):
+        with self._lock:
+            self.chamadas[nome] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def _intervalo(self, a1):
+        grade = a1_range_to_grid_range(a1)
+        inicio, fim = grade.get('startRowIndex', 0), grade.get('endRowIndex', len(self.valores))
+        col_inicio, col_fim = grade.get('startColumnIndex', 0), grade.get('endColumnIndex')
+        linhas = [_sem_vazias_no_fim(l[col_inicio:col_fim]) for l in self.valores[inicio:fim]]
+        # A API também omite as linhas vazias no fim do intervalo
+        while linhas and not linhas[-1]:
+            linhas.pop()
+        return linhas
+
+
+def _sem_vazias_no_fim(linha):
+    linha = list(linha)
+    while linha and linha[-1] == '':
+        linha.pop()
+    return linha
@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from agendador_api import em_paralelo
+from agregacao import COLUNAS_RELATORIOS, BaseRelatorio
+from diagnostico import etapa, registrar_memoria
+from google_planilha import ESTADO_COLUNAS, GooglePlanilha, SincronizadorIncremental
+from snapshot_local import SnapshotLocal
+
+# Tempo (em segundos) que os dados ficam válidos antes de uma nova leitura
+TTL_PADRAO = int(os.environ.get('RELATORIO_CACHE_TTL', '60'))
+# Busca só as linhas novas em cada atualização (0 = sempre baixa a aba inteira)
+SYNC_INCREMENTAL = os.environ.get('RELATORIO_SYNC_INCREMENTAL', '1') != '0'
+# Minutos entre recargas completas da aba, que pegam edições feitas direto na planilha
+# acima das últimas linhas conferidas pela sincronização incremental (0 = nunca)
+RECARGA_COMPLETA_MINUTOS = int(os.environ.get('RELATORIO_RECARGA_COMPLETA_MINUTOS', '30'))
+# Busca só as colunas usadas pelos relatórios (0 = todas as colunas da aba)
+SO_COLUNAS_USADAS = os.environ.get('RELATORIO_SO_COLUNAS_USADAS', '1') != '0'
+# Intervalo (em segundos) para copiar as abas 'vendedor' e 'usuarios' para o espelho local
+TTL_ABAS_ESPELHADAS = int(os.environ.get('SNAPSHOT_ABAS_TTL', '600'))
+
+
+class CacheRelatorio:
+    """Cache compartilhado por todas as sessões com as linhas da aba 'relatorio'.
+
+    Na partida os dados vêm do espelho local (SQLite); depois são mantidos em dia
+    com a planilha a cada ``ttl`` segundos (a aba inteira a cada ``intervalo_recarga``). Enquanto uma sessão sincroniza, as
+    outras recebem a cópia atual sem esperar; se a planilha falhar, continua
+    servindo a última cópia disponível.
+
+    Só as ``colunas`` usadas pelos relatórios são buscadas (None = todas); cada
+    relatório declara as suas e uma coluna nova é buscada sozinha na primeira vez.
+    """
+
+    def __init__(self, ttl=TTL_PADRAO, incremental=SYNC_INCREMENTAL, snapshot=None,
+                 colunas=COLUNAS_RELATORIOS if SO_COLUNAS_USADAS else None,
+                 intervalo_recarga=RECARGA_COMPLETA_MINUTOS * 60 or None):
+        self.ttl = ttl
+        self.versao = 0
+        self.snapshot = snapshot
+        self.sincronizado_em = None
+        self.erro_sincronizacao = None
+        self._sincronizador = SincronizadorIncremental(incremental, colunas, intervalo_recarga)
+        self._carregado_em = 0.0
+        self._abas_espelhadas_em = None
+        self._snapshot_restaurado = snapshot is None
+        self._lock = threading.Lock()
+        self._cabecalho = []
+        self._linhas = None
+        self._versao_recarga = 0
+        self._base = None
+        self._lock_base = threading.Lock()
+        self._lock_gravacao = threading.Lock()
+
+    def _expirado(self):
+        if self._linhas is None:
+            return True
+        return (time.monotonic() - self._carregado_em) > self.ttl
+
+    def obter(self, gsheet=None, forcar=False):
+        """Retorna as linhas em cache, buscando na planilha apenas se expirou (ou se ``forcar``)."""
+        if not forcar and not self._expirado():
+            return self._linhas
+
+        atuais = self._linhas
+        if not forcar and atuais is not None:
+            # ⏳ Já há uma cópia: uma sessão sincroniza e as demais seguem com a cópia atual,
+            # sem esperar (a sincronização pode demorar com a API lenta ou sem cota)
+            if not self._lock.acquire(blocking=False):
+                return atuais
+            try:
+                if self._expirado():
+                    self._atualizar(gsheet, forcar)
+            finally:
+                self._lock.release()
+            return self._linhas
+
+        # 🔒 Sem cópia (ou com ``forcar``): apenas uma sessão busca por vez; as demais
+        # aguardam e reaproveitam o resultado
+        with self._lock:
+            if not self._snapshot_restaurado:
+                self._restaurar_snapshot()
+            if forcar or self._expirado():
+                self._atualizar(gsheet, forcar)
+        return self._linhas
+
+    def _atualizar(self, gsheet, forcar):
+        try:
+            self._sincronizar(gsheet or GooglePlanilha())
+        except Exception as e:
+            if forcar:
+                raise
+            if self._linhas is None and self.snapshot is not None:
+                self._restaurar_snapshot()
+            if self._linhas is None:
+                raise
+            # 🛟 Planilha lenta/indisponível: segue com a cópia atual até o próximo ciclo
+            self.erro_sincronizacao = e
+            self._carregado_em = time.monotonic()
+
+    def obter_base(self, gsheet=None, forcar=False, colunas=None):
+        """``BaseRelatorio`` (DataFrame tipado + índice por data), montada uma vez por versão.
+
+        ``colunas`` são as colunas da aba que quem pede vai ler.
+        """
+        self.obter(gsheet, forcar)
+        if colunas:
+            self.garantir_colunas(colunas, gsheet)
+        return self._montar_base()
+
+    def garantir_colunas(self, colunas, gsheet=None):
+        """Passa a buscar as ``colunas`` que ainda não são buscadas (lendo só elas na planilha)."""
+        if not self._sincronizador.faltando(colunas):
+            return
+        with self._lock:
+            faltando = self._sincronizador.faltando(colunas)
+            if faltando:
+                (gsheet or GooglePlanilha()).completar_colunas(self._sincronizador, faltando, self.snapshot)
+                self._publicar(datetime.now(), completa=True)
+
+    def base_disponivel(self):
+        """``BaseRelatorio`` com o que já está em memória (ou no espelho local), sem consultar a planilha."""
+        with self._lock:
+            if not self._snapshot_restaurado:
+                self._restaurar_snapshot()
+        if self._linhas is None:
+            raise LookupError('Nenhum dado disponível (planilha nunca sincronizada).')
+        return self._montar_base()
+
+    def _montar_base(self):
+        with self._lock_base:
+            with self._lock:
+                cabecalho, linhas = self._cabecalho, self._linhas
+                versao, versao_recarga = self.versao, self._versao_recarga
+            base = self._base
+            if base is None or base.versao != versao:
+                if base is not None and base.versao >= versao_recarga:
+                    # Desde a última montagem só chegaram linhas novas: estende em vez de refazer
+                    self._base = base.estender(linhas, versao)
+                else:
+                    self._base = BaseRelatorio(cabecalho, linhas, versao)
+                registrar_memoria('base_relatorio', len(self._base), self._base.memoria())
+        return self._base
+
+    def _restaurar_snapshot(self):
+        self._snapshot_restaurado = True
+        salvo = self.snapshot.carregar('relatorio')
+        if salvo is None:
+            return
+        cabecalho, linhas, sincronizado_em = salvo
+        self._sincronizador.carregar(cabecalho, linhas, self.snapshot.carregar_estado(ESTADO_COLUNAS))
+        self._publicar(sincronizado_em, completa=True)
+        # A cópia local vale pelo tempo que ainda restava do TTL quando foi gravada
+        idade = (datetime.now() - sincronizado_em).total_seconds()
+        self._carregado_em = time.monotonic() - max(idade, 0)
+
+    def _sincronizar(self, gsheet):
+        tarefas = [lambda: gsheet.sincronizar_relatorio(self._sincronizador, self.snapshot)]
+        espelhar = self.snapshot is not None and (
+            self._abas_espelhadas_em is None
+            or time.monotonic() - self._abas_espelhadas_em > TTL_ABAS_ESPELHADAS)
+        if espelhar:
+            # As abas pequenas são copiadas enquanto a 'relatorio' é sincronizada
+            tarefas.append(lambda: gsheet.espelhar_abas(self.snapshot))
+        completa = em_paralelo(tarefas)[0]
+        if espelhar:
+            self._abas_espelhadas_em = time.monotonic()
+        self.erro_sincronizacao = None
+        self._publicar(datetime.now(), completa)
+        self._carregado_em = time.monotonic()
+
+    def _publicar(self, sincronizado_em, completa):
+        linhas = self._sincronizador.linhas
+        # A versão só muda quando chegaram dados novos
+        if linhas is not self._linhas:
+            self.versao += 1
+            if completa:
+                self._versao_recarga = self.versao
+        self._cabecalho = self._sincronizador.cabecalho
+        self._linhas = linhas
+        self.sincronizado_em = sincronizado_em
+
+    def gravar_alteracoes(self, gsheet, alteracoes):
+        """Grava um salvamento (``ConjuntoAlteracoes``) na aba 'relatorio' e o aplica ao cache.
+
+        Um salvamento por vez no processo: sincronizar, reler as linhas alteradas para
+        conferir conflitos, enviar o lote e aplicá-lo ao cache acontecem sob o mesmo
+        lock, então outro salvamento não desloca as linhas entre a conferência e a
+        gravação. Retorna as linhas em conflito (nada é gravado se houver alguma).
+        """
+        with self._lock_gravacao:
+            # Cópia em dia antes da conferência, para o salvamento ser aplicado a ela no lugar certo
+            self.obter(gsheet, forcar=True)
+            aba = gsheet.aba_relatorio
+            atuais = gsheet.ler_linhas(aba, list(alteracoes.antigas()), len(self._cabecalho))
+            conflitos = alteracoes.conflitos(atuais)
+            if conflitos:
+                return conflitos
+            gsheet.aplicar_lote(aba, *alteracoes.lote())
+            # Só onde o salvamento mexeu, sem recarregar a aba
+            self.aplicar_alteracoes(alteracoes)
+            return []
+
+    def aplicar_alteracoes(self, alteracoes):
+        """Leva para o cache um salvamento (``ConjuntoAlteracoes``) já gravado na planilha.
+
+        Linhas, base tipada, índice por data, rollup e espelho local são
+        atualizados só onde o salvamento mexeu, sem reler a aba: as outras sessões
+        passam a ver a nova versão sem recarga. Se a cópia em memória não tiver os
+        valores antigos das linhas alteradas, ela é descartada e a próxima leitura
+        recarrega a aba. Retorna se o salvamento foi aplicado.
+        """
+        with self._lock_base:
+            with self._lock:
+                base = self._base if self._base is not None and self._base.versao == self.versao else None
+                if self._linhas is None or not self._sincronizador.aplicar_alteracoes(alteracoes):
+                    self._linhas = None
+                    self._sincronizador.reiniciar()
+                    return False
+                self._publicar(self.sincronizado_em, completa=True)
+                linhas, versao = self._linhas, self.versao
+                if self.snapshot is not None:
+                    with etapa('snapshot.alterar_relatorio', **alteracoes.resumo()):
+                        self.snapshot.alterar_linhas(
+                            'relatorio', sorted(alteracoes.excluidas),
+                            {linha: linhas[alteracoes.linha_depois(linha) - 2] for linha in alteracoes.editadas},
+                            linhas[len(linhas) - len(alteracoes.incluidas):])
+            if base is not None:
+                # Sem base montada para a versão anterior, a próxima consulta monta uma do zero
+                with etapa('base.alterar', **alteracoes.resumo()):
+                    self._base = base.alterar(linhas, versao, alteracoes)
+                registrar_memoria('base_relatorio', len(self._base), self._base.memoria())
+        return True
+
+
+@st.cache_resource
+def _cache_compartilhado():
+    return CacheRelatorio(snapshot=SnapshotLocal())
+
+
+def obter_cache():
+    """O ``CacheRelatorio`` do processo (para quem precisa de mais que os atalhos abaixo)."""
+    return _cache_compartilhado()
+
+
+def obter_base(gsheet=None, forcar=False, colunas=None):
+    """``BaseRelatorio`` compartilhada (somente leitura: use ``.copy()`` antes de alterar)."""
+    return _cache_compartilhado().obter_base(gsheet, forcar, colunas)
+
+
+def garantir_colunas(colunas):
+    """Garante que as ``colunas`` da aba 'relatorio' estão sendo buscadas."""
+    _cache_compartilhado().garantir_colunas(colunas)
+
+
+def lojas_do_usuario():
+    """Lojas que o usuário logado pode ver: ``None`` = todas; senão um ``frozenset``."""
+    permitidas = st.session_state.get('lojas_permitidas')
+    if permitidas is None or permitidas == 'TODAS':
+        return None
+    return frozenset(permitidas)
+
+
+def visao_do_usuario(base):
+    """Recorte de ``base`` com só as lojas do usuário logado (a própria base se ele vê todas)."""
+    lojas = lojas_do_usuario()
+    return base if lojas is None else base.visao(lojas)
+
+
+def obter_visao(gsheet=None, forcar=False, colunas=None):
+    """Como ``obter_base``, mas limitada às lojas do usuário logado."""
+    return visao_do_usuario(obter_base(gsheet, forcar, colunas))
+
+
+def versao_dados():
+    """Número que muda sempre que os dados são recarregados."""
+    return _cache_compartilhado().versao
+
+
+def gravar_alteracoes(gsheet, alteracoes):
+    """Grava um salvamento na planilha e atualiza o cache compartilhado; retorna as linhas em conflito."""
+    return _cache_compartilhado().gravar_alteracoes(gsheet, alteracoes)
+
+
+def exibir_horario_dados():
+    """Mostra de quando são os dados exibidos ("dados de HH:MM")."""
+    cache = _cache_compartilhado()
+    if cache.sincronizado_em is None:
+        return
+    texto = f'🕒 dados de {cache.sincronizado_em:%H:%M}'
+    if cache.erro_sincronizacao is not None:
+        texto += ' (planilha indisponível, exibindo cópia local)'
+    st.caption(texto)
@@ -0,0 +1,263 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import streamlit as st
+
+# Grava um log JSON por execução da tela e por chamada feita fora das sessões (0 = desliga)
+LOG_DIAGNOSTICO = os.environ.get('DIAGNOSTICO_LOG', '1') != '0'
+# Leituras por minuto permitidas pela cota do projeto na API do Sheets
+COTA_POR_MINUTO = int(os.environ.get('SHEETS_COTA_MINUTO', '60'))
+# Usuários que veem o painel "Diagnóstico" (vazio = quem tem acesso a TODAS as lojas)
+ADMINS = [u.strip().upper() for u in os.environ.get('DIAGNOSTICO_ADMINS', '').split(',') if u.strip()]
+# Fração da cota a partir da qual um alerta é registrado no log
+ALERTA_COTA = 0.8
+
+logger = logging.getLogger('relatorios.diagnostico')
+if LOG_DIAGNOSTICO and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_local = threading.local()
+# Memória das estruturas compartilhadas pelo processo: {nome: {'linhas': n, 'bytes': {parte: bytes}}}
+_memoria = {}
+
+
+def _log(evento, nivel=logging.INFO):
+    if LOG_DIAGNOSTICO:
+        logger.log(nivel, json.dumps({'ts': datetime.now().isoformat(timespec='milliseconds'), **evento},
+                                     ensure_ascii=False, default=str))
+
+
+class ContadorCota:
+    """Chamadas à API nos últimos ``janela`` segundos, somando todas as sessões do processo."""
+
+    def __init__(self, cota=COTA_POR_MINUTO, janela=60.0):
+        self.cota = cota
+        self.janela = janela
+        self._chamadas = deque()
+        self._alertado = False
+        self._lock = threading.Lock()
+
+    def registrar(self):
+        """Conta uma chamada; retorna quantas houve na janela."""
+        agora = time.monotonic()
+        with self._lock:
+            self._chamadas.append(agora)
+            quantidade = self._descartar_antigas(agora)
+            perto_do_limite = quantidade >= self.cota * ALERTA_COTA
+            alertar, self._alertado = perto_do_limite and not self._alertado, perto_do_limite
+        if alertar:
+            _log({'evento': 'cota_proxima_do_limite', 'chamadas_ultimo_minuto': quantidade, 'cota': self.cota},
+                 logging.WARNING)
+        return quantidade
+
+    def no_ultimo_minuto(self):
+        with self._lock:
+            return self._descartar_antigas(time.monotonic())
+
+    def _descartar_antigas(self, agora):
+        while self._chamadas and agora - self._chamadas[0] > self.janela:
+            self._chamadas.popleft()
+        return len(self._chamadas)
+
+
+@st.cache_resource
+def contador_cota():
+    return ContadorCota()
+
+
+class RegistroExecucao:
+    """O que aconteceu em uma execução (rerun) de uma tela: etapas e chamadas à API."""
+
+    def __init__(self, tela, usuario=None):
+        self.tela = tela
+        self.usuario = usuario
+        self.iniciado_em = datetime.now()
+        self.inicio = time.perf_counter()
+        self.fim = self.inicio
+        self.etapas = []
+        self.chamadas = 0
+        self.bytes = 0
+        self.tempo_api = 0.0
+        self.erros_api = 0
+        self.perfil = None
+        # Leituras em paralelo registram de várias threads na mesma execução
+        self._lock = threading.Lock()
+
+    def etapa(self, nome, duracao, **dados):
+        with self._lock:
+            self.etapas.append({'etapa': nome, 'segundos': round(duracao, 4), **dados})
+            self.fim = time.perf_counter()
+
+    def chamada(self, duracao, tamanho, erro):
+        with self._lock:
+            self.chamadas += 1
+            self.bytes += tamanho
+            self.tempo_api += duracao
+            self.erros_api += int(erro)
+            self.fim = time.perf_counter()
+
+    def resumo(self, interrompida=False):
+        return {
+            'evento': 'execucao',
+            'tela': self.tela,
+            'usuario': self.usuario,
+            'iniciado_em': self.iniciado_em.isoformat(timespec='seconds'),
+            'segundos': round(self.fim - self.inicio, 4),
+            'interrompida': interrompida,
+            'chamadas_api': self.chamadas,
+            'bytes_api': self.bytes,
+            'segundos_api': round(self.tempo_api, 4),
+            'erros_api': self.erros_api,
+            'chamadas_ultimo_minuto': contador_cota().no_ultimo_minuto(),
+            'etapas': self.etapas,
+        }
+
+
+def iniciar_execucao(tela):
+    """Abre o registro da execução atual da sessão (chamar no início do app)."""
+    anterior = st.session_state.pop('_diagnostico_execucao', None)
+    if anterior is not None:
+        # A execução anterior não chegou ao fim (st.stop/st.rerun): fecha com o que foi medido
+        _fechar(anterior, interrompida=True)
+    registro = RegistroExecucao(tela, st.session_state.get('usuario_logado'))
+    if st.session_state.pop('diagnostico_perfilar', False):
+        registro.perfil = cProfile.Profile()
+        registro.perfil.enable()
+    st.session_state._diagnostico_execucao = registro
+    _local.execucao = registro
+
+
+def finalizar_execucao():
+    """Fecha o registro da execução atual (chamar no fim do app)."""
+    registro = st.session_state.pop('_diagnostico_execucao', None)
+    if registro is not None:
+        registro.fim = time.perf_counter()
+        _fechar(registro)
+
+
+def _fechar(registro, interrompida=False):
+    _local.execucao = None
+    resumo = registro.resumo(interrompida)
+    _log(resumo)
+    st.session_state.diagnostico_ultima = resumo
+    if registro.perfil is not None:
+        try:
+            registro.perfil.disable()
+        except Exception:
+            pass
+        saida = io.StringIO()
+        pstats.Stats(registro.perfil, stream=saida).sort_stats('cumulative').print_stats(40)
+        st.session_state.diagnostico_perfil = saida.getvalue()
+
+
+def na_execucao_atual(funcao):
+    """``funcao`` para rodar em outra thread contando etapas e chamadas na execução atual."""
+    registro = getattr(_local, 'execucao', None)
+
+    def executar(*args, **kwargs):
+        anterior = getattr(_local, 'execucao', None)
+        _local.execucao = registro
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            _local.execucao = anterior
+    return executar
+
+
+def registrar_etapa(nome, duracao, **dados):
+    registro = getattr(_local, 'execucao', None)
+    if registro is not None:
+        registro.etapa(nome, duracao, **dados)
+    else:
+        _log({'evento': 'etapa', 'etapa': nome, 'segundos': round(duracao, 4), **dados})
+
+
+@contextmanager
+def etapa(nome, **dados):
+    """Mede o bloco como uma etapa; o dict devolvido aceita dados extras (ex.: ``linhas``)."""
+    inicio = time.perf_counter()
+    try:
+        yield dados
+    finally:
+        registrar_etapa(nome, time.perf_counter() - inicio, **dados)
+
+
+class Cronometro:
+    """Mede etapas sequenciais de um relatório: cada ``etapa`` conta o tempo desde a anterior."""
+
+    def __init__(self, relatorio):
+        self.relatorio = relatorio
+        self._marca = time.perf_counter()
+
+    def etapa(self, nome, linhas=None):
+        agora = time.perf_counter()
+        dados = {} if linhas is None else {'linhas': int(linhas)}
+        registrar_etapa(f'{self.relatorio}.{nome}', agora - self._marca, **dados)
+        self._marca = agora
+
+
+def registrar_chamada_api(metodo, endpoint, duracao, tamanho, status):
+    """Conta uma chamada à API do Sheets na cota e na execução atual."""
+    no_minuto = contador_cota().registrar()
+    erro = status is None or status >= 400
+    registro = getattr(_local, 'execucao', None)
+    if registro is not None:
+        registro.chamada(duracao, tamanho, erro)
+    else:
+        # Fora de uma sessão (ex.: monitor do tempo real)
+        _log({'evento': 'chamada_api', 'metodo': metodo, 'endpoint': endpoint, 'status': status,
+              'segundos': round(duracao, 4), 'bytes': tamanho, 'chamadas_ultimo_minuto': no_minuto})
+
+
+def registrar_memoria(nome, linhas, partes):
+    """Registra os bytes (``{parte: bytes}``) de uma estrutura compartilhada ao ser montada."""
+    _memoria[nome] = {'linhas': linhas, 'bytes': partes}
+    _log({'evento': 'memoria', 'estrutura': nome, 'linhas': linhas,
+          'mb': round(sum(partes.values()) / 2**20, 2), 'bytes': partes})
+
+
+def eh_admin():
+    usuario = str(st.session_state.get('usuario_logado') or '').upper()
+    if ADMINS:
+        return usuario in ADMINS
+    return st.session_state.get('lojas_permitidas') == 'TODAS' and not usuario.startswith('LOJA')
+
+
+def painel():
+    """Painel "Diagnóstico" da barra lateral com a última execução desta sessão."""
+    with st.expander('🩺 Diagnóstico'):
+        cota = contador_cota()
+        st.caption(f'API: {cota.no_ultimo_minuto()} chamadas no último minuto (cota {cota.cota}/min)')
+        for nome, medida in list(_memoria.items()):
+            partes = ' · '.join(f'{parte} {b / 2**20:.1f} MB' for parte, b in medida['bytes'].items())
+            st.caption(f"Memória ({nome}, {medida['linhas']} linhas): {partes}")
+
+        ultima = st.session_state.get('diagnostico_ultima')
+        if ultima:
+            st.markdown(
+                f"**Última execução** ({ultima['tela']}): {ultima['segundos']:.2f}s · "
+                f"{ultima['chamadas_api']} chamadas · {ultima['bytes_api'] / 1024:.0f} KB · "
+                f"API {ultima['segundos_api']:.2f}s")
+            if ultima['etapas']:
+                import pandas as pd  # só aqui: o login e o menu não carregam o pandas
+                st.dataframe(pd.DataFrame(ultima['etapas']), hide_index=True, width='stretch')
+
+        if st.button('🔬 Perfilar a próxima execução', width='stretch'):
+            st.session_state.diagnostico_perfilar = True
+            st.rerun()
+        perfil = st.session_state.get('diagnostico_perfil')
+        if perfil:
+            st.download_button('📥 Perfil (cProfile)', perfil, 'perfil.txt', width='stretch')
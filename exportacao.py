@@ -0,0 +1,111 @@
+import io
+import os
+import threading
+from collections import OrderedDict
+from importlib.util import find_spec
+
+import pandas as pd
+import streamlit as st
+
+from dados_relatorio import lojas_do_usuario, versao_dados
+
+# Quantos arquivos exportados ficam guardados em memória (os mais antigos saem primeiro)
+ITENS_CACHE_EXPORTACAO = int(os.environ.get('EXPORTACAO_CACHE_ITENS', '32'))
+
+
+def gerar_excel(df):
+    """Excel em modo write-only do openpyxl: cada linha vai direto para o arquivo, sem montar células."""
+    from openpyxl import Workbook  # importado só quando alguém baixa um Excel
+    livro = Workbook(write_only=True)
+    aba = livro.create_sheet('Relatorio')
+    aba.append([str(c) for c in df.columns])
+    for linha in df.itertuples(index=False, name=None):
+        aba.append([_celula(v) for v in linha])
+    buffer = io.BytesIO()
+    livro.save(buffer)
+    return buffer.getvalue()
+
+
+def gerar_csv(df):
+    """CSV separado por ';' e com BOM, como o Excel em português espera."""
+    return df.to_csv(index=False, sep=';').encode('utf-8-sig')
+
+
+def gerar_parquet(df):
+    # Colunas de texto podem misturar tipos (ex.: 0 no lugar de vazio); o Parquet exige um só
+    textos = {c: str for c in df.columns if df[c].dtype == object}
+    buffer = io.BytesIO()
+    df.astype(textos).to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _celula(valor):
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+# formato: (rótulo do botão, mime, gerador)
+FORMATOS = {
+    'xlsx': ('📥 Excel', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', gerar_excel),
+    'csv': ('📥 CSV', 'text/csv', gerar_csv),
+}
+# pyarrow (necessário para Parquet, está no requirements.txt) só é importado pelo pandas ao gerar o arquivo;
+# sem ele o formato não é oferecido
+if find_spec('pyarrow') is not None:
+    FORMATOS['parquet'] = ('📥 Parquet', 'application/vnd.apache.parquet', gerar_parquet)
+
+
+class CacheExportacao:
+    """Arquivos já gerados, por (relatório, filtros, versão dos dados, formato).
+
+    Baixar de novo o mesmo relatório com os mesmos filtros e dados não gera o
+    arquivo outra vez. Guarda no máximo ``itens`` arquivos.
+    """
+
+    def __init__(self, itens=ITENS_CACHE_EXPORTACAO):
+        self.itens = itens
+        self._arquivos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar):
+        with self._lock:
+            if chave in self._arquivos:
+                self._arquivos.move_to_end(chave)
+                return self._arquivos[chave]
+        conteudo = gerar()
+        with self._lock:
+            self._arquivos[chave] = conteudo
+            while len(self._arquivos) > self.itens:
+                self._arquivos.popitem(last=False)
+        return conteudo
+
+
+@st.cache_resource
+def _cache_exportacao():
+    return CacheExportacao()
+
+
+def botoes_exportacao(df, relatorio, nome_arquivo, filtros=(), versao=None):
+    """Botões de download do ``df`` exibido; cada arquivo só é gerado quando alguém clica.
+
+    ``filtros`` são os valores escolhidos na tela e ``versao`` identifica os dados
+    (padrão: versão do cache da aba 'relatorio'). As lojas do usuário entram na
+    chave: o cache é do processo e um arquivo nunca é servido a quem não vê as
+    mesmas lojas.
+    """
+    cache = _cache_exportacao()
+    lojas = lojas_do_usuario()
+    chave = (relatorio, tuple(str(f) for f in filtros), versao_dados() if versao is None else versao,
+             None if lojas is None else tuple(sorted(lojas)))
+
+    for coluna, (formato, (rotulo, mime, gerar)) in zip(st.columns(len(FORMATOS)), FORMATOS.items()):
+        coluna.download_button(
+            rotulo,
+            data=lambda formato=formato, gerar=gerar: cache.obter(chave + (formato,), lambda: gerar(df)),
+            file_name=f'{nome_arquivo}.{formato}',
+            mime=mime,
+            key=f'exportar_{relatorio}_{formato}',
+            on_click='ignore',
+            width='stretch',
+        )
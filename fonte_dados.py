@@ -0,0 +1,46 @@
+import os
+
+# Origem dos dados: 'google' (planilha no Google Sheets) ou 'local' (réplica em SQLite)
+FONTE_DADOS = os.environ.get('FONTE_DADOS', 'google').strip().lower()
+
+
+class FonteDados:
+    """Origem das abas usadas pelo app.
+
+    Implementações: ``ConexaoPlanilha`` (Google Sheets, em ``google_planilha``) e
+    ``PlanilhaLocal`` (SQLite, em ``planilha_local``). As abas devolvidas por
+    ``aba`` seguem a parte da API de worksheet do gspread que o app usa:
+    ``get_all_values()``, ``batch_get(intervalos_a1)``, ``get_all_records()``,
+    ``update_cell(linha, coluna, valor)`` e os atributos ``id``, ``row_count`` e
+    ``col_count`` (tamanho da aba, usado para ler abas grandes em blocos).
+    """
+
+    def preparar(self):
+        """Chamado antes de cada uso (ex.: renovar o token de acesso)."""
+
+    def aba(self, nome):
+        """Aba ``nome`` ou None se não existir."""
+        raise NotImplementedError
+
+    def renovar_abas(self):
+        """Descarta os metadados guardados das abas (ex.: ``row_count``); a próxima ``aba`` os relê."""
+
+    def aplicar_lote(self, aba, excluir=(), editar=None, incluir=()):
+        """Aplica exclusões, edições e inclusões de uma vez (tudo ou nada).
+
+        ``excluir`` são números de linha, ``editar`` é ``{linha: valores}`` e
+        ``incluir`` é uma lista de linhas novas; os números de linha referem-se à
+        aba antes do lote. Retorna quantas operações foram enviadas.
+        """
+        raise NotImplementedError
+
+
+def abrir_fonte(fonte=FONTE_DADOS):
+    """Cria a fonte configurada em ``FONTE_DADOS``."""
+    if fonte == 'google':
+        from google_planilha import ConexaoPlanilha
+        return ConexaoPlanilha()
+    if fonte == 'local':
+        from planilha_local import PlanilhaLocal
+        return PlanilhaLocal.abrir()
+    raise ValueError(f"FONTE_DADOS inválida: '{fonte}' (use 'google' ou 'local').")
@@ -1,70 +1,544 @@
 import gspread
+from google.auth.transport.requests import Request
 from gspread.exceptions import APIError, SpreadsheetNotFound
+from gspread.http_client import HTTPClient
+from gspread.utils import rowcol_to_a1
 import streamlit as st
+import hashlib
+import math
+import numbers
 import os
+import threading
+import time
 
-class GooglePlanilha:
-    def __init__(self):
-        """Inicializa a conexão com o Google Sheets."""
-        if 'gsheets_client' not in st.session_state:
-            self._criar_conexao()
-        else:
-            self.client = st.session_state.gsheets_client
-            self.planilha = st.session_state.planilha_atendimento
-            self.aba_vendedores = self._get_worksheet("vendedor")
-            self.aba_relatorio = self._get_worksheet("relatorio")
-            self.aba_usuarios = self._get_worksheet("usuarios")
-
-    def _criar_conexao(self):
-        """Cria conexão usando Service Account (sem OAuth)."""
+from agendador_api import eh_sobrecarga, em_paralelo, obter_agendador
+from diagnostico import etapa, registrar_chamada_api
+from fonte_dados import FonteDados, abrir_fonte
+
+NOME_PLANILHA = os.environ.get('PLANILHA_NOME', "fluxo de loja")
+# Estado do espelho local com as colunas da aba 'relatorio' que ele tem
+ESTADO_COLUNAS = 'colunas_relatorio'
+# Linhas por bloco na carga completa de uma aba grande (os blocos são lidos em paralelo)
+BLOCO_LINHAS = int(os.environ.get('SHEETS_BLOCO_LINHAS', '20000'))
+
+
+def _credenciais():
+    """Credenciais da Service Account: variáveis de ambiente (produção) ou st.secrets (local)."""
+    if 'GCP_PROJECT_ID' in os.environ:
+        return {
+            "type": "service_account",
+            "project_id": os.environ["GCP_PROJECT_ID"],
+            "private_key_id": os.environ["GCP_PRIVATE_KEY_ID"],
+            "private_key": os.environ["GCP_PRIVATE_KEY"].replace("\\n", "\n"),
+            "client_email": os.environ["GCP_CLIENT_EMAIL"],
+            "client_id": os.environ["GCP_CLIENT_ID"],
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "client_x509_cert_url": os.environ["GCP_CLIENT_X509_CERT_URL"],
+            "universe_domain": "googleapis.com"
+        }
+    return st.secrets["gcp_service_account"]
+
+
+class HTTPClientMedido(HTTPClient):
+    """Cliente HTTP do gspread que contabiliza cada chamada (tempo, bytes, status) no diagnóstico."""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        inicio = time.perf_counter()
+        resposta, status = None, None
         try:
-            # 🔹 Credenciais: produção ou local
-            if 'GCP_PROJECT_ID' in os.environ:
-                credenciais = {
-                    "type": "service_account",
-                    "project_id": os.environ["GCP_PROJECT_ID"],
-                    "private_key_id": os.environ["GCP_PRIVATE_KEY_ID"],
-                    "private_key": os.environ["GCP_PRIVATE_KEY"].replace("\\n", "\n"),
-                    "client_email": os.environ["GCP_CLIENT_EMAIL"],
-                    "client_id": os.environ["GCP_CLIENT_ID"],
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                    "client_x509_cert_url": os.environ["GCP_CLIENT_X509_CERT_URL"],
-                    "universe_domain": "googleapis.com"
-                }
-            else:
-                credenciais = st.secrets["gcp_service_account"]
+            resposta = super().request(method, endpoint, *args, **kwargs)
+            status = resposta.status_code
+            return resposta
+        except APIError as e:
+            resposta = e.response
+            status = e.response.status_code
+            raise
+        finally:
+            tamanho = len(resposta.content) if resposta is not None else 0
+            registrar_chamada_api(method, endpoint, time.perf_counter() - inicio, tamanho, status)
+
+
+class HTTPClientAgendado(HTTPClientMedido):
+    """Envia cada chamada pelo agendador do processo (cota, novas tentativas, leituras compartilhadas)."""
+
+    def request(self, method, endpoint, *args, **kwargs):
+        chave = None
+        if method.lower() == 'get':
+            chave = (endpoint, repr(args), repr(sorted(kwargs.items())))
+        return obter_agendador().executar(
+            method, lambda: super(HTTPClientAgendado, self).request(method, endpoint, *args, **kwargs), chave)
+
+
+class ConexaoPlanilha(FonteDados):
+    """Fonte Google Sheets: cliente, planilha e abas compartilhados por todas as sessões do processo.
+
+    As abas são resolvidas todas de uma vez (uma chamada) na primeira vez que
+    alguém usa uma delas, e reaproveitadas depois.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conectar()
+
+    def _conectar(self):
+        self.client = gspread.service_account_from_dict(_credenciais(), http_client=HTTPClientAgendado)
+        self.planilha = self.client.open(NOME_PLANILHA)
+        self._abas = {}
+
+    def aba(self, nome):
+        """Worksheet ``nome`` (ou None se não existir), buscada uma única vez."""
+        with self._lock:
+            if nome not in self._abas:
+                # Os metadados da planilha trazem todas as abas: as outras já ficam resolvidas
+                self._abas.update((aba.title, aba) for aba in self.planilha.worksheets())
+                self._abas.setdefault(nome, None)
+            return self._abas[nome]
+
+    def renovar_abas(self):
+        # A próxima ``aba`` relê os metadados (o tamanho da grade pode ter mudado por fora do app)
+        with self._lock:
+            self._abas = {}
+
+    def preparar(self):
+        self.garantir_token()
+
+    def garantir_token(self):
+        """Renova o token expirado; se não for possível, autentica novamente."""
+        credenciais = self.client.http_client.auth
+        if credenciais.valid:
+            return
+        with self._lock:
+            if credenciais is not self.client.http_client.auth or credenciais.valid:
+                return
+            try:
+                credenciais.refresh(Request())
+            except Exception:
+                self._conectar()
 
-            # ✅ Conecta
-            client = gspread.service_account_from_dict(credenciais)
-            st.session_state.gsheets_client = client
+    def aplicar_lote(self, aba, excluir=(), editar=None, incluir=()):
+        """Aplica exclusões, edições e inclusões em uma única chamada ``batch_update``.
 
-            # ✅ Abre planilha
-            planilha = client.open("fluxo de loja")
-            st.session_state.planilha_atendimento = planilha
-            self.planilha = planilha
-            self.aba_vendedores = self._get_worksheet("vendedor")
-            self.aba_relatorio = self._get_worksheet("relatorio")
-            self.aba_usuarios = self._get_worksheet("usuarios")
+        A API aplica todas as requisições do lote ou nenhuma, então a aba nunca fica
+        atualizada pela metade (argumentos como em ``FonteDados.aplicar_lote``).
+        """
+        requisicoes = []
+        # 1. Edições primeiro, enquanto os números de linha ainda são os originais
+        for linha, valores in sorted((editar or {}).items()):
+            requisicoes.append({'updateCells': {
+                'rows': [_para_celulas(valores)],
+                'fields': 'userEnteredValue',
+                'start': {'sheetId': aba.id, 'rowIndex': linha - 1, 'columnIndex': 0},
+            }})
+        # 2. Exclusões agrupadas em intervalos, de baixo para cima para não deslocar as demais
+        for inicio, fim in reversed(agrupar_intervalos(excluir)):
+            requisicoes.append({'deleteDimension': {'range': {
+                'sheetId': aba.id, 'dimension': 'ROWS', 'startIndex': inicio - 1, 'endIndex': fim,
+            }}})
+        # 3. Inclusões no final da aba
+        if incluir:
+            requisicoes.append({'appendCells': {
+                'sheetId': aba.id,
+                'rows': [_para_celulas(valores) for valores in incluir],
+                'fields': 'userEnteredValue',
+            }})
+        if requisicoes:
+            self.planilha.batch_update({'requests': requisicoes})
+        if excluir:
+            # A grade da aba encolheu: o tamanho guardado nos metadados (row_count) ficou velho
+            self.renovar_abas()
+        return len(requisicoes)
 
-            st.success("✅ Planilha carregada com sucesso!")
+
+@st.cache_resource
+def _conexao_compartilhada():
+    # Google Sheets ou réplica local, conforme FONTE_DADOS
+    return abrir_fonte()
+
+
+class GooglePlanilha:
+    def __init__(self):
+        """Inicializa a conexão com a planilha (compartilhada entre as sessões)."""
+        try:
+            self.conexao = _conexao_compartilhada()
+            self.conexao.preparar()
+
+            if not st.session_state.get('planilha_conectada'):
+                st.session_state.planilha_conectada = True
+                st.success("✅ Planilha carregada com sucesso!")
 
         except SpreadsheetNotFound:
-            st.error("❌ Planilha 'fluxo de loja' não encontrada.")
+            st.error(f"❌ Planilha '{NOME_PLANILHA}' não encontrada.")
             st.markdown("💡 Compartilhe com: `seu-email@projeto.iam.gserviceaccount.com` como **Editor**.")
             st.stop()
         except APIError as e:
-            st.error(f"🔐 Erro de autenticação: {e}")
+            if eh_sobrecarga(e):
+                st.error("⏳ O Google Sheets está sobrecarregado no momento. Aguarde alguns instantes e tente novamente.")
+            else:
+                st.error(f"🔐 Erro de autenticação: {e}")
             st.stop()
         except Exception as e:
             st.error(f"❌ Falha ao conectar: {e}")
             st.stop()
 
+    @classmethod
+    def em_segundo_plano(cls):
+        """Instância sem mensagens na tela, para threads fora de uma sessão (ex.: monitores)."""
+        gsheet = cls.__new__(cls)
+        gsheet.conexao = _conexao_compartilhada()
+        gsheet.conexao.preparar()
+        return gsheet
+
+    @property
+    def aba_vendedores(self):
+        return self._get_worksheet("vendedor")
+
+    @property
+    def aba_relatorio(self):
+        return self._get_worksheet("relatorio")
+
+    @property
+    def aba_usuarios(self):
+        return self._get_worksheet("usuarios")
+
     def _get_worksheet(self, name: str):
         """Retorna worksheet ou None se não existir."""
-        try:
-            return self.planilha.worksheet(name)
-        except gspread.exceptions.WorksheetNotFound:
+        aba = self.conexao.aba(name)
+        if aba is None:
             st.warning(f"⚠️ Aba '{name}' não encontrada.")
-            return None
\ No newline at end of file
+        return aba
+
+    def sincronizar_relatorio(self, sincronizador, snapshot=None):
+        """Atualiza o sincronizador da aba 'relatorio' e replica as mudanças no espelho local."""
+        qtd_antes = len(sincronizador.linhas)
+        with etapa('planilha.sincronizar_relatorio') as dados:
+            completa = sincronizador.sincronizar(self.aba_relatorio, self._aba_renovada)
+            dados['completa'] = completa
+            dados['linhas'] = len(sincronizador.linhas) if completa else len(sincronizador.linhas) - qtd_antes
+        if snapshot is not None:
+            with etapa('snapshot.gravar_relatorio'):
+                if completa:
+                    _gravar_relatorio(snapshot, sincronizador)
+                else:
+                    snapshot.acrescentar('relatorio', sincronizador.linhas[qtd_antes:])
+        return completa
+
+    def _aba_renovada(self):
+        """Aba 'relatorio' com os metadados relidos (linhas excluídas na planilha encolhem a grade)."""
+        self.conexao.renovar_abas()
+        return self.aba_relatorio
+
+    def completar_colunas(self, sincronizador, nomes, snapshot=None):
+        """Busca colunas da aba 'relatorio' que passaram a ser usadas e regrava o espelho local."""
+        with etapa('planilha.completar_colunas', colunas=sorted(nomes)):
+            sincronizador.adicionar_colunas(self.aba_relatorio, nomes)
+        if snapshot is not None:
+            with etapa('snapshot.gravar_relatorio'):
+                _gravar_relatorio(snapshot, sincronizador)
+
+    def ler_linhas(self, aba, numeros, largura):
+        """{número: valores} das linhas inteiras ``numeros`` da aba, numa chamada (trechos contíguos juntos)."""
+        intervalos = agrupar_intervalos(numeros)
+        if not intervalos:
+            return {}
+        with etapa('planilha.ler_linhas', linhas=len(intervalos)):
+            respostas = aba.batch_get([f'A{i}:{_letra(largura - 1)}{j}' for i, j in intervalos])
+        linhas = {}
+        for (inicio, fim), resposta in zip(intervalos, respostas):
+            for numero in range(inicio, fim + 1):
+                valores = list(resposta[numero - inicio]) if numero - inicio < len(resposta) else []
+                linhas[numero] = valores[:largura] + [''] * (largura - len(valores))
+        return linhas
+
+    def espelhar_abas(self, snapshot):
+        """Copia as abas pequenas ('vendedor' e 'usuarios') inteiras para o espelho local, lidas juntas."""
+        abas = [(nome, aba) for nome, aba in (('vendedor', self.aba_vendedores), ('usuarios', self.aba_usuarios))
+                if aba is not None]
+        with etapa('planilha.espelhar_abas') as dados:
+            for (nome, _), valores in zip(abas, em_paralelo([aba.get_all_values for _, aba in abas])):
+                snapshot.substituir(nome, valores[0] if valores else [], valores[1:])
+                dados[nome] = max(len(valores) - 1, 0)
+
+    def aplicar_lote(self, aba, excluir=(), editar=None, incluir=()):
+        """Aplica exclusões, edições e inclusões de uma vez, na fonte configurada."""
+        with etapa('planilha.aplicar_lote', excluir=len(excluir), editar=len(editar or {}), incluir=len(incluir)):
+            return self.conexao.aplicar_lote(aba, excluir, editar, incluir)
+
+
+def ler_aba(aba, bloco=BLOCO_LINHAS, colunas=None, primeira=1, ultima=None):
+    """Valores da aba, como ``get_all_values()``, lidos em blocos de ``bloco`` linhas em paralelo.
+
+    O número de blocos sai do tamanho da grade nos metadados (``row_count`` e
+    ``col_count``); o último bloco não tem fim, então linhas acrescentadas depois
+    dos metadados também vêm. Abas pequenas (ou sem esses atributos) são lidas
+    numa chamada só.
+
+    Com ``colunas`` (posições a partir de 0) só essas colunas são buscadas, em
+    intervalos de colunas vizinhas; as demais voltam vazias. ``primeira`` e
+    ``ultima`` limitam as linhas lidas (numeração da planilha).
+    """
+    total, largura = getattr(aba, 'row_count', None), getattr(aba, 'col_count', None)
+    inteira = colunas is None
+    if inteira:
+        if primeira == 1 and ultima is None and (not total or not largura or total <= bloco):
+            return aba.get_all_values()
+        colunas = range(largura)
+    grupos = agrupar_intervalos(colunas)
+    fim = ultima or total or primeira
+    inicios = list(range(primeira, max(fim, primeira) + 1, bloco))
+    limites = [i + bloco - 1 for i in inicios[:-1]] + [ultima]
+    try:
+        with etapa('planilha.ler_em_blocos', blocos=len(inicios)):
+            blocos = em_paralelo([lambda i=i, f=f: _ler_bloco(aba, grupos, i, f) for i, f in zip(inicios, limites)])
+    except APIError as e:
+        if eh_sobrecarga(e) or not inteira or primeira != 1 or ultima is not None:
+            raise
+        # Grade menor que a dos metadados (linhas excluídas por fora do app): lê de uma vez
+        return aba.get_all_values()
+
+    valores = []
+    for inicio, linhas in zip(inicios, blocos):
+        if linhas:
+            # A API omite as linhas vazias no fim de cada bloco: completa antes de emendar o próximo
+            valores += [[] for _ in range(inicio - primeira - len(valores))]
+            valores += linhas
+    largura = max((len(l) for l in valores), default=0) if inteira else max(colunas, default=-1) + 1
+    return [list(l) + [''] * (largura - len(l)) for l in valores]
+
+
+def _letra(coluna):
+    """Letra da coluna na notação A1 (0 = A)."""
+    return rowcol_to_a1(1, coluna + 1).rstrip('0123456789')
+
+
+def _ler_bloco(aba, grupos, inicio, fim=None):
+    """Linhas ``inicio``..``fim`` (sem ``fim``: até o final) de cada grupo de colunas, numa chamada."""
+    ate = '' if fim is None else fim
+    respostas = aba.batch_get([f'{_letra(a)}{inicio}:{_letra(b)}{ate}' for a, b in grupos])
+    if len(grupos) == 1 and grupos[0][0] == 0:
+        return respostas[0]
+    return _juntar(respostas, grupos)
+
+
+def _juntar(respostas, grupos):
+    """Linhas inteiras a partir das respostas de cada grupo de colunas (as ausentes ficam vazias)."""
+    largura = grupos[-1][1] + 1 if grupos else 0
+    linhas = [[''] * largura for _ in range(max((len(r) for r in respostas), default=0))]
+    for resposta, (a, _) in zip(respostas, grupos):
+        for linha, valores in zip(linhas, resposta):
+            linha[a:a + len(valores)] = valores
+    return linhas
+
+
+def _gravar_relatorio(snapshot, sincronizador):
+    snapshot.substituir('relatorio', sincronizador.cabecalho, sincronizador.linhas)
+    colunas = sincronizador.colunas
+    snapshot.salvar_estado(ESTADO_COLUNAS, None if colunas is None else sorted(colunas))
+
+
+def agrupar_intervalos(linhas):
+    """Agrupa números de linha em intervalos contíguos: [5, 2, 3, 7, 6] -> [(2, 3), (5, 7)]."""
+    intervalos = []
+    for linha in sorted(set(int(l) for l in linhas)):
+        if intervalos and linha == intervalos[-1][1] + 1:
+            intervalos[-1] = (intervalos[-1][0], linha)
+        else:
+            intervalos.append((linha, linha))
+    return intervalos
+
+
+def checksum_linhas(linhas):
+    """Checksum do conteúdo de uma lista de linhas (para comparar trechos da aba sem guardá-los)."""
+    conteudo = '\n'.join('\t'.join(str(c) for c in l) for l in linhas)
+    return hashlib.sha1(conteudo.encode('utf-8')).hexdigest()
+
+
+def texto_gravado(valor):
+    """Valor como a planilha o devolve depois de gravado por ``_para_celulas``."""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return ''
+    if isinstance(valor, bool):
+        return 'TRUE' if valor else 'FALSE'
+    if isinstance(valor, numbers.Real):
+        numero = float(valor)
+        return str(int(numero)) if numero.is_integer() else str(numero)
+    return str(valor)
+
+
+def _para_celulas(valores):
+    """Converte uma linha de valores para o formato de células da API (como ``RAW``)."""
+    celulas = []
+    for valor in valores:
+        if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+            celulas.append({'userEnteredValue': {'stringValue': ''}})
+        elif isinstance(valor, bool):
+            celulas.append({'userEnteredValue': {'boolValue': valor}})
+        elif isinstance(valor, numbers.Real):
+            celulas.append({'userEnteredValue': {'numberValue': float(valor)}})
+        else:
+            celulas.append({'userEnteredValue': {'stringValue': str(valor)}})
+    return {'values': celulas}
+
+
+class SincronizadorIncremental:
+    """Mantém em memória as linhas de uma aba que só recebe novas linhas no final.
+
+    Após a primeira carga completa, cada sincronização busca apenas o intervalo
+    ``A{n+1}:<última coluna>`` com as linhas novas. As últimas linhas já carregadas
+    são relidas na mesma chamada e comparadas por checksum: se mudaram (edição ou
+    exclusão), a aba é recarregada por inteiro. Mudanças acima dessa cauda (edição,
+    ordenação ou correção feitas direto na planilha) não são vistas pela checagem:
+    com ``intervalo_recarga`` (segundos), a primeira sincronização depois de
+    ``carregar`` e as seguintes a cada intervalo são completas. Com
+    ``incremental=False`` toda sincronização é completa.
+
+    Com ``colunas`` (nomes do cabeçalho), só essas colunas são buscadas, em
+    intervalos de colunas vizinhas; as outras ficam vazias nas linhas. Colunas
+    que passarem a ser usadas são buscadas à parte com ``adicionar_colunas``.
+    """
+
+    LINHAS_VERIFICACAO = 5
+
+    def __init__(self, incremental=True, colunas=None, intervalo_recarga=None):
+        self.incremental = incremental
+        self.colunas = None if colunas is None else set(colunas)
+        self.intervalo_recarga = intervalo_recarga
+        self.cabecalho = None
+        self.linhas = []
+        self._recarga_pendente = False
+        self._recarregado_em = None
+
+    def carregar(self, cabecalho, linhas, colunas=None):
+        """Restaura um estado salvo anteriormente (ex.: do espelho local) com as ``colunas`` que ele tem (None = todas)."""
+        self.cabecalho = list(cabecalho)
+        self.linhas = self._completar(linhas, len(self.cabecalho))
+        # Cópia de idade desconhecida: a próxima conferência completa não espera o intervalo
+        self._recarregado_em = None
+        # A cópia não tem alguma coluna buscada hoje: a próxima sincronização recarrega tudo
+        self._recarga_pendente = colunas is not None and (self.colunas is None or not self.colunas <= set(colunas))
+
+    def reiniciar(self):
+        """Descarta o estado; a próxima sincronização será completa."""
+        self.cabecalho = None
+        self.linhas = []
+
+    def faltando(self, nomes):
+        """Quais dos ``nomes`` ainda não são buscados."""
+        return set() if self.colunas is None else set(nomes) - self.colunas
+
+    def sincronizar(self, aba, renovar=None):
+        """Atualiza ``linhas`` a partir da aba. Retorna True se houve recarga completa.
+
+        ``renovar``, se informado, devolve a aba com os metadados relidos: é usado
+        antes de uma recarga completa, que é lida em blocos pelo tamanho da grade.
+        """
+        if not self.cabecalho or not self.incremental or self._recarga_pendente or self._recarga_vencida():
+            self._recarregar(renovar() if renovar else aba)
+            return True
+
+        largura = len(self.cabecalho)
+        grupos = agrupar_intervalos(self._posicoes())
+        ultima_linha = len(self.linhas) + 1  # numeração da planilha (cabeçalho = 1)
+        qtd_cauda = min(self.LINHAS_VERIFICACAO, len(self.linhas))
+
+        intervalos = [f'A1:{_letra(largura - 1)}1']
+        intervalos += [f'{_letra(a)}{ultima_linha + 1}:{_letra(b)}' for a, b in grupos]
+        if qtd_cauda:
+            intervalos += [f'{_letra(a)}{ultima_linha - qtd_cauda + 1}:{_letra(b)}{ultima_linha}' for a, b in grupos]
+        try:
+            respostas = aba.batch_get(intervalos)
+        except APIError as e:
+            if eh_sobrecarga(e):
+                raise
+            # Intervalo fora da grade: a aba encolheu (linhas excluídas na planilha)
+            self._recarregar(renovar() if renovar else aba)
+            return True
+
+        cabecalho = self._completar(respostas[0], largura)
+        novas = self._completar(_juntar(respostas[1:1 + len(grupos)], grupos), largura)
+        cauda = self._completar(_juntar(respostas[1 + len(grupos):], grupos), largura, qtd_cauda) if qtd_cauda else []
+
+        # 🔎 Cabeçalho alterado ou cauda diferente indica edição/exclusão: recarrega tudo
+        if (cabecalho[:1] != [self.cabecalho]
+                or checksum_linhas(cauda) != checksum_linhas(self.linhas[-qtd_cauda:] if qtd_cauda else [])):
+            self._recarregar(renovar() if renovar else aba)
+            return True
+
+        if novas:
+            self.linhas = self.linhas + novas
+        return False
+
+    def adicionar_colunas(self, aba, nomes):
+        """Passa a buscar as colunas ``nomes``, lendo-as (só elas) para as linhas já carregadas."""
+        novas = self.faltando(nomes)
+        if not novas:
+            return
+        self.colunas |= novas
+        posicoes = [i for i, nome in enumerate(self.cabecalho or []) if nome in novas]
+        if not posicoes or not self.linhas:
+            return
+        valores = ler_aba(aba, colunas=posicoes, primeira=2, ultima=len(self.linhas) + 1)
+        linhas = [list(l) for l in self.linhas]
+        for linha, lidos in zip(linhas, valores):
+            for i in posicoes:
+                linha[i] = lidos[i]
+        self.linhas = linhas
+
+    def aplicar_alteracoes(self, alteracoes):
+        """Aplica às linhas em memória um ``ConjuntoAlteracoes`` já gravado na aba (nas colunas buscadas).
+
+        Retorna False, sem mudar nada, se as linhas em memória não tiverem os
+        valores antigos do salvamento (cópia atrasada ou linhas deslocadas).
+        """
+        if not self.cabecalho or self._recarga_pendente:
+            return False
+        largura = len(self.cabecalho)
+        buscadas = set(self._posicoes())
+
+        def projetar(valores):
+            valores = self._completar([valores], largura)[0]
+            return [v if i in buscadas else '' for i, v in enumerate(valores)]
+
+        for linha, antigos in alteracoes.antigas().items():
+            if not 2 <= linha < len(self.linhas) + 2 or self.linhas[linha - 2] != projetar(antigos):
+                return False
+        self.linhas = alteracoes.aplicar(self.linhas, projetar)
+        return True
+
+    def _recarga_vencida(self):
+        """Se já é hora da recarga completa periódica (conferência da aba inteira)."""
+        if self.intervalo_recarga is None:
+            return False
+        return self._recarregado_em is None or time.monotonic() - self._recarregado_em > self.intervalo_recarga
+
+    def _posicoes(self):
+        """Posições, no cabeçalho, das colunas buscadas (todas, se nenhuma delas existir na aba)."""
+        posicoes = [i for i, nome in enumerate(self.cabecalho) if self.colunas is None or nome in self.colunas]
+        return posicoes or list(range(len(self.cabecalho)))
+
+    def _recarregar(self, aba):
+        self._recarga_pendente = False
+        self._recarregado_em = time.monotonic()
+        if self.colunas is None:
+            todas = ler_aba(aba)
+        else:
+            # Primeiro o cabeçalho, para saber onde estão as colunas buscadas
+            todas = aba.batch_get(['1:1'])[0][:1]
+            if todas:
+                self.cabecalho = list(todas[0])
+                todas += ler_aba(aba, colunas=self._posicoes(), primeira=2)
+        if not todas or todas == [[]]:
+            self.cabecalho, self.linhas = [], []
+            return
+        self.cabecalho = list(todas[0])
+        self.linhas = self._completar(todas[1:], len(self.cabecalho))
+
+    @staticmethod
+    def _completar(linhas, largura, quantidade=None):
+        """Normaliza as linhas para a largura do cabeçalho (a API omite células vazias no final)."""
+        linhas = [list(l)[:largura] + [''] * (largura - len(l)) for l in linhas]
+        if quantidade is not None:
+            linhas += [[''] * largura for _ in range(quantidade - len(linhas))]
+        return linhas
+
@@ -0,0 +1,219 @@
+import threading
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from agregacao import para_data
+from dados_relatorio import obter_cache
+
+CHAVES = ['LOJA', 'VENDEDOR', 'CLIENTE']
+CAMPOS_RESUMO = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS']
+SEM_NOME = '[SEM NOME]'
+NOME_ESTADO = 'reservas'
+# Totais do rollup por (loja, vendedor) conferidos ao retomar o livro do espelho local:
+# se algum mudou desde a gravação, os lançamentos daquele vendedor são refeitos
+CAMPOS_ASSINATURA = ['LINHAS'] + CAMPOS_RESUMO
+# Versão do formato gravado no espelho local (outro formato = livro refeito do zero)
+FORMATO_ESTADO = 3
+
+
+def _lancar(df):
+    """Saldos por cliente e totais por loja e vendedor das linhas de ``df``.
+
+    Retorna ``({(loja, vendedor, cliente): (saldo, ultima_data)}, {(loja, vendedor): [receitas, perdas, vendas, reservas]})``,
+    com as regras do relatório: linhas sem vendedor são ignoradas, saldo = RESERVAS − VENDAS
+    e a última data é a maior data válida do cliente.
+    """
+    df = df[df['VENDEDOR'] != '']
+    clientes = df['CLIENTE'].to_numpy()
+    parcial = pd.DataFrame({
+        'LOJA': df['LOJA'].to_numpy(),
+        'VENDEDOR': df['VENDEDOR'].to_numpy(),
+        'CLIENTE': np.where(clientes == '', SEM_NOME, clientes),
+        'SALDO': (df['RESERVAS'] - df['VENDAS']).to_numpy(),
+        'DIA': df['DIA'].to_numpy(),
+    })
+    por_cliente = parcial.groupby(CHAVES, sort=False).agg(SALDO=('SALDO', 'sum'), DIA=('DIA', 'max'))
+    saldos = {
+        chave: (float(saldo), para_data(dia))
+        for chave, saldo, dia in zip(por_cliente.index, por_cliente['SALDO'], por_cliente['DIA'])
+    }
+    por_vendedor = df[CAMPOS_RESUMO].groupby([df['LOJA'].to_numpy(), df['VENDEDOR'].to_numpy()], sort=False).sum()
+    totais = {chave: [float(v) for v in valores] for chave, valores in zip(por_vendedor.index, por_vendedor.to_numpy())}
+    return saldos, totais
+
+
+def _assinaturas(base):
+    """{(loja, vendedor): [linhas, receitas, perdas, vendas, reservas]} de todas as datas, lidos do rollup."""
+    totais = base.rollup.totais_por(['LOJA', 'VENDEDOR'], CAMPOS_ASSINATURA)
+    return {
+        chave: [round(float(v), 6) for v in valores]
+        for chave, valores in zip(totais.index, totais.to_numpy())
+        if chave[1] != ''
+    }
+
+
+class LivroReservas:
+    """Livro de reservas: saldo e última movimentação por (loja, vendedor, cliente).
+
+    Mantido a partir das linhas da aba 'relatorio': linhas acrescentadas são
+    lançadas sobre os saldos existentes; numa recarga completa (edição ou exclusão)
+    as linhas antigas e novas são comparadas e só os vendedores afetados são
+    refeitos. ``ativos`` indexa por vendedor os clientes com saldo positivo, então
+    trocar o filtro é só uma consulta ao dicionário. O livro é gravado no espelho
+    local para ser retomado após reiniciar, com os totais do rollup de cada
+    (loja, vendedor): ao retomar, os vendedores cujos totais mudaram desde a
+    gravação (edições, linhas novas) são refeitos.
+    """
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self.saldos = {}
+        self.totais = {}
+        self.ativos = {}
+        self._versao = None
+        self._recarga = None
+        self._qtd_linhas = 0
+        self._assinaturas = None
+        self._linhas = None
+        self._vendedores = None
+        self._restaurado = snapshot is None
+        self._lock = threading.Lock()
+
+    def atualizar(self, base):
+        """Coloca o livro em dia com a ``BaseRelatorio`` informada."""
+        with self._lock:
+            if not self._restaurado:
+                self._restaurar()
+            if self._versao == base.versao:
+                return
+            afetados = self._lancar_base(base)
+            if afetados is None or afetados:
+                self._indexar(afetados)
+            self._versao = base.versao
+            self._recarga = base.recarga
+            self._qtd_linhas = len(base.linhas)
+            self._linhas = base.linhas
+            self._vendedores = base.df['VENDEDOR'].to_numpy()
+            if self.snapshot is not None:
+                self._salvar(base)
+
+    def consultar(self, vendedor=None, lojas=None):
+        """(clientes ativos, totais do resumo) de um vendedor ou, com None, de todos.
+
+        Com ``lojas``, só entra o que é dessas lojas.
+        """
+        ativos, totais = self.ativos, self.totais
+        itens = ativos.get(vendedor, []) if vendedor is not None else [i for v in ativos.values() for i in v]
+        totais = [t for (loja, v), t in totais.items()
+                  if (vendedor is None or v == vendedor) and (lojas is None or loja in lojas)]
+        if lojas is not None:
+            itens = [item for item in itens if item[0] in lojas]
+        return itens, [sum(t[i] for t in totais) for i in range(len(CAMPOS_RESUMO))]
+
+    def vendedores(self, lojas=None):
+        """Vendedores com lançamentos (nas ``lojas``, se informadas)."""
+        return sorted({v for loja, v in self.totais if lojas is None or loja in lojas})
+
+    def _lancar_base(self, base):
+        """Atualiza saldos e totais; retorna os vendedores afetados (None = todos)."""
+        if self._linhas is not None and base.recarga == self._recarga and len(base.linhas) >= self._qtd_linhas:
+            # ➕ Só linhas novas no final: lança sobre os saldos existentes
+            return self._acrescentar(base.df.iloc[self._qtd_linhas:])
+
+        if self._linhas is not None:
+            # ✏️ Recarga completa: compara as linhas e refaz apenas os vendedores que mudaram
+            afetados = self._vendedores_alterados(base)
+        elif self._assinaturas is not None:
+            # 🔎 Livro retomado do espelho local: refaz os vendedores com totais diferentes
+            afetados = self._vendedores_divergentes(base)
+        else:
+            self.saldos, self.totais = _lancar(base.df)
+            return None
+
+        if afetados:
+            saldos, totais = _lancar(base.df[base.df['VENDEDOR'].isin(afetados)])
+            self.saldos = {c: v for c, v in self.saldos.items() if c[1] not in afetados} | saldos
+            self.totais = {c: t for c, t in self.totais.items() if c[1] not in afetados} | totais
+        return afetados
+
+    def _acrescentar(self, novas):
+        lancados, totais_novos = _lancar(novas)
+        saldos = dict(self.saldos)
+        for chave, (saldo, dia) in lancados.items():
+            anterior, ultima = saldos.get(chave, (0.0, None))
+            if ultima is not None and (dia is None or ultima > dia):
+                dia = ultima
+            saldos[chave] = (anterior + saldo, dia)
+        totais = dict(self.totais)
+        for chave, valores in totais_novos.items():
+            anteriores = totais.get(chave, [0.0] * len(CAMPOS_RESUMO))
+            totais[chave] = [a + v for a, v in zip(anteriores, valores)]
+        self.saldos, self.totais = saldos, totais
+        return {vendedor for _, vendedor in totais_novos}
+
+    def _vendedores_alterados(self, base):
+        """Vendedores das linhas que saíram ou entraram entre a versão anterior e ``base``."""
+        restantes = {}
+        for i, linha in enumerate(self._linhas):
+            restantes.setdefault(tuple(linha), []).append(i)
+        novas = []
+        for i, linha in enumerate(base.linhas):
+            posicoes = restantes.get(tuple(linha))
+            if posicoes:
+                posicoes.pop()
+            else:
+                novas.append(i)
+        removidas = [i for posicoes in restantes.values() for i in posicoes]
+        vendedores = base.df['VENDEDOR'].to_numpy()
+        afetados = set(self._vendedores[removidas]) | set(vendedores[novas])
+        afetados.discard('')
+        return afetados
+
+    def _vendedores_divergentes(self, base):
+        """Vendedores cujos totais no rollup de ``base`` diferem dos gravados com o livro."""
+        atuais = _assinaturas(base)
+        return {v for (l, v) in atuais.keys() | self._assinaturas.keys()
+                if atuais.get((l, v)) != self._assinaturas.get((l, v))}
+
+    def _indexar(self, vendedores=None):
+        """Refaz o índice de clientes ativos dos ``vendedores`` informados (None = todos)."""
+        if vendedores is None:
+            ativos = {}
+        else:
+            ativos = {v: itens for v, itens in self.ativos.items() if v not in vendedores}
+        for (loja, vendedor, cliente), (saldo, dia) in self.saldos.items():
+            if saldo > 0 and (vendedores is None or vendedor in vendedores):
+                ativos.setdefault(vendedor, []).append((loja, vendedor, cliente, saldo, dia))
+        self.ativos = ativos
+
+    def _restaurar(self):
+        self._restaurado = True
+        salvo = self.snapshot.carregar_estado(NOME_ESTADO)
+        if not salvo or salvo.get('formato') != FORMATO_ESTADO:
+            return
+        self._assinaturas = {(l, v): a for l, v, *a in salvo['assinaturas']}
+        self.saldos = {
+            (l, v, c): (saldo, date.fromisoformat(dia) if dia else None)
+            for l, v, c, saldo, dia in salvo['saldos']
+        }
+        self.totais = {(l, v): valores for l, v, *valores in salvo['totais']}
+        self._indexar()
+
+    def _salvar(self, base):
+        self._assinaturas = _assinaturas(base)
+        self.snapshot.salvar_estado(NOME_ESTADO, {
+            'formato': FORMATO_ESTADO,
+            'assinaturas': [[l, v, *a] for (l, v), a in self._assinaturas.items()],
+            'saldos': [[l, v, c, saldo, dia.isoformat() if dia else None]
+                       for (l, v, c), (saldo, dia) in self.saldos.items()],
+            'totais': [[l, v, *valores] for (l, v), valores in self.totais.items()],
+        })
+
+
+@st.cache_resource
+def obter_livro():
+    """O ``LivroReservas`` do processo, gravado no mesmo espelho local dos registros."""
+    return LivroReservas(obter_cache().snapshot)
@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from dados_relatorio import obter_cache
+from google_planilha import GooglePlanilha
+
+# Intervalo (em segundos) entre as leituras da planilha feitas pelo monitor
+INTERVALO_PADRAO = int(os.environ.get('TEMPO_REAL_INTERVALO', '30'))
+# Sem nenhuma tela lendo por esse tempo (em segundos), o monitor para de consultar a planilha
+OCIOSO_APOS = int(os.environ.get('TEMPO_REAL_OCIOSO', '600'))
+
+
+class MonitorHoje:
+    """Thread única por processo que mantém em memória os dados de hoje.
+
+    A cada ``intervalo`` segundos sincroniza a aba 'relatorio' (só as linhas novas)
+    e publica as linhas do dia. Todas as telas de tempo real leem daqui, então a
+    carga na API não depende de quantas telas estão abertas.
+    """
+
+    def __init__(self, cache, intervalo=INTERVALO_PADRAO):
+        self.cache = cache
+        self.intervalo = intervalo
+        self.erro = None
+        self._publicado = None
+        self._ultimo_acesso = time.monotonic()
+        self._pronto = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name='monitor-tempo-real', daemon=True)
+        self._thread.start()
+
+    def ler(self, timeout=60):
+        """Retorna (linhas_de_hoje, lojas, atualizado_em), aguardando a primeira leitura."""
+        self._ultimo_acesso = time.monotonic()
+        if not self._pronto.wait(timeout):
+            raise TimeoutError('Monitor de tempo real ainda sem dados.')
+        if self._publicado is None:
+            raise self.erro or LookupError('Nenhum dado disponível.')
+        return self._publicado
+
+    def _executar(self):
+        while True:
+            if time.monotonic() - self._ultimo_acesso <= OCIOSO_APOS:
+                self._atualizar()
+            time.sleep(self.intervalo)
+
+    def _atualizar(self):
+        try:
+            self.cache.obter(GooglePlanilha.em_segundo_plano(), forcar=True)
+            self.erro = None
+        except Exception as e:
+            # 🛟 Planilha indisponível: segue com a última cópia (a tela mostra o horário dos dados)
+            self.erro = e
+        try:
+            base = self.cache.base_disponivel()
+            hoje = datetime.now().date()
+            self._publicado = (base.filtrar(hoje, hoje), base.lojas(), self.cache.sincronizado_em)
+        except Exception as e:
+            self.erro = e
+        finally:
+            self._pronto.set()
+
+
+@st.cache_resource
+def obter_monitor():
+    return MonitorHoje(obter_cache())
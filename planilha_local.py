@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import os
+import threading
+
+from gspread.utils import a1_range_to_grid_range, numericise_all, to_records
+
+from fonte_dados import FonteDados
+from google_planilha import ESTADO_COLUNAS, texto_gravado
+from snapshot_local import SnapshotLocal
+
+# Banco SQLite usado quando FONTE_DADOS=local (mesmo formato do espelho local)
+CAMINHO_LOCAL = os.environ.get(
+    'FONTE_LOCAL_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'planilha_local.sqlite3'),
+)
+
+
+def _sem_vazias_no_fim(linha):
+    linha = list(linha)
+    while linha and linha[-1] == '':
+        linha.pop()
+    return linha
+
+
+class PlanilhaLocal(SnapshotLocal, FonteDados):
+    """Réplica da planilha em SQLite, com a mesma semântica de leitura e escrita da API.
+
+    Usa o formato do espelho local (``SnapshotLocal``): uma cópia de
+    ``snapshot_fluxo.sqlite3`` gravada com todas as colunas
+    (``RELATORIO_SO_COLUNAS_USADAS=0``) já serve como réplica. A linha ``n`` de uma aba é a
+    linha ``n`` da planilha (1 = cabeçalho); exclusões renumeram as seguintes.
+    """
+
+    def __init__(self, caminho=CAMINHO_LOCAL):
+        super().__init__(caminho)
+        self._abas = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def abrir(cls, caminho=CAMINHO_LOCAL):
+        """Abre uma réplica existente (não cria um banco vazio por engano).
+
+        Recusa uma cópia do espelho local gravada só com as colunas usadas pelos
+        relatórios: as outras colunas estão vazias nela e seriam servidas (e
+        regravadas pela Edição Avançada) assim.
+        """
+        if not os.path.exists(caminho):
+            raise FileNotFoundError(
+                f"Réplica local '{caminho}' não encontrada. Copie o espelho local (snapshot_fluxo.sqlite3) "
+                "gravado com RELATORIO_SO_COLUNAS_USADAS=0, ou importe CSVs com "
+                "'python planilha_local.py importar <pasta>'.")
+        replica = cls(caminho)
+        colunas = replica.carregar_estado(ESTADO_COLUNAS)
+        salvo = replica.carregar('relatorio') if colunas is not None else None
+        vazias = [c for c in salvo[0] if c not in colunas] if salvo else []
+        if vazias:
+            raise ValueError(
+                f"'{caminho}' é uma cópia do espelho local gravada só com as colunas usadas pelos relatórios "
+                f"(RELATORIO_SO_COLUNAS_USADAS=1): {', '.join(vazias)} estão vazias. Grave o espelho com "
+                "RELATORIO_SO_COLUNAS_USADAS=0 antes de copiá-lo, ou importe CSVs com "
+                "'python planilha_local.py importar <pasta>'.")
+        return replica
+
+    def aba(self, nome):
+        with self._lock:
+            if nome not in self._abas:
+                with self._conectar() as con:
+                    existe = con.execute('SELECT rowid FROM abas WHERE nome = ?', (nome,)).fetchone()
+                self._abas[nome] = AbaLocal(self, nome, existe[0]) if existe else None
+            return self._abas[nome]
+
+    def aplicar_lote(self, aba, excluir=(), editar=None, incluir=()):
+        return self.alterar_linhas(
+            aba.title, excluir,
+            {linha: [texto_gravado(v) for v in valores] for linha, valores in (editar or {}).items()},
+            [[texto_gravado(v) for v in valores] for valores in incluir],
+        )
+
+    def importar_csv(self, pasta):
+        """Carrega cada ``<aba>.csv`` da pasta como uma aba (a primeira linha é o cabeçalho)."""
+        importadas = []
+        for arquivo in sorted(os.listdir(pasta)):
+            if not arquivo.lower().endswith('.csv'):
+                continue
+            with open(os.path.join(pasta, arquivo), encoding='utf-8-sig', newline='') as f:
+                linhas = list(csv.reader(f))
+            nome = os.path.splitext(arquivo)[0]
+            self.substituir(nome, linhas[0] if linhas else [], linhas[1:])
+            importadas.append(nome)
+        with self._lock:
+            self._abas.clear()
+        return importadas
+
+
+class AbaLocal:
+    """Aba da ``PlanilhaLocal`` com a interface de worksheet do gspread usada pelo app."""
+
+    def __init__(self, planilha, titulo, id_aba):
+        self.planilha = planilha
+        self.title = titulo
+        self.id = id_aba
+
+    def _linhas(self, inicio=1, fim=None):
+        """Linhas ``inicio``..``fim`` (numeração da planilha, 1 = cabeçalho)."""
+        with self.planilha._conectar() as con:
+            linhas = []
+            if inicio <= 1:
+                cabecalho = con.execute('SELECT cabecalho FROM abas WHERE nome = ?', (self.title,)).fetchone()
+                linhas.append(json.loads(cabecalho[0]) if cabecalho else [])
+            consulta = 'SELECT valores FROM linhas WHERE aba = ? AND numero >= ?'
+            parametros = [self.title, max(inicio, 2)]
+            if fim is not None:
+                consulta += ' AND numero <= ?'
+                parametros.append(fim)
+            linhas += [json.loads(v) for (v,) in con.execute(consulta + ' ORDER BY numero', parametros)]
+        return linhas
+
+    @property
+    def row_count(self):
+        """Linhas da aba, contando o cabeçalho (como o tamanho da grade nos metadados)."""
+        with self.planilha._conectar() as con:
+            return con.execute('SELECT COALESCE(MAX(numero), 1) FROM linhas WHERE aba = ?', (self.title,)).fetchone()[0]
+
+    @property
+    def col_count(self):
+        with self.planilha._conectar() as con:
+            cabecalho = con.execute('SELECT json_array_length(cabecalho) FROM abas WHERE nome = ?', (self.title,)).fetchone()
+            maior = con.execute('SELECT MAX(json_array_length(valores)) FROM linhas WHERE aba = ?', (self.title,)).fetchone()
+        return max(cabecalho[0] if cabecalho else 0, maior[0] or 0)
+
+    def get_all_values(self):
+        linhas = self._linhas()
+        if linhas == [[]]:
+            return [[]]
+        # Como o gspread: todas as linhas com a largura da maior
+        largura = max(len(l) for l in linhas)
+        return [list(l) + [''] * (largura - len(l)) for l in linhas]
+
+    def get_all_records(self):
+        valores = self.get_all_values()
+        if not valores or valores == [[]]:
+            return []
+        return to_records(valores[0], [numericise_all(l) for l in valores[1:]])
+
+    def batch_get(self, intervalos):
+        respostas = []
+        for a1 in intervalos:
+            grade = a1_range_to_grid_range(a1)
+            inicio = grade.get('startRowIndex', 0) + 1
+            fim = grade.get('endRowIndex')
+            col_inicio, col_fim = grade.get('startColumnIndex', 0), grade.get('endColumnIndex')
+            linhas = [_sem_vazias_no_fim(l[col_inicio:col_fim]) for l in self._linhas(inicio, fim)]
+            # A API omite as linhas vazias no fim do intervalo
+            while linhas and not linhas[-1]:
+                linhas.pop()
+            respostas.append(linhas)
+        return respostas
+
+    def update_cell(self, linha, coluna, valor):
+        with self.planilha._conectar() as con, con:
+            if linha == 1:
+                atual = con.execute('SELECT cabecalho FROM abas WHERE nome = ?', (self.title,)).fetchone()
+            else:
+                atual = con.execute('SELECT valores FROM linhas WHERE aba = ? AND numero = ?', (self.title, linha)).fetchone()
+            valores = json.loads(atual[0]) if atual else []
+            valores += [''] * (coluna - len(valores))
+            valores[coluna - 1] = texto_gravado(valor)
+            self.planilha._gravar_linha(con, self.title, linha, valores)
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description='Réplica local da planilha (FONTE_DADOS=local).')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    importar = sub.add_parser('importar', help='importa <aba>.csv de uma pasta')
+    importar.add_argument('pasta')
+    importar.add_argument('--banco', default=CAMINHO_LOCAL)
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'importar':
+        abas = PlanilhaLocal(args.banco).importar_csv(args.pasta)
+        print(f"✅ {len(abas)} aba(s) importada(s) em {args.banco}: {', '.join(abas)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,33 +2,39 @@
 from datetime import datetime, timedelta
 from collections import defaultdict
 import pandas as pd
-import io
 
 try:
-    from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_base, visao_do_usuario, exibir_horario_dados
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
+    st.error(f'Erro ao importar dados_relatorio: {e}')
     st.stop()
 
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'VENDEDOR', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE']
+
+def acumulados_ate(base, ate):
+    """{(loja, vendedor): (reserva, google)} acumulados até ``ate`` (inclusive), lidos do cubo do rollup.
+
+    Reserva: -1 desconta, qualquer valor positivo conta +1. Google: cada valor
+    truncado para inteiro (as contagens ``CAMPOS_DERIVADOS`` do rollup).
+    """
+    totais = base.rollup.totais_por(['LOJA', 'VENDEDOR'], ['RESERVAS_CONTADAS', 'GOOGLE_TRUNCADO'], data_ate=ate)
+    return {
+        chave: (int(reserva), int(google))
+        for chave, reserva, google in zip(totais.index, totais['RESERVAS_CONTADAS'], totais['GOOGLE_TRUNCADO'])
+        if chave[0] != '' and chave[1] != ''
+    }
+
 def parse_date(date_str):
     if not date_str or not isinstance(date_str, str): return None
     try:
         return datetime.strptime(date_str.strip().split()[0], '%d/%m/%Y').date()
     except: return None
 
-def mostrar():
-    st.title('📊 Relatório Acumulado por Loja e Vendedor')
-
-    try:
-        gsheet = GooglePlanilha()
-        dados = gsheet.aba_relatorio.get_all_records()
-        if not dados:
-            st.warning('📭 Nenhum dado encontrado na planilha.')
-            return
-    except Exception as e:
-        st.error(f'❌ Erro ao carregar dados: {e}')
-        return
-
+def agregar(visao, hoje):
+    """Linhas do relatório de ``hoje``: acumulados até ontem mais as métricas do dia, por (loja, vendedor)."""
     # Mapeamento EXATO
     col_loja = 'LOJA'
     col_data = 'DATA'
@@ -39,49 +45,14 @@ def mostrar():
     col_reservas = 'RESERVAS'
     col_google = 'GOOGLE'
 
-    # Verificar se as colunas existem
-    headers = dados[0].keys()
-    for c in [col_loja, col_data, col_vendedor, col_reservas, col_google]:
-        if c not in headers:
-            st.error(f'❌ Coluna essencial não encontrada: {c}')
-            return
-
-    hoje = datetime.now().date()
-    ontem = hoje - timedelta(days=1)
-
-    # Acumuladores (até ontem)
-    reserva_acumulada = defaultdict(int)
-    google_acumulado = defaultdict(int)
-    vendedores_vistos = set()
-
-    for row in dados:
-        loja = str(row.get(col_loja, '')).strip()
-        vendedor = str(row.get(col_vendedor, '')).strip()
-        if not loja or not vendedor: continue
-        
-        chave = f'{loja} - {vendedor}'
-        vendedores_vistos.add((loja, vendedor))
-        
-        data_row = parse_date(row.get(col_data, ''))
-        if data_row and data_row <= ontem:
-            # Acumular Reservas (regra: 1 ou -1)
-            val_res = str(row.get(col_reservas, 0)).replace(',', '.')
-            try:
-                v_res = float(val_res)
-                if v_res == -1: reserva_acumulada[chave] -= 1
-                elif v_res > 0: reserva_acumulada[chave] += 1
-            except: pass
-
-            # Acumular Google (numeral)
-            val_goo = str(row.get(col_google, 0)).replace(',', '.')
-            try:
-                v_goo = int(float(val_goo))
-                google_acumulado[chave] += v_goo
-            except: pass
+    # Acumuladores (até ontem): uma busca binária no cubo do rollup
+    acumulados = acumulados_ate(visao, hoje - timedelta(days=1))
+    pares = visao.df[(visao.df['LOJA'] != '') & (visao.df['VENDEDOR'] != '')]
+    vendedores_vistos = set(zip(pares['LOJA'], pares['VENDEDOR']))
 
     # Métricas de HOJE
     metricas_hoje = defaultdict(lambda: defaultdict(int))
-    for row in dados:
+    for row in visao.registros_em(visao.posicoes(hoje, hoje)):
         data_row = parse_date(row.get(col_data, ''))
         if data_row != hoje: continue
         
@@ -98,9 +69,8 @@ def mostrar():
     # Montar Relatório
     relatorio = []
     for (loja, vendedor) in sorted(vendedores_vistos):
-        chave_str = f'{loja} - {vendedor}'
-        acc_res = max(0, reserva_acumulada[chave_str])
-        acc_goo = google_acumulado[chave_str]
+        acc_res, acc_goo = acumulados.get((loja, vendedor), (0, 0))
+        acc_res = max(0, acc_res)
         
         m_hoje = metricas_hoje[(loja, vendedor)]
         
@@ -124,20 +94,53 @@ def mostrar():
                 'RESERVA_ACUMULADA': acc_res,
                 'GOOGLE_ACUMULADO': acc_goo
             })
+    return relatorio
 
-    if not relatorio:
-        st.info('📭 Nenhum vendedor com reserva acumulada para hoje.')
-        return
-
+def formatar(relatorio):
+    """Tabela exibida a partir das linhas de ``agregar``."""
     df = pd.DataFrame(relatorio)
     # Limpeza para Inteiro Puro e Vazio
     for col in df.columns:
         if col not in ['DATA', 'LOJA', 'VENDEDOR']:
             df[col] = df[col].apply(lambda x: str(int(x)) if x != 0 else '')
+    return df
+
+def mostrar():
+    st.title('📊 Relatório Acumulado por Loja e Vendedor')
+
+    try:
+        medicao = Cronometro('acumulado')
+        base = obter_base(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        if base.vazia:
+            st.warning('📭 Nenhum dado encontrado na planilha.')
+            return
+    except Exception as e:
+        st.error(f'❌ Erro ao carregar dados: {e}')
+        return
+
+    # Verificar se as colunas existem
+    headers = base.cabecalho
+    for c in ['LOJA', 'DATA', 'VENDEDOR', 'RESERVAS', 'GOOGLE']:
+        if c not in headers:
+            st.error(f'❌ Coluna essencial não encontrada: {c}')
+            return
+
+    hoje = datetime.now().date()
+    # 🔐 Só as lojas do usuário
+    relatorio = agregar(visao_do_usuario(base), hoje)
+
+    if not relatorio:
+        st.info('📭 Nenhum vendedor com reserva acumulada para hoje.')
+        return
+
+    medicao.etapa('agregar', linhas=len(relatorio))
+    df = formatar(relatorio)
+    medicao.etapa('formatar')
 
     st.dataframe(df, width="stretch")
+    medicao.etapa('exibir')
 
-    # Botão Download
-    buffer = io.BytesIO()
-    df.to_excel(buffer, index=False, engine='openpyxl')
-    st.download_button('📥 Baixar Acumulado Excel', buffer.getvalue(), 'Relatorio Acumulado.xlsx')
\ No newline at end of file
+    # Download (gerado só ao clicar)
+    botoes_exportacao(df, 'acumulado', 'Relatorio Acumulado', (hoje,))
\ No newline at end of file
@@ -1,17 +1,36 @@
 ﻿import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-import sys
 import os
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from datetime import datetime, timedelta
 
 try:
     from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_base, lojas_do_usuario, gravar_alteracoes
+    from alteracoes import ConjuntoAlteracoes
+    from diagnostico import Cronometro
 except Exception as e:
     st.error(f'Erro ao importar GooglePlanilha: {e}')
     st.stop()
 
+# Colunas da aba 'relatorio', na ordem da planilha
+CABECALHO_EXATO = ['LOJA', 'DATA', 'HORA', 'VENDEDOR', 'CLIENTE', 'ATENDIMENTOS', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'PESQUISAS', 'EXAME DE VISTA', 'GOOGLE', 'USUARIO_ALTERACAO']
+# Linhas de um dia exibidas (e lidas da planilha) por página do editor
+LINHAS_POR_PAGINA = int(os.environ.get('EDICAO_LINHAS_POR_PAGINA', '200'))
+
+def numeros_do_dia(base, data, lojas=None):
+    """Números (na planilha) das linhas de ``data`` nas ``lojas`` (None = todas), pelo índice de datas."""
+    return [int(p) + 2 for p in base.posicoes(data, data, lojas=lojas)]
+
+def montar_tabela(linhas_lidas, cabecalho):
+    """Tabela do editor com as colunas de ``CABECALHO_EXATO`` e ``ID_REAL`` (número da linha)."""
+    df = pd.DataFrame(list(linhas_lidas.values()), columns=cabecalho)
+    for col in CABECALHO_EXATO:
+        if col not in df.columns:
+            df[col] = ''
+    df = df[CABECALHO_EXATO].copy()
+    df['ID_REAL'] = list(linhas_lidas)
+    return df
+
 def eh_dia_util(data):
     return data.weekday() < 5
 
@@ -25,35 +44,60 @@ def obter_ultimo_dia_util(data_base):
 def mostrar():
     st.title('🛠️ Gestão de Dados (Editar / Excluir / Adicionar)')
     
+    hoje = datetime.now().date()
+    dia_anterior_util = obter_ultimo_dia_util(hoje)
+    
+    st.sidebar.subheader('📅 Filtro de Exibição')
+    filtro_data = st.sidebar.date_input('Mostrar dados de:', dia_anterior_util)
+    data_str_filtro = filtro_data.strftime('%d/%m/%Y')
+    carregadas = st.session_state.get('edicao_carregadas')
+
     try:
+        medicao = Cronometro('edicao')
         gsheet = GooglePlanilha()
-        lista_completa = gsheet.aba_relatorio.get_all_values()
-        if len(lista_completa) < 1:
+        # Ao abrir um dia, sincroniza antes: os números de linha precisam estar atualizados
+        # (nas demais execuções as linhas já lidas ficam na sessão)
+        abrir_dia = carregadas is None or carregadas['data'] != filtro_data
+        base = obter_base(gsheet, forcar=abrir_dia)
+        medicao.etapa('carregar', linhas=len(base))
+        if not base.cabecalho:
             st.warning('📭 Planilha vazia.')
             return
 
-        cabecalho_exato = ['LOJA', 'DATA', 'HORA', 'VENDEDOR', 'CLIENTE', 'ATENDIMENTOS', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'PESQUISAS', 'EXAME DE VISTA', 'GOOGLE', 'USUARIO_ALTERACAO']
-        
-        df_base = pd.DataFrame(lista_completa[1:], columns=lista_completa[0])
-        for col in cabecalho_exato:
-            if col not in df_base.columns:
-                df_base[col] = ''
-        
-        df_base = df_base[cabecalho_exato].copy()
-        df_base['ID_REAL'] = range(2, len(df_base) + 2) 
+        cabecalho_exato = list(CABECALHO_EXATO)
 
     except Exception as e:
         st.error(f'❌ Erro ao carregar dados: {e}')
         return
 
-    hoje = datetime.now().date()
-    dia_anterior_util = obter_ultimo_dia_util(hoje)
-    
-    st.sidebar.subheader('📅 Filtro de Exibição')
-    filtro_data = st.sidebar.date_input('Mostrar dados de:', dia_anterior_util)
-    data_str_filtro = filtro_data.strftime('%d/%m/%Y')
-
-    df_filtrado = df_base[df_base['DATA'] == data_str_filtro].copy()
+    # 📅 Números das linhas do dia pelo índice de datas (busca binária + só as linhas do dia),
+    # 🔐 só das lojas permitidas ao usuário: abrir um dia custa o mesmo em qualquer tamanho de aba
+    numeros_dia = numeros_do_dia(base, filtro_data, lojas_do_usuario())
+    paginas = max(1, -(-len(numeros_dia) // LINHAS_POR_PAGINA))
+    pagina = 1
+    if paginas > 1:
+        pagina = st.sidebar.number_input(f'Página (de {paginas}):', min_value=1, max_value=paginas, value=1)
+        st.sidebar.caption(f'{len(numeros_dia)} linhas no dia, {LINHAS_POR_PAGINA} por página. '
+                           'Salve antes de trocar de página.')
+
+    # Só as linhas da página são lidas, inteiras, da planilha (o cache dos relatórios não
+    # guarda colunas como HORA e USUARIO_ALTERACAO). Ficam na sessão como foram lidas:
+    # são a versão de cada linha conferida ao salvar
+    if abrir_dia or carregadas.get('pagina') != pagina:
+        numeros = numeros_dia[(pagina - 1) * LINHAS_POR_PAGINA:pagina * LINHAS_POR_PAGINA]
+        try:
+            linhas = gsheet.ler_linhas(gsheet.aba_relatorio, numeros, len(base.cabecalho))
+        except Exception as e:
+            st.error(f'❌ Erro ao carregar dados: {e}')
+            return
+        # Cada leitura tem um número: uma nova começa sem as edições feitas sobre a anterior
+        st.session_state.edicao_leituras = st.session_state.get('edicao_leituras', 0) + 1
+        carregadas = {'data': filtro_data, 'pagina': pagina, 'linhas': {n: linhas[n] for n in numeros},
+                      'leitura': st.session_state.edicao_leituras}
+        st.session_state.edicao_carregadas = carregadas
+    linhas_lidas = carregadas['linhas']
+    df_filtrado = montar_tabela(linhas_lidas, base.cabecalho)
+    medicao.etapa('filtrar', linhas=len(df_filtrado))
 
     if df_filtrado.empty:
         st.info(f'📭 Nenhum dado encontrado para {data_str_filtro}.')
@@ -66,25 +110,23 @@ def mostrar():
         num_rows='dynamic',
         width="stretch",
         column_order=cabecalho_exato,
-        key='data_editor_gestao'
+        key=f"data_editor_gestao_{carregadas['leitura']}"
     )
+    medicao.etapa('exibir')
 
     if st.button('💾 Salvar Alterações no Google Sheets', type='primary'):
         try:
             timestamp = datetime.now().strftime('%d/%m %H:%M')
             ids_originais = set(df_filtrado['ID_REAL'].tolist())
             ids_mantidos = set(df_editado['ID_REAL'].dropna().tolist())
-            ids_para_excluir = sorted([int(idx) for idx in list(ids_originais - ids_mantidos)], reverse=True)
+            ids_para_excluir = [int(idx) for idx in ids_originais - ids_mantidos]
 
             novas_linhas = df_editado[df_editado['ID_REAL'].isna() | (df_editado['ID_REAL'] == '')].copy()
             df_comum_orig = df_filtrado[df_filtrado['ID_REAL'].isin(ids_mantidos)].set_index('ID_REAL')
             df_comum_edit = df_editado[df_editado['ID_REAL'].isin(ids_mantidos)].set_index('ID_REAL')
 
-            # 1. Excluir
-            for idx in ids_para_excluir:
-                gsheet.aba_relatorio.delete_rows(idx)
-
-            # 2. Editar
+            # 1. Editar (valores lidos e novos)
+            edicoes = {}
             for idx in ids_mantidos:
                 linha_orig = df_comum_orig.loc[idx]
                 linha_edit = df_comum_edit.loc[idx]
@@ -96,15 +138,46 @@ def mostrar():
                 if mudou:
                     valores = linha_edit.tolist()
                     valores[-1] = f'Editado em {timestamp}'
-                    gsheet.aba_relatorio.update(f'A{idx}:N{idx}', [valores])
+                    edicoes[int(idx)] = (linhas_lidas[int(idx)], valores)
 
-            # 3. Adicionar
+            # 2. Adicionar
+            inclusoes = []
             for _, row in novas_linhas.iterrows():
                 valores = [row.get(c, '') for c in cabecalho_exato]
                 valores[-1] = f'Adicionado em {timestamp}'
                 if not valores[1]: valores[1] = data_str_filtro
-                gsheet.aba_relatorio.append_row(valores)
-
+                inclusoes.append(valores)
+
+            alteracoes = ConjuntoAlteracoes(
+                excluidas={idx: linhas_lidas[idx] for idx in ids_para_excluir},
+                editadas=edicoes,
+                incluidas=inclusoes,
+            )
+            if not alteracoes:
+                st.info('ℹ️ Nenhuma alteração para salvar.')
+                return
+
+            # 🔐 Não grava linhas de lojas que o usuário não pode ver
+            permitidas = lojas_do_usuario()
+            if permitidas is not None:
+                lojas_gravadas = {str(novos[0]) for _, novos in edicoes.values()} | {str(v[0]) for v in inclusoes}
+                proibidas = sorted(lojas_gravadas - permitidas)
+                if proibidas:
+                    st.error(f"⚠️ Você não tem permissão para gravar dados da(s) loja(s): {', '.join(proibidas)}")
+                    return
+
+            # 3. Envia tudo (edições, exclusões e inclusões) em um único lote e atualiza o cache de
+            # todas as sessões; antes, 🔎 confere se as linhas alteradas ainda estão como foram
+            # lidas (outra pessoa pode ter mexido)
+            conflitos = gravar_alteracoes(gsheet, alteracoes)
+            if conflitos:
+                st.session_state.pop('edicao_carregadas', None)
+                st.error(f"⚠️ A(s) linha(s) {', '.join(map(str, conflitos))} foi(ram) alterada(s) por outra pessoa "
+                         "depois que os dados foram carregados. Nada foi gravado: recarregue e refaça as alterações.")
+                st.button('🔄 Recarregar dados do dia')
+                return
+
+            st.session_state.pop('edicao_carregadas', None)
             st.success('✅ Planilha atualizada com sucesso!')
             st.rerun()
 
@@ -1,54 +1,45 @@
 ﻿import streamlit as st
-import pandas as pd
 from datetime import datetime
-import sys
-import os
-from collections import defaultdict
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_visao, exibir_horario_dados
+    from agregacao import formatar_inteiros
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
-    GooglePlanilha = None
+    st.error(f'Erro ao importar dados_relatorio: {e}')
+    obter_visao = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+CAMPOS = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+
+def agregar(base, data_de, data_ate):
+    """Totais por loja no período, lidos do cubo do rollup."""
+    df = base.rollup.somar('LOJA', CAMPOS, '[SEM LOJA]', data_de, data_ate)
+    return df.reindex(columns=['LOJA'] + CAMPOS).fillna(0)
+
+def formatar(df):
+    """Tabela exibida: inteiros ou vazio."""
+    return formatar_inteiros(df.copy(), CAMPOS)
 
 def mostrar():
     st.title('📊 Relatório Geral (Todas as Lojas)')
-    if GooglePlanilha is None: return
+    if obter_visao is None: return
 
     try:
-        gsheet = GooglePlanilha()
-        dados_brutos = gsheet.aba_relatorio.get_all_records()
-        if not dados_brutos: return
+        medicao = Cronometro('geral')
+        base = obter_visao(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        if base.vazia: return
 
         col1, col2 = st.columns(2)
         data_de = col1.date_input('De:', datetime.now())
         data_ate = col2.date_input('Até:', datetime.now())
 
-        resultado = defaultdict(lambda: defaultdict(float))
-        for row in dados_brutos:
-            try:
-                data_str = str(row.get('DATA', '')).split()[0]
-                data_row = datetime.strptime(data_str, '%d/%m/%Y').date()
-                if not (data_de <= data_row <= data_ate): continue
-            except: continue
-
-            loja = str(row.get('LOJA', '')).strip() or '[SEM LOJA]'
-            for campo in ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']:
-                val = str(row.get(campo, 0)).replace(',', '.')
-                try:
-                    val_num = float(val)
-                    if val_num != 0: resultado[loja][campo] += val_num
-                except: pass
-
-        lista_df = []
-        for loja, valores in resultado.items():
-            linha = {'LOJA': loja}; linha.update(valores); lista_df.append(linha)
-
-        df = pd.DataFrame(lista_df)
-        ordem = ['LOJA', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-        df = df.reindex(columns=ordem).fillna(0)
+        df = agregar(base, data_de, data_ate)
+        medicao.etapa('agregar', linhas=len(df))
 
         # Resumo Numérico
         res_rec = int(df['RECEITAS'].sum())
@@ -57,15 +48,17 @@ def mostrar():
         res_goo = int(df['GOOGLE'].sum())
 
         # Formatação da Tabela: Inteiro ou Vazio
-        for col in df.columns:
-            if col != 'LOJA':
-                df[col] = df[col].apply(lambda x: str(int(x)) if x != 0 else '')
+        df = formatar(df)
+        medicao.etapa('formatar')
 
         st.dataframe(df, width="stretch")
+        medicao.etapa('exibir')
         st.markdown('---')
         c1, c2, c3, c4 = st.columns(4)
         c1.metric('Receitas', res_rec)
         c2.metric('Vendas', res_ven)
         c3.metric('Perdas', res_per)
         c4.metric('Google', res_goo)
+
+        botoes_exportacao(df, 'geral', 'Relatorio Geral', (data_de, data_ate))
     except Exception as e: st.error(f'Erro: {e}')
\ No newline at end of file
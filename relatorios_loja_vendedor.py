@@ -1,60 +1,50 @@
 ﻿import streamlit as st
-import pandas as pd
 from datetime import datetime
-import sys
-import os
-from collections import defaultdict
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_visao, exibir_horario_dados
+    from agregacao import formatar_inteiros
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
-    GooglePlanilha = None
+    st.error(f'Erro ao importar dados_relatorio: {e}')
+    obter_visao = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'VENDEDOR', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+CAMPOS = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+
+def agregar(base, loja, data_de, data_ate):
+    """Totais por vendedor da ``loja`` no período, lidos do cubo do rollup."""
+    df = base.rollup.somar('VENDEDOR', CAMPOS, '[SEM VENDEDOR]', data_de, data_ate, loja=loja)
+    df = df.rename(columns={'VENDEDOR': 'Vendedor'})
+    return df.reindex(columns=['Vendedor'] + CAMPOS).fillna(0)
+
+def formatar(df):
+    """Tabela exibida: inteiros sem .0 ou vazio."""
+    return formatar_inteiros(df.copy(), CAMPOS)
 
 def mostrar():
     st.title('👨‍💼 Relatório Loja x Vendedor')
-    if GooglePlanilha is None: return
+    if obter_visao is None: return
 
     try:
-        gsheet = GooglePlanilha()
-        dados_brutos = gsheet.aba_relatorio.get_all_records()
-        if not dados_brutos: return
+        medicao = Cronometro('loja_vendedor')
+        base = obter_visao(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        if base.vazia: return
 
-        coluna_loja = 'LOJA'
-        lojas_unicas = sorted({str(row.get(coluna_loja, '')).strip() for row in dados_brutos if row.get(coluna_loja)})
+        lojas_unicas = base.lojas()
+        if not lojas_unicas: return
         loja_selecionada = st.selectbox('Selecione a Loja:', lojas_unicas)
 
         col1, col2 = st.columns(2)
         data_de = col1.date_input('De:', datetime.now())
         data_ate = col2.date_input('Até:', datetime.now())
 
-        resultado = defaultdict(lambda: defaultdict(float))
-        for row in dados_brutos:
-            if str(row.get(coluna_loja, '')).strip() != loja_selecionada: continue
-            try:
-                data_str = str(row.get('DATA', '')).split()[0]
-                data_row = datetime.strptime(data_str, '%d/%m/%Y').date()
-                if not (data_de <= data_row <= data_ate): continue
-            except: continue
-
-            vendedor = str(row.get('VENDEDOR', '')).strip() or '[SEM VENDEDOR]'
-            campos = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-            for campo in campos:
-                val = str(row.get(campo, 0)).replace(',', '.')
-                try:
-                    val_num = float(val)
-                    if val_num != 0: resultado[vendedor][campo] += val_num
-                except: pass
-
-        lista_df = []
-        for v, valores in resultado.items():
-            linha = {'Vendedor': v}; linha.update(valores); lista_df.append(linha)
-
-        df = pd.DataFrame(lista_df)
-        colunas_ordem = ['Vendedor', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-        df = df.reindex(columns=colunas_ordem).fillna(0)
+        df = agregar(base, loja_selecionada, data_de, data_ate)
+        medicao.etapa('agregar', linhas=len(df))
 
         # Resumos com 0 (Zero) se não houver dados
         res_rec = int(df['RECEITAS'].sum())
@@ -64,11 +54,11 @@ def mostrar():
         res_goo = int(df['GOOGLE'].sum())
 
         # Formatação para Inteiro sem .0 e Vazio
-        for col in df.columns:
-            if col != 'Vendedor':
-                df[col] = df[col].apply(lambda x: str(int(x)) if x != 0 else '')
+        df = formatar(df)
+        medicao.etapa('formatar')
 
         st.dataframe(df, width="stretch")
+        medicao.etapa('exibir')
         st.markdown('---')
         st.markdown('### Resumo')
         c1, c2, c3, c4, c5 = st.columns(5)
@@ -77,4 +67,6 @@ def mostrar():
         c3.metric('Perdas', res_per)
         c4.metric('Reservas', res_res)
         c5.metric('Google', res_goo)
+
+        botoes_exportacao(df, 'loja_vendedor', f'Loja e Vendedor {loja_selecionada}', (loja_selecionada, data_de, data_ate))
     except Exception as e: st.error(f'Erro: {e}')
\ No newline at end of file
@@ -1,34 +1,41 @@
 ﻿import streamlit as st
-import pandas as pd
 from datetime import datetime
-import sys
-import os
-from collections import defaultdict
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_visao, exibir_horario_dados
+    from agregacao import formatar_inteiros
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
-    GooglePlanilha = None
+    st.error(f'Erro ao importar dados_relatorio: {e}')
+    obter_visao = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'VENDEDOR', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+CAMPOS = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+
+def agregar(base, loja, data_de, data_ate):
+    """Totais por vendedor da ``loja`` no período, lidos do cubo do rollup."""
+    df = base.rollup.somar('VENDEDOR', CAMPOS, '[SEM VENDEDOR]', data_de, data_ate, loja=loja)
+    return df.reindex(columns=['VENDEDOR'] + CAMPOS).fillna(0)
+
+def formatar(df):
+    """Tabela exibida: inteiros ou vazio."""
+    return formatar_inteiros(df.copy(), CAMPOS)
 
 def mostrar():
     st.title('🏪 Relatório por Loja')
-    if GooglePlanilha is None: return
+    if obter_visao is None: return
 
     try:
-        gsheet = GooglePlanilha()
-        dados_brutos = gsheet.aba_relatorio.get_all_records()
-        if not dados_brutos: return
+        medicao = Cronometro('por_loja')
+        base = obter_visao(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        if base.vazia: return
 
-        coluna_loja = 'LOJA'
-        lojas_unicas = sorted({str(row.get(coluna_loja, '')).strip() for row in dados_brutos if row.get(coluna_loja)})
-        
-        # 🔐 FILTRO DE ACESSO POR USUÁRIO
-        if 'lojas_permitidas' in st.session_state and st.session_state.lojas_permitidas != 'TODAS':
-            lojas_unicas = [l for l in lojas_unicas if l in st.session_state.lojas_permitidas]
-            
+        # 🔐 A visão já traz só as lojas permitidas ao usuário
+        lojas_unicas = base.lojas()
         if not lojas_unicas:
             st.warning("⚠️ Você não tem permissão para acessar nenhuma loja disponível nos dados.")
             return
@@ -39,31 +46,8 @@ def mostrar():
         data_de = col1.date_input('De:', datetime.now())
         data_ate = col2.date_input('Até:', datetime.now())
 
-        resultado = defaultdict(lambda: defaultdict(float))
-        for row in dados_brutos:
-            if str(row.get(coluna_loja, '')).strip() != loja_selecionada: continue
-            try:
-                data_str = str(row.get('DATA', '')).split()[0]
-                data_row = datetime.strptime(data_str, '%d/%m/%Y').date()
-                if not (data_de <= data_row <= data_ate): continue
-            except: continue
-
-            vendedor = str(row.get('VENDEDOR', '')).strip() or '[SEM VENDEDOR]'
-            campos = ['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-            for campo in campos:
-                val = str(row.get(campo, 0)).replace(',', '.')
-                try:
-                    val_num = float(val)
-                    if val_num != 0: resultado[vendedor][campo] += val_num
-                except: pass
-
-        lista_df = []
-        for v, valores in resultado.items():
-            linha = {'VENDEDOR': v}; linha.update(valores); lista_df.append(linha)
-
-        df = pd.DataFrame(lista_df)
-        colunas_ordem = ['VENDEDOR', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-        df = df.reindex(columns=colunas_ordem).fillna(0)
+        df = agregar(base, loja_selecionada, data_de, data_ate)
+        medicao.etapa('agregar', linhas=len(df))
 
         # Resumos
         res_rec = int(df['RECEITAS'].sum())
@@ -72,11 +56,11 @@ def mostrar():
         res_goo = int(df['GOOGLE'].sum())
 
         # Inteiro Puro (1)
-        for col in df.columns:
-            if col != 'VENDEDOR':
-                df[col] = df[col].apply(lambda x: str(int(x)) if x != 0 else '')
+        df = formatar(df)
+        medicao.etapa('formatar')
 
         st.dataframe(df, width="stretch")
+        medicao.etapa('exibir')
         st.markdown('---')
         st.markdown('### Resumo')
         c1, c2, c3, c4 = st.columns(4)
@@ -84,4 +68,6 @@ def mostrar():
         c2.metric('Vendas', res_ven)
         c3.metric('Perdas', res_per)
         c4.metric('Google', res_goo)
+
+        botoes_exportacao(df, 'loja', f'Relatorio {loja_selecionada}', (loja_selecionada, data_de, data_ate))
     except Exception as e: st.error(f'Erro: {e}')
\ No newline at end of file
@@ -1,56 +1,79 @@
 ﻿import streamlit as st
 import pandas as pd
 from datetime import datetime
-import sys
-import os
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from google_planilha import GooglePlanilha
+    from dados_relatorio import obter_visao, exibir_horario_dados
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
-    GooglePlanilha = None
+    st.error(f'Erro ao importar dados_relatorio: {e}')
+    obter_visao = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['DATA', 'LOJA', 'VENDEDOR', 'CLIENTE', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+
+def agregar(base, vendedor, data_de, data_ate):
+    """(registros do vendedor no período, totais do resumo lidos do rollup diário)."""
+    if not vendedor:
+        return [], {}
+    dados_filtrados = base.registros_em(base.posicoes(data_de, data_ate, vendedor=vendedor))
+    # Vírgula decimal aceita nas somas, como nos demais relatórios
+    totais = base.rollup.totais(['RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE'], data_de, data_ate, vendedor=vendedor)
+    return dados_filtrados, totais
+
+def montar_tabela(dados_filtrados):
+    """Tabela exibida a partir dos registros do vendedor no período."""
+    df = pd.DataFrame(dados_filtrados)
+    colunas_exatas = ['DATA', 'LOJA', 'CLIENTE', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+    df = df.reindex(columns=colunas_exatas).fillna(0)
+
+    # Formatação para Inteiro (1 em vez de 1.0) e Vazio
+    for col in df.columns:
+        if col not in ['DATA', 'LOJA', 'CLIENTE']:
+            df[col] = df[col].apply(_inteiro_ou_vazio)
+    return df
+
+def _inteiro_ou_vazio(x):
+    if str(x) in ['0', '0.0', '']:
+        return ''
+    try:
+        return str(int(float(str(x).replace(',', '.'))))
+    except (ValueError, OverflowError):
+        # Célula com texto na planilha: mostra como está em vez de derrubar o relatório
+        return str(x)
 
 def mostrar():
     st.title('👤 Relatório por Vendedor')
-    if GooglePlanilha is None: return
+    if obter_visao is None: return
 
     try:
-        gsheet = GooglePlanilha()
-        dados_brutos = gsheet.aba_relatorio.get_all_records()
-        vendedores = sorted(list(set([str(row.get('VENDEDOR', '')).strip() for row in dados_brutos if row.get('VENDEDOR')])))
+        medicao = Cronometro('por_vendedor')
+        base = obter_visao(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        vendedores = base.vendedores()
         vendedor_selecionado = st.selectbox('Selecione o Vendedor:', vendedores)
         
         col1, col2 = st.columns(2)
         data_de = col1.date_input('De:', datetime.now())
         data_ate = col2.date_input('Até:', datetime.now())
 
-        dados_filtrados = []
-        for row in dados_brutos:
-            if str(row.get('VENDEDOR', '')).strip() == vendedor_selecionado:
-                try:
-                    data_row = datetime.strptime(str(row.get('DATA', '')).split()[0], '%d/%m/%Y').date()
-                    if data_de <= data_row <= data_ate: dados_filtrados.append(row)
-                except: continue
-
-        df = pd.DataFrame(dados_filtrados)
-        colunas_exatas = ['DATA', 'LOJA', 'CLIENTE', 'RECEITAS', 'PERDAS', 'VENDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-        df = df.reindex(columns=colunas_exatas).fillna(0)
-        
-        # Somas para o resumo (antes de formatar)
-        res_rec = int(pd.to_numeric(df['RECEITAS'], errors='coerce').sum())
-        res_per = int(pd.to_numeric(df['PERDAS'], errors='coerce').sum())
-        res_ven = int(pd.to_numeric(df['VENDAS'], errors='coerce').sum())        
-        res_res = int(pd.to_numeric(df['RESERVAS'], errors='coerce').sum())
-        res_goo = int(pd.to_numeric(df['GOOGLE'], errors='coerce').sum())
-
-        # Formatação para Inteiro (1 em vez de 1.0) e Vazio
-        for col in df.columns:
-            if col not in ['DATA', 'LOJA', 'CLIENTE']:
-                df[col] = df[col].apply(lambda x: str(int(float(str(x).replace(',', '.')))) if str(x) not in ['0', '0.0', ''] else '')
+        dados_filtrados, totais = agregar(base, vendedor_selecionado, data_de, data_ate)
+        medicao.etapa('agregar', linhas=len(dados_filtrados))
+
+        df = montar_tabela(dados_filtrados)
+        medicao.etapa('formatar')
+
+        # Somas para o resumo
+        res_rec = int(totais.get('RECEITAS', 0))
+        res_per = int(totais.get('PERDAS', 0))
+        res_ven = int(totais.get('VENDAS', 0))
+        res_res = int(totais.get('RESERVAS', 0))
+        res_goo = int(totais.get('GOOGLE', 0))
 
         st.dataframe(df, width="stretch")
+        medicao.etapa('exibir')
         st.markdown('---')
         st.markdown('### Resumo')
         cols = st.columns(5)
@@ -59,4 +82,6 @@ def mostrar():
         cols[2].metric('Vendas', res_ven)
         cols[3].metric('Reservas', res_res)
         cols[4].metric('Google', res_goo)
+
+        botoes_exportacao(df, 'vendedor', f'Relatorio {vendedor_selecionado}', (vendedor_selecionado, data_de, data_ate))
     except Exception as e: st.error(f'Erro: {e}')
\ No newline at end of file
@@ -1,64 +1,68 @@
 ﻿import streamlit as st
 from streamlit_autorefresh import st_autorefresh
-from datetime import datetime
-import sys
-import os
-from collections import defaultdict
-import pandas as pd
-import io
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from google_planilha import GooglePlanilha
+    from monitor_tempo_real import obter_monitor
+    from dados_relatorio import garantir_colunas, lojas_do_usuario
+    from agregacao import somar_por, formatar_inteiros
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
 except Exception as e:
-    st.error(f'Erro ao importar GooglePlanilha: {e}')
-    GooglePlanilha = None
+    st.error(f'Erro ao importar monitor_tempo_real: {e}')
+    obter_monitor = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'VENDEDOR', 'RECEITAS', 'VENDAS', 'PERDAS', 'PESQUISAS', 'EXAME DE VISTA', 'RESERVAS', 'GOOGLE']
+CAMPOS = ['RECEITAS', 'VENDAS', 'PERDAS', 'PESQUISAS', 'EXAME DE VISTA', 'RESERVAS', 'GOOGLE']
+COLUNAS_TABELA = ['Vendedor', 'RECEITAS', 'VENDAS', 'PERDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
+
+def agregar(dados_hoje, loja):
+    """Totais por vendedor da ``loja`` nas linhas de hoje (cada célula truncada para inteiro)."""
+    dados_hoje = dados_hoje[dados_hoje['LOJA'].str.upper() == str(loja).upper()]
+    df = somar_por(dados_hoje, 'VENDEDOR', CAMPOS, '[SEM VENDEDOR]', truncar=True)
+    df = df.rename(columns={'VENDEDOR': 'Vendedor'})
+    return df.reindex(columns=COLUNAS_TABELA).fillna(0)
+
+def formatar(df):
+    """Tabela exibida: inteiros sem .0 ou vazio."""
+    return formatar_inteiros(df.copy(), COLUNAS_TABELA[1:])
 
 def mostrar():
     st.title('⏱️ Relatório em Tempo Real')
     st_autorefresh(interval=30000, key='tempo_real_refresh')
 
-    if GooglePlanilha is None:
-        st.warning('⚠️ Módulo GooglePlanilha não carregado.')
+    if obter_monitor is None:
+        st.warning('⚠️ Módulo monitor_tempo_real não carregado.')
         return
 
     try:
-        gsheet = GooglePlanilha()
-        dados_brutos = gsheet.aba_relatorio.get_all_records()
-        if not dados_brutos: return
+        # 📡 Dados de hoje publicados pelo monitor do servidor (nenhuma chamada à API por tela)
+        medicao = Cronometro('tempo_real')
+        garantir_colunas(COLUNAS)
+        monitor = obter_monitor()
+        dados_hoje, lojas_unicas, atualizado_em = monitor.ler()
+        medicao.etapa('carregar', linhas=len(dados_hoje))
+        texto = f'🕒 dados de {atualizado_em:%H:%M}'
+        if monitor.erro is not None:
+            texto += ' (planilha indisponível, exibindo cópia local)'
+        st.caption(texto)
+        # 🔐 Só as lojas permitidas ao usuário
+        permitidas = lojas_do_usuario()
+        if permitidas is not None:
+            lojas_unicas = [l for l in lojas_unicas if l in permitidas]
+        if not lojas_unicas: return
         
-        coluna_loja = 'LOJA'
-        lojas_unicas = sorted({str(row[coluna_loja]).strip() for row in dados_brutos if row.get(coluna_loja)})
         loja = st.selectbox('Selecione a loja:', lojas_unicas)
 
-        hoje_str = datetime.now().strftime('%d/%m/%Y')
-        dados_hoje = [row for row in dados_brutos if str(row.get('LOJA')).strip().upper() == str(loja).upper() and str(row.get('DATA', '')).strip().split()[0] == hoje_str]
-
-        resultado = defaultdict(lambda: defaultdict(int))
-        for row in dados_hoje:
-            vendedor = str(row.get('VENDEDOR', '')).strip() or '[SEM VENDEDOR]'
-            for c in ['RECEITAS', 'VENDAS', 'PERDAS', 'PESQUISAS', 'EXAME DE VISTA', 'RESERVAS', 'GOOGLE']:
-                try:
-                    val = int(float(str(row.get(c, 0)).replace(',', '.')))
-                    if val != 0: resultado[vendedor][c] += val
-                except: pass
-
-        lista_df = []
-        for v, m in resultado.items():
-            linha = {'Vendedor': v}
-            linha.update(m)
-            lista_df.append(linha)
-
-        df = pd.DataFrame(lista_df)
-        colunas_ordem = ['Vendedor', 'RECEITAS', 'VENDAS', 'PERDAS', 'RESERVAS', 'GOOGLE', 'PESQUISAS', 'EXAME DE VISTA']
-        df = df.reindex(columns=colunas_ordem).fillna(0)
+        df = agregar(dados_hoje, loja)
+        medicao.etapa('agregar', linhas=len(df))
         
         # Limpeza e formatação para Inteiro sem .0
-        for col in df.columns:
-            if col != 'Vendedor':
-                df[col] = df[col].apply(lambda x: str(int(x)) if x != 0 else '')
+        df = formatar(df)
+        medicao.etapa('formatar')
 
         st.markdown(f'### 🏪 **{loja}**')
         st.dataframe(df, width="stretch")
+        medicao.etapa('exibir')
+        botoes_exportacao(df, 'tempo_real', f'Tempo Real {loja}', (loja,), versao=atualizado_em.isoformat())
     except Exception as e: st.error(f'Erro: {e}')
\ No newline at end of file
@@ -0,0 +1,114 @@
+import streamlit as st
+from datetime import datetime, timedelta
+import pandas as pd
+
+try:
+    from dados_relatorio import obter_visao, exibir_horario_dados
+    from exportacao import botoes_exportacao
+    from diagnostico import Cronometro
+except Exception as e:
+    st.error(f'Erro ao importar dados_relatorio: {e}')
+    obter_visao = None
+
+# Colunas da aba 'relatorio' lidas por este relatório
+COLUNAS = ['LOJA', 'DATA', 'RECEITAS', 'VENDAS', 'RESERVAS', 'ATENDIMENTOS']
+CAMPOS = ['RECEITAS', 'VENDAS', 'RESERVAS', 'ATENDIMENTOS']
+
+
+def periodos(referencia):
+    """{nome: (de, até)}: semana e mês até ``referencia`` e os mesmos trechos antes deles."""
+    inicio_mes = referencia.replace(day=1)
+    fim_mes_anterior = inicio_mes - timedelta(days=1)
+    return {
+        'semana': (referencia - timedelta(days=6), referencia),
+        'semana_anterior': (referencia - timedelta(days=13), referencia - timedelta(days=7)),
+        'mes': (inicio_mes, referencia),
+        # Mesmo número de dias do mês anterior (até o último dia, se ele for mais curto)
+        'mes_anterior': (fim_mes_anterior.replace(day=1),
+                         fim_mes_anterior.replace(day=min(referencia.day, fim_mes_anterior.day))),
+    }
+
+
+def variacao(atual, anterior):
+    """Variação percentual (None quando não há base de comparação)."""
+    return round((atual - anterior) / anterior * 100, 1) if anterior else None
+
+
+def taxa(parte, total):
+    return round(parte / total * 100, 1) if total else None
+
+
+def agregar(base, referencia):
+    """{período: totais de ``CAMPOS`` por loja} de ``periodos(referencia)``, todos com as mesmas lojas."""
+    # Duas buscas no cubo por loja e período, sem reler linhas
+    totais = {nome: base.rollup.totais_por(['LOJA'], CAMPOS, de, ate)
+              for nome, (de, ate) in periodos(referencia).items()}
+    lojas = sorted(set().union(*(t.index for t in totais.values())))
+    return {nome: t.reindex(lojas, fill_value=0) for nome, t in totais.items()}
+
+
+def montar_tabelas(totais, campo):
+    """(comparação de ``campo`` com o período anterior, conversão de atendimentos) por loja."""
+    comparacao = []
+    conversao = []
+    for loja in totais['semana'].index:
+        valor = {nome: t.loc[loja] for nome, t in totais.items()}
+        comparacao.append({
+            'LOJA': loja or '[SEM LOJA]',
+            'SEMANA': int(valor['semana'][campo]),
+            'SEMANA ANTERIOR': int(valor['semana_anterior'][campo]),
+            'VAR. SEMANA (%)': variacao(valor['semana'][campo], valor['semana_anterior'][campo]),
+            'MÊS': int(valor['mes'][campo]),
+            'MÊS ANTERIOR': int(valor['mes_anterior'][campo]),
+            'VAR. MÊS (%)': variacao(valor['mes'][campo], valor['mes_anterior'][campo]),
+        })
+        conversao.append({
+            'LOJA': loja or '[SEM LOJA]',
+            'ATENDIMENTOS (MÊS)': int(valor['mes']['ATENDIMENTOS']),
+            'VENDAS/ATEND. SEMANA (%)': taxa(valor['semana']['VENDAS'], valor['semana']['ATENDIMENTOS']),
+            'VENDAS/ATEND. MÊS (%)': taxa(valor['mes']['VENDAS'], valor['mes']['ATENDIMENTOS']),
+            'RESERVAS/ATEND. SEMANA (%)': taxa(valor['semana']['RESERVAS'], valor['semana']['ATENDIMENTOS']),
+            'RESERVAS/ATEND. MÊS (%)': taxa(valor['mes']['RESERVAS'], valor['mes']['ATENDIMENTOS']),
+        })
+
+    df_comparacao = pd.DataFrame(comparacao, columns=['LOJA', 'SEMANA', 'SEMANA ANTERIOR', 'VAR. SEMANA (%)',
+                                                      'MÊS', 'MÊS ANTERIOR', 'VAR. MÊS (%)'])
+    df_conversao = pd.DataFrame(conversao, columns=['LOJA', 'ATENDIMENTOS (MÊS)', 'VENDAS/ATEND. SEMANA (%)',
+                                                    'VENDAS/ATEND. MÊS (%)', 'RESERVAS/ATEND. SEMANA (%)',
+                                                    'RESERVAS/ATEND. MÊS (%)'])
+    return df_comparacao, df_conversao
+
+
+def mostrar():
+    st.title('📉 Tendências por Loja')
+    if obter_visao is None: return
+
+    try:
+        medicao = Cronometro('tendencias')
+        base = obter_visao(colunas=COLUNAS)
+        medicao.etapa('carregar', linhas=len(base))
+        exibir_horario_dados()
+        if base.vazia: return
+
+        col1, col2 = st.columns(2)
+        referencia = col1.date_input('Até:', datetime.now())
+        campo = col2.selectbox('Métrica:', CAMPOS, index=CAMPOS.index('VENDAS'))
+
+        # Totais por loja de cada período, lidos do cubo
+        totais = agregar(base, referencia)
+        medicao.etapa('agregar', linhas=len(totais['semana']))
+
+        df_comparacao, df_conversao = montar_tabelas(totais, campo)
+        medicao.etapa('formatar')
+
+        st.markdown(f'### {campo}: semana e mês contra o período anterior')
+        st.caption('Semana: os 7 dias até a data escolhida. Mês: do dia 1 até a data, contra os mesmos dias do mês anterior.')
+        st.dataframe(df_comparacao, width="stretch", hide_index=True)
+        botoes_exportacao(df_comparacao, 'tendencias', f'Tendencias {campo}', (referencia, campo))
+
+        st.markdown('---')
+        st.markdown('### Conversão de atendimentos')
+        st.dataframe(df_conversao, width="stretch", hide_index=True)
+        medicao.etapa('exibir')
+        botoes_exportacao(df_conversao, 'tendencias_conversao', 'Conversao por Loja', (referencia,))
+    except Exception as e: st.error(f'Erro: {e}')
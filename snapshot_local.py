@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+from google_planilha import agrupar_intervalos
+
+# Arquivo SQLite com a cópia local das abas da planilha
+CAMINHO_PADRAO = os.environ.get(
+    'SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot_fluxo.sqlite3'),
+)
+
+
+class SnapshotLocal:
+    """Espelho local (SQLite) das abas da planilha, usado pelos relatórios no lugar da API."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        with self._conectar() as con:
+            con.executescript('''
+                CREATE TABLE IF NOT EXISTS abas (
+                    nome TEXT PRIMARY KEY,
+                    cabecalho TEXT NOT NULL,
+                    sincronizado_em TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS linhas (
+                    aba TEXT NOT NULL,
+                    numero INTEGER NOT NULL,
+                    valores TEXT NOT NULL,
+                    PRIMARY KEY (aba, numero)
+                );
+                CREATE TABLE IF NOT EXISTS estados (
+                    nome TEXT PRIMARY KEY,
+                    dados TEXT NOT NULL,
+                    salvo_em TEXT NOT NULL
+                );
+            ''')
+
+    def _conectar(self):
+        """Conexão curta por operação (seguro entre threads/sessões do Streamlit)."""
+        return closing(sqlite3.connect(self.caminho, timeout=30))
+
+    def substituir(self, aba, cabecalho, linhas, sincronizado_em=None):
+        """Grava a aba inteira, descartando a cópia anterior."""
+        sincronizado_em = sincronizado_em or datetime.now()
+        with self._conectar() as con, con:
+            con.execute('DELETE FROM linhas WHERE aba = ?', (aba,))
+            con.executemany(
+                'INSERT INTO linhas (aba, numero, valores) VALUES (?, ?, ?)',
+                ((aba, i, json.dumps(l, ensure_ascii=False)) for i, l in enumerate(linhas, start=2)),
+            )
+            con.execute(
+                'INSERT OR REPLACE INTO abas (nome, cabecalho, sincronizado_em) VALUES (?, ?, ?)',
+                (aba, json.dumps(cabecalho, ensure_ascii=False), sincronizado_em.isoformat()),
+            )
+
+    def acrescentar(self, aba, linhas, sincronizado_em=None):
+        """Adiciona linhas no final da aba e atualiza o horário de sincronização."""
+        sincronizado_em = sincronizado_em or datetime.now()
+        with self._conectar() as con, con:
+            ultimo = con.execute('SELECT COALESCE(MAX(numero), 1) FROM linhas WHERE aba = ?', (aba,)).fetchone()[0]
+            con.executemany(
+                'INSERT INTO linhas (aba, numero, valores) VALUES (?, ?, ?)',
+                ((aba, i, json.dumps(l, ensure_ascii=False)) for i, l in enumerate(linhas, start=ultimo + 1)),
+            )
+            con.execute('UPDATE abas SET sincronizado_em = ? WHERE nome = ?', (sincronizado_em.isoformat(), aba))
+
+    def alterar_linhas(self, aba, excluir=(), editar=None, incluir=(), sincronizado_em=None):
+        """Aplica um lote de alterações (como ``FonteDados.aplicar_lote``) sem regravar a aba inteira.
+
+        ``editar`` é {linha: valores} e ``incluir`` [valores], já como texto; os
+        números são os de antes do lote e as exclusões renumeram as linhas seguintes.
+        Retorna quantas operações foram feitas.
+        """
+        sincronizado_em = sincronizado_em or datetime.now()
+        operacoes = 0
+        with self._conectar() as con, con:
+            # 1. Edições, com os números de linha originais
+            for linha, valores in sorted((editar or {}).items()):
+                self._gravar_linha(con, aba, linha, valores)
+                operacoes += 1
+            # 2. Exclusões em intervalos, de baixo para cima, renumerando as linhas seguintes
+            for inicio, fim in reversed(agrupar_intervalos(excluir)):
+                con.execute('DELETE FROM linhas WHERE aba = ? AND numero BETWEEN ? AND ?', (aba, inicio, fim))
+                self._renumerar(con, aba, fim, inicio - fim - 1)
+                operacoes += 1
+            # 3. Inclusões no final
+            if incluir:
+                ultimo = con.execute('SELECT COALESCE(MAX(numero), 1) FROM linhas WHERE aba = ?', (aba,)).fetchone()[0]
+                con.executemany(
+                    'INSERT INTO linhas (aba, numero, valores) VALUES (?, ?, ?)',
+                    ((aba, i, json.dumps(valores, ensure_ascii=False)) for i, valores in enumerate(incluir, start=ultimo + 1)),
+                )
+                operacoes += 1
+            con.execute('UPDATE abas SET sincronizado_em = ? WHERE nome = ?', (sincronizado_em.isoformat(), aba))
+        return operacoes
+
+    @staticmethod
+    def _renumerar(con, aba, apos, deslocamento):
+        # Em dois passos (negativo e de volta) para não violar a chave (aba, numero) no meio do UPDATE
+        con.execute('UPDATE linhas SET numero = -(numero + ?) WHERE aba = ? AND numero > ?', (deslocamento, aba, apos))
+        con.execute('UPDATE linhas SET numero = -numero WHERE aba = ? AND numero < 0', (aba,))
+
+    @staticmethod
+    def _gravar_linha(con, aba, linha, valores):
+        if linha == 1:
+            con.execute('UPDATE abas SET cabecalho = ? WHERE nome = ?', (json.dumps(valores, ensure_ascii=False), aba))
+        else:
+            con.execute('INSERT OR REPLACE INTO linhas (aba, numero, valores) VALUES (?, ?, ?)',
+                        (aba, linha, json.dumps(valores, ensure_ascii=False)))
+
+    def carregar(self, aba):
+        """Retorna (cabecalho, linhas, sincronizado_em) ou None se a aba nunca foi espelhada."""
+        with self._conectar() as con:
+            meta = con.execute('SELECT cabecalho, sincronizado_em FROM abas WHERE nome = ?', (aba,)).fetchone()
+            if meta is None:
+                return None
+            linhas = [json.loads(v) for (v,) in con.execute(
+                'SELECT valores FROM linhas WHERE aba = ? ORDER BY numero', (aba,))]
+        return json.loads(meta[0]), linhas, datetime.fromisoformat(meta[1])
+
+    def salvar_estado(self, nome, dados):
+        """Grava um estado derivado dos dados (ex.: checkpoints de relatórios) como JSON."""
+        with self._conectar() as con, con:
+            con.execute(
+                'INSERT OR REPLACE INTO estados (nome, dados, salvo_em) VALUES (?, ?, ?)',
+                (nome, json.dumps(dados, ensure_ascii=False), datetime.now().isoformat()),
+            )
+
+    def carregar_estado(self, nome):
+        """Estado gravado com ``salvar_estado`` ou None."""
+        with self._conectar() as con:
+            linha = con.execute('SELECT dados FROM estados WHERE nome = ?', (nome,)).fetchone()
+        return json.loads(linha[0]) if linha else None
+
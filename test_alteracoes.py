@@ -0,0 +1,138 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agregacao import CAMPOS_RELATORIO, BaseRelatorio
+from alteracoes import ConjuntoAlteracoes, versao_linha
+from benchmarks.gerador import gerar_linhas
+from relatorios_edicao import CABECALHO_EXATO
+
+HOJE = date(2025, 10, 16)
+
+
+@pytest.fixture
+def base():
+    linhas = [list(l) + [''] * (len(CABECALHO_EXATO) - len(l))
+              for l in gerar_linhas(3000, hoje=HOJE, dias=60, semente=7)]
+    return BaseRelatorio(CABECALHO_EXATO, linhas, 1)
+
+
+def _editada(linha, aleatorio):
+    """Cópia da linha com data, loja e métricas trocadas (muda de dia e de grupo no rollup)."""
+    novos = list(linha)
+    novos[1] = (HOJE - timedelta(days=aleatorio.randint(0, 70))).strftime('%d/%m/%Y')
+    novos[0] = aleatorio.choice(['LOJA 01', 'LOJA NOVA', ''])
+    novos[8] = aleatorio.choice([1, 2.5, '3', '', 'x'])
+    novos[9] = aleatorio.choice(['-1', '2', ''])
+    return novos
+
+
+def _incluida(aleatorio):
+    dia = (HOJE - timedelta(days=aleatorio.randint(0, 5))).strftime('%d/%m/%Y')
+    return [aleatorio.choice(['LOJA 02', 'LOJA NOVA']), dia, '10:00', 'VENDEDOR NOVO', 'C', 1, '10,5', 0, 1, 1, '', '', 1.7, '']
+
+
+def _conferir(alterada, montada):
+    """A base alterada no lugar tem de ser igual à montada do zero com as mesmas linhas."""
+    assert len(alterada.df) == len(montada.df)
+    assert list(alterada.df.index) == list(range(len(montada.df)))
+    for coluna in montada.df.columns:
+        if coluna in ('LOJA', 'VENDEDOR', 'CLIENTE'):
+            assert (alterada.df[coluna].astype(str).to_numpy() == montada.df[coluna].astype(str).to_numpy()).all()
+        else:
+            assert np.allclose(alterada.df[coluna].to_numpy(float), montada.df[coluna].to_numpy(float)), coluna
+    pd.testing.assert_frame_equal(alterada.rollup.tabela.reset_index(drop=True),
+                                  montada.rollup.tabela.reset_index(drop=True), check_dtype=False)
+    for de, ate in [(None, None), (HOJE - timedelta(days=10), HOJE), (HOJE - timedelta(days=70), HOJE - timedelta(days=30))]:
+        assert (alterada.posicoes(de, ate) == montada.posicoes(de, ate)).all()
+        for por in ['LOJA', 'VENDEDOR']:
+            pd.testing.assert_frame_equal(alterada.rollup.somar(por, CAMPOS_RELATORIO, '[S]', de, ate),
+                                          montada.rollup.somar(por, CAMPOS_RELATORIO, '[S]', de, ate),
+                                          check_dtype=False)
+
+
+@pytest.mark.parametrize('excluir, editar, incluir', [
+    (0, 10, 0),
+    (10, 0, 0),
+    (0, 0, 3),
+    (25, 30, 4),
+    (40, 1, 1),
+])
+def test_alterar_igual_a_montar_do_zero(base, excluir, editar, incluir):
+    aleatorio = random.Random(excluir * 100 + editar * 10 + incluir)
+    alvo = aleatorio.sample(range(2, len(base.linhas) + 2), excluir + editar)
+    alteracoes = ConjuntoAlteracoes(
+        excluidas={l: base.linhas[l - 2] for l in alvo[:excluir]},
+        editadas={l: (base.linhas[l - 2], _editada(base.linhas[l - 2], aleatorio)) for l in alvo[excluir:]},
+        incluidas=[_incluida(aleatorio) for _ in range(incluir)],
+    )
+    linhas = alteracoes.aplicar(base.linhas)
+
+    alterada = base.alterar(linhas, 2, alteracoes)
+
+    _conferir(alterada, BaseRelatorio(CABECALHO_EXATO, linhas, 2))
+    assert alterada.recarga == alterada.versao == 2
+
+
+def test_alterar_pontas_e_trechos_contiguos(base):
+    """Exclui a primeira e a última linha e um trecho contíguo, editando a linha logo depois dele."""
+    aleatorio = random.Random(1)
+    ultima = len(base.linhas) + 1
+    excluidas = [2, 100, 101, 102, ultima]
+    alteracoes = ConjuntoAlteracoes(
+        excluidas={l: base.linhas[l - 2] for l in excluidas},
+        editadas={103: (base.linhas[101], _editada(base.linhas[101], aleatorio))},
+    )
+    linhas = alteracoes.aplicar(base.linhas)
+    assert len(linhas) == len(base.linhas) - len(excluidas)
+    assert linhas[alteracoes.linha_depois(103) - 2][0] == alteracoes.editadas[103][1][0]
+
+    _conferir(base.alterar(linhas, 2, alteracoes), BaseRelatorio(CABECALHO_EXATO, linhas, 2))
+
+
+def test_alteracoes_em_sequencia(base):
+    aleatorio = random.Random(5)
+    for versao in range(2, 6):
+        alvo = aleatorio.sample(range(2, len(base.linhas) + 2), 20)
+        alteracoes = ConjuntoAlteracoes(
+            excluidas={l: base.linhas[l - 2] for l in alvo[:8]},
+            editadas={l: (base.linhas[l - 2], _editada(base.linhas[l - 2], aleatorio)) for l in alvo[8:]},
+            incluidas=[_incluida(aleatorio)],
+        )
+        base = base.alterar(alteracoes.aplicar(base.linhas), versao, alteracoes)
+    _conferir(base, BaseRelatorio(CABECALHO_EXATO, base.linhas, versao))
+
+
+def test_versao_linha_ignora_vazias_no_fim_e_tipo_gravado():
+    assert versao_linha(['A', 1, '']) == versao_linha(['A', '1'])
+    assert versao_linha(['A', 2.0]) == versao_linha(['A', '2'])
+    assert versao_linha(['A', '1']) != versao_linha(['A', '2'])
+    assert versao_linha(['', 'A']) != versao_linha(['A'])
+
+
+def test_conflitos():
+    lidas = {2: ['L1', '01/01/2025', '1'], 3: ['L2', '01/01/2025', '2'], 4: ['L3', '01/01/2025', '3']}
+    alteracoes = ConjuntoAlteracoes(excluidas={2: lidas[2]},
+                                    editadas={3: (lidas[3], ['L2', '01/01/2025', '5']), 4: (lidas[4], lidas[4])})
+
+    assert alteracoes.conflitos(dict(lidas)) == []
+    # Outra sessão mudou a linha 3 e a linha 2 não existe mais (a aba encolheu)
+    atuais = {3: ['L2', '01/01/2025', '9'], 4: lidas[4] + ['']}
+    assert alteracoes.conflitos(atuais) == [2, 3]
+
+
+def test_lote_e_aplicar():
+    linhas = [['A', '1', 'x'], ['B', '2', 'y'], ['C', '3', 'z'], ['D', '4', 'w']]
+    alteracoes = ConjuntoAlteracoes(excluidas={3: linhas[1]}, editadas={4: (linhas[2], ['C', 7])},
+                                    incluidas=[['E', 5.0]])
+    assert alteracoes
+    assert not ConjuntoAlteracoes()
+    assert alteracoes.lote() == ([3], {4: ['C', 7]}, [['E', 5.0]])
+    assert alteracoes.linha_depois(4) == 3
+    assert alteracoes.linha_depois(2) == 2
+    # A edição só cobre as colunas enviadas: a terceira continua como estava
+    assert alteracoes.aplicar(linhas) == [['A', '1', 'x'], ['C', '7', 'z'], ['D', '4', 'w'], ['E', '5']]
+    assert alteracoes.resumo() == {'excluir': 1, 'editar': 1, 'incluir': 1}
@@ -0,0 +1,193 @@
+import pytest
+from gspread.exceptions import APIError
+from gspread.utils import a1_range_to_grid_range
+
+from alteracoes import ConjuntoAlteracoes
+from benchmarks.planilha_falsa import PlanilhaFalsa
+from dados_relatorio import CacheRelatorio
+from google_planilha import GooglePlanilha, SincronizadorIncremental, agrupar_intervalos, ler_aba
+from planilha_local import PlanilhaLocal
+from snapshot_local import SnapshotLocal
+
+CABECALHO = ['LOJA', 'DATA', 'VENDEDOR', 'VENDAS']
+
+
+class _RespostaErro:
+    """Resposta de erro da API para intervalos fora da grade."""
+
+    status_code = 400
+    text = 'exceeds grid limits'
+
+    def json(self):
+        return {'error': {'code': 400, 'message': self.text, 'status': 'INVALID_ARGUMENT'}}
+
+
+def _linhas(quantidade, inicio=0):
+    return [[f'LOJA {i % 3}', '01/01/2025', f'V{i}', str(i)] for i in range(inicio, inicio + quantidade)]
+
+
+@pytest.mark.parametrize('linhas, esperado', [
+    ([], []),
+    ([7], [(7, 7)]),
+    ([7, 7], [(7, 7)]),
+    ([5, 2, 3, 7, 6], [(2, 3), (5, 7)]),
+    ([10, 2, 4, 6], [(2, 2), (4, 4), (6, 6), (10, 10)]),
+    (['3', 4, 2.0], [(2, 4)]),
+])
+def test_agrupar_intervalos(linhas, esperado):
+    assert agrupar_intervalos(linhas) == esperado
+
+
+def test_sincronizar_so_linhas_novas():
+    aba = PlanilhaFalsa(CABECALHO, _linhas(20))
+    sincronizador = SincronizadorIncremental()
+    assert sincronizador.sincronizar(aba) is True
+
+    aba.acrescentar(_linhas(3, inicio=20))
+    assert sincronizador.sincronizar(aba) is False
+    assert sincronizador.linhas == _linhas(23)
+    # Cabeçalho, linhas novas e cauda numa chamada só
+    assert aba.chamadas['batch_get'] == 1
+
+
+@pytest.mark.parametrize('mudanca', ['editar_cauda', 'excluir_cauda', 'cabecalho'])
+def test_sincronizar_recarrega_se_a_cauda_mudou(mudanca):
+    aba = PlanilhaFalsa(CABECALHO, _linhas(20))
+    sincronizador = SincronizadorIncremental()
+    sincronizador.sincronizar(aba)
+
+    if mudanca == 'editar_cauda':
+        aba.valores[-2][3] = '999'
+    elif mudanca == 'excluir_cauda':
+        del aba.valores[-3]
+    else:
+        aba.valores[0][3] = 'VENDAS2'
+    aba.acrescentar(_linhas(2, inicio=20))
+
+    assert sincronizador.sincronizar(aba) is True
+    assert [sincronizador.cabecalho] + sincronizador.linhas == aba.valores
+
+
+def test_recarga_completa_periodica_pega_edicao_acima_da_cauda():
+    aba = PlanilhaFalsa(CABECALHO, _linhas(20))
+    sincronizador = SincronizadorIncremental(intervalo_recarga=600)
+    # Cópia restaurada (ex.: do espelho local) com uma linha do meio desatualizada
+    sincronizador.carregar(CABECALHO, _linhas(20))
+    aba.valores[5][3] = '999'
+
+    assert sincronizador.sincronizar(aba) is True
+    assert sincronizador.linhas[4][3] == '999'
+
+    aba.valores[6][3] = '888'
+    assert sincronizador.sincronizar(aba) is False
+    assert sincronizador.linhas[5][3] == '5'
+
+    sincronizador._recarregado_em -= 601
+    assert sincronizador.sincronizar(aba) is True
+    assert [sincronizador.cabecalho] + sincronizador.linhas == aba.valores
+
+
+def test_sincronizar_rele_metadados_quando_a_grade_encolheu():
+    class AbaEncolhida(PlanilhaFalsa):
+        """Grade com o tamanho de quando foi lida; intervalos além das linhas atuais dão erro como na API."""
+
+        def __init__(self, *args):
+            super().__init__(*args)
+            self.grade = len(self.valores)
+
+        @property
+        def row_count(self):
+            return self.grade
+
+        def _intervalo(self, a1):
+            if a1_range_to_grid_range(a1).get('endRowIndex', 0) > len(self.valores):
+                raise APIError(_RespostaErro())
+            return super()._intervalo(a1)
+
+    aba = AbaEncolhida(CABECALHO, _linhas(100))
+    sincronizador = SincronizadorIncremental(colunas=['LOJA', 'VENDAS'])
+    sincronizador.sincronizar(aba)
+    # Linhas excluídas pela interface da planilha: os metadados guardados não sabem
+    del aba.valores[50:90]
+
+    def renovar():
+        aba.grade = len(aba.valores)
+        return aba
+
+    assert sincronizador.sincronizar(aba, renovar) is True
+    assert len(sincronizador.linhas) == 60
+    assert sincronizador.linhas[-1] == ['LOJA 0', '', '', '99']
+
+
+def test_ler_aba_em_blocos_igual_a_ler_de_uma_vez():
+    linhas = _linhas(95)
+    linhas[40] = []  # linha vazia no fim de um bloco
+    aba = PlanilhaFalsa(CABECALHO, linhas)
+    assert ler_aba(aba, bloco=20) == [list(l) + [''] * (4 - len(l)) for l in aba.valores]
+    assert aba.chamadas['batch_get'] == 5
+
+
+def test_sincronizador_aplicar_alteracoes():
+    aba = PlanilhaFalsa(CABECALHO, _linhas(10))
+    sincronizador = SincronizadorIncremental(colunas=['LOJA', 'VENDAS'])
+    sincronizador.sincronizar(aba)
+    lidas = {n: list(aba.valores[n - 1]) for n in (3, 5)}
+    alteracoes = ConjuntoAlteracoes(excluidas={3: lidas[3]},
+                                    editadas={5: (lidas[5], ['LOJA 9', '02/01/2025', 'V4', 44])},
+                                    incluidas=[['LOJA 1', '03/01/2025', 'V10', 10]])
+
+    assert sincronizador.aplicar_alteracoes(alteracoes) is True
+    assert len(sincronizador.linhas) == 10
+    # Só as colunas buscadas, como numa leitura da aba
+    assert sincronizador.linhas[alteracoes.linha_depois(5) - 2] == ['LOJA 9', '', '', '44']
+    assert sincronizador.linhas[-1] == ['LOJA 1', '', '', '10']
+
+    # Cópia atrasada: os valores antigos não conferem, nada muda
+    antes = sincronizador.linhas
+    atrasada = ConjuntoAlteracoes(excluidas={3: lidas[3]})
+    assert sincronizador.aplicar_alteracoes(atrasada) is False
+    assert sincronizador.linhas is antes
+
+
+@pytest.fixture
+def planilha(tmp_path):
+    fonte = PlanilhaLocal(str(tmp_path / 'planilha.sqlite3'))
+    fonte.substituir('relatorio', CABECALHO, _linhas(30))
+    gsheet = GooglePlanilha.__new__(GooglePlanilha)
+    gsheet.conexao = fonte
+    cache = CacheRelatorio(snapshot=SnapshotLocal(str(tmp_path / 'snapshot.sqlite3')), colunas=None)
+    cache.obter_base(gsheet)
+    return fonte, gsheet, cache
+
+
+def test_gravar_alteracoes(planilha):
+    fonte, gsheet, cache = planilha
+    lidas = gsheet.ler_linhas(gsheet.aba_relatorio, [4, 10, 11], len(CABECALHO))
+    alteracoes = ConjuntoAlteracoes(excluidas={10: lidas[10], 11: lidas[11]},
+                                    editadas={4: (lidas[4], ['LOJA 7', '05/01/2025', 'V2', 70])},
+                                    incluidas=[['LOJA 8', '06/01/2025', 'V30', 8]])
+    versao = cache.versao
+
+    assert cache.gravar_alteracoes(gsheet, alteracoes) == []
+
+    _, planilha_atual, _ = fonte.carregar('relatorio')
+    assert len(planilha_atual) == 29
+    assert cache.obter(gsheet) == planilha_atual
+    assert cache.snapshot.carregar('relatorio')[1] == planilha_atual
+    assert cache.versao == versao + 1
+    base = cache.obter_base(gsheet)
+    assert base.versao == cache.versao and len(base) == 29
+
+
+def test_gravar_alteracoes_com_conflito_nao_grava(planilha):
+    fonte, gsheet, cache = planilha
+    lidas = gsheet.ler_linhas(gsheet.aba_relatorio, [4, 6], len(CABECALHO))
+    # Outra sessão exclui a linha 2 depois da leitura: as linhas 4 e 6 sobem uma posição
+    outra = ConjuntoAlteracoes(excluidas={2: gsheet.ler_linhas(gsheet.aba_relatorio, [2], 4)[2]})
+    assert cache.gravar_alteracoes(gsheet, outra) == []
+    _, antes, _ = fonte.carregar('relatorio')
+
+    alteracoes = ConjuntoAlteracoes(excluidas={6: lidas[6]}, editadas={4: (lidas[4], ['LOJA 7', '', 'V2', 1])})
+
+    assert cache.gravar_alteracoes(gsheet, alteracoes) == [4, 6]
+    assert fonte.carregar('relatorio')[1] == antes
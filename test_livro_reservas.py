@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+
+from agregacao import BaseRelatorio
+from alteracoes import ConjuntoAlteracoes
+from benchmarks.gerador import gerar_linhas
+from livro_reservas import LivroReservas
+from relatorios_edicao import CABECALHO_EXATO
+from snapshot_local import SnapshotLocal
+
+HOJE = date(2025, 10, 16)
+
+
+@pytest.fixture
+def base():
+    linhas = [list(l) + [''] * (len(CABECALHO_EXATO) - len(l))
+              for l in gerar_linhas(2000, hoje=HOJE, dias=60, lojas=3, clientes_por_loja=40, semente=11)]
+    return BaseRelatorio(CABECALHO_EXATO, linhas, 1)
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    return SnapshotLocal(str(tmp_path / 'snapshot.sqlite3'))
+
+
+def _conferir(livro, base):
+    """O livro tem de ser igual a um montado do zero com a mesma base."""
+    montado = LivroReservas()
+    montado.atualizar(base)
+    assert livro.saldos == montado.saldos
+    assert livro.totais == montado.totais
+    assert {v: sorted(i) for v, i in livro.ativos.items() if i} == {v: sorted(i) for v, i in montado.ativos.items() if i}
+
+
+def _com_reserva(base):
+    """Número de linha (planilha) de uma linha do meio com vendedor e reserva positiva."""
+    for p in range(len(base.linhas) // 2, len(base.linhas)):
+        if base.df['VENDEDOR'].iloc[p] != '' and base.df['RESERVAS'].iloc[p] > 0:
+            return p + 2
+
+
+def test_retomar_apos_edicao_no_meio(base, snapshot):
+    LivroReservas(snapshot).atualizar(base)
+    linha = _com_reserva(base)
+    lida = base.linhas[linha - 2]
+    editada = list(lida)
+    editada[9] = '0'
+    alteracoes = ConjuntoAlteracoes(editadas={linha: (lida, editada)})
+    alterada = base.alterar(alteracoes.aplicar(base.linhas), 2, alteracoes)
+
+    # Processo novo: o livro vem do espelho local, gravado antes da edição
+    retomado = LivroReservas(snapshot)
+    retomado.atualizar(alterada)
+
+    _conferir(retomado, alterada)
+
+
+def test_retomar_com_linhas_novas_e_exclusao(base, snapshot):
+    metade = BaseRelatorio(CABECALHO_EXATO, base.linhas[:1500], 1)
+    LivroReservas(snapshot).atualizar(metade)
+    # Depois de gravado: uma linha antiga excluída e as demais acrescentadas
+    linhas = base.linhas[:100] + base.linhas[101:]
+
+    retomado = LivroReservas(snapshot)
+    retomado.atualizar(BaseRelatorio(CABECALHO_EXATO, linhas, 1))
+
+    _conferir(retomado, BaseRelatorio(CABECALHO_EXATO, linhas, 1))
+
+
+def test_retomar_sem_mudancas_nao_refaz(base, snapshot, monkeypatch):
+    LivroReservas(snapshot).atualizar(base)
+    retomado = LivroReservas(snapshot)
+    monkeypatch.setattr('livro_reservas._lancar', lambda df: pytest.fail('livro refeito sem mudanças'))
+
+    retomado.atualizar(base)
+
+    monkeypatch.undo()
+    _conferir(retomado, base)